@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: structure checks of a zipped package from the zip listing, against
+unpacking the archive and checking the package folder as before.
+
+    python benchmarks/archive_structure.py [--files 20000] [--size KB]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mets_gen # noqa: E402
+from swagger_server.forge import packages # noqa: E402
+from swagger_server.forge.tests import Structure # noqa: E402
+
+
+def write_archive(tmp, file_count, size):
+    """Write a zipped package with file_count data files of size bytes in each of
+    two representations, return the archive path."""
+    root = mets_gen.write_package(os.path.join(tmp, 'ip'), reps=2)
+    content = os.urandom(size)
+    archive = os.path.join(tmp, 'ip.zip')
+    with zipfile.ZipFile(archive, 'w') as zip_ip:
+        for folder, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(folder, name)
+                zip_ip.write(path, os.path.relpath(path, tmp))
+        for index in range(2):
+            data = 'ip/representations/{}/data'.format(mets_gen.rep_name(index))
+            for number in range(file_count):
+                zip_ip.writestr('{}/file{}.bin'.format(data, number), content)
+    return archive
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20000, help='data files per representation')
+    parser.add_argument('--size', type=int, default=16, help='data file size in KB')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = write_archive(tmp, args.files, args.size * 1024)
+        print('archive of {} bytes'.format(os.path.getsize(archive)))
+        start = time.perf_counter()
+        listed = Structure.from_archive(archive)
+        print('{:<20} {:>10.3f} s'.format('from listing', time.perf_counter() - start))
+        start = time.perf_counter()
+        destination = packages.ArchivePackageHandler(tmp).unpack_package(archive)
+        unpacked = Structure.from_directory(os.path.join(destination, 'ip'))
+        print('{:<20} {:>10.3f} s'.format('unpack and scan', time.perf_counter() - start))
+        shutil.rmtree(destination)
+        assert listed.messages == unpacked.messages
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: time to answer "is path X declared, and with what checksum?" for METS
+files with growing fileSecs, by parsing the METS, building the SQLite file index
+from a streaming pass, and by looking the path up in an existing index. Checking an
+index is current costs a SHA-256 of the METS, shown separately.
+
+    python benchmarks/file_index.py [--sizes 1000 10000 100000 1000000] [--lookups 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mets_gen # noqa: E402
+from swagger_server.forge.fileindex import FileIndex # noqa: E402
+from swagger_server.forge.metadata import MetsValidator, mets_digest # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def parse_lookup(mets_path, path):
+    """Return the FileRef for path found by validating and parsing mets_path."""
+    validator = MetsValidator(os.path.dirname(mets_path))
+    validator.validate_mets(mets_path)
+    return next((ref for ref in validator.file_refs if ref and ref.path == path), None)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--lookups', type=int, default=100)
+    args = parser.parse_args()
+    print('{:>10} {:>10} {:>10} {:>10} {:>12}'.format('files', 'parse s', 'build s',
+                                                     'digest s', 'lookup ms'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            mets_path = mets_gen.write_mets(os.path.join(tmp, 'METS.xml'), file_count=size)
+            index = FileIndex(os.path.join(tmp, 'index-{}.db'.format(size)))
+            start = time.perf_counter()
+            digest = index.build(mets_path)
+            build = time.perf_counter() - start
+            paths = [ref.path for ref in index.file_refs(digest)]
+            paths = paths[::max(1, len(paths) // args.lookups)][:args.lookups]
+            start = time.perf_counter()
+            expected = parse_lookup(mets_path, paths[-1])
+            parse = time.perf_counter() - start
+            start = time.perf_counter()
+            mets_digest(mets_path)
+            hashed = time.perf_counter() - start
+            start = time.perf_counter()
+            for path in paths:
+                found = index.lookup(digest, path)
+            lookup = (time.perf_counter() - start) / len(paths)
+            assert found.checksum.value == expected.checksum.value
+            print('{:>10} {:>10.2f} {:>10.2f} {:>10.3f} {:>12.3f}'.format(
+                size, parse, build, hashed, lookup * 1000))
+            os.remove(mets_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: fixity check throughput of METS file references by number of hashing
+threads. Each run reads every file so the second and later runs are served from
+the page cache, use files larger than memory to measure disk throughput.
+
+    python benchmarks/fixity.py [--files N] [--size MB] [--workers N [N ...]]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from swagger_server.forge import fixity # noqa: E402
+from swagger_server.forge.metadata import FileRef # noqa: E402
+from swagger_server.models import Checksum, ChecksumAlg # noqa: E402
+
+
+def write_files(root, count, size):
+    """Write count files of size bytes under root, returns their FileRefs."""
+    file_refs = []
+    for index in range(count):
+        name = 'file-{}.bin'.format(index)
+        data = os.urandom(size)
+        with open(os.path.join(root, name), 'wb') as _f:
+            _f.write(data)
+        checksum = Checksum(ChecksumAlg.SHA256, hashlib.sha256(data).hexdigest())
+        file_refs.append(FileRef(name, str(size), checksum))
+    return file_refs
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=64)
+    parser.add_argument('--size', type=int, default=16, help='file size in MB')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        file_refs = write_files(tmp, args.files, args.size * 1024 * 1024)
+        total = args.files * args.size
+        print('{:>8} {:>10} {:>10}'.format('workers', 'seconds', 'MB/s'))
+        for workers in args.workers:
+            start = time.perf_counter()
+            checks = fixity.check_file_refs(tmp, file_refs, workers=workers)
+            elapsed = time.perf_counter() - start
+            assert not checks.messages
+            print('{:>8} {:>10.3f} {:>10.1f}'.format(workers, elapsed, total / elapsed))
+
+
+if __name__ == '__main__':
+    main()
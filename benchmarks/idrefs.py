@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: time of the METS ID and IDREF cross-reference check on METS files with
+growing fileSecs, over an already parsed document and as part of the streaming
+validation pass. Times per element should stay flat as the document grows.
+
+    python benchmarks/idrefs.py [--sizes 1000 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mets_gen # noqa: E402
+from swagger_server.forge import idrefs # noqa: E402
+from swagger_server.forge.metadata import MetsValidator # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def streamed(mets_path, references):
+    """Return the seconds taken by a streaming validation of mets_path."""
+    start = time.perf_counter()
+    validator = MetsValidator(os.path.dirname(mets_path), streaming=True,
+                              on_file_ref=lambda _: None, references=references)
+    validator.validate_mets(mets_path)
+    return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    args = parser.parse_args()
+    print('{:>10} {:>10} {:>12} {:>12} {:>12}'.format('files', 'elements', 'tree s',
+                                                     'tree us/el', 'stream +s'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            mets_path = mets_gen.write_mets(os.path.join(tmp, 'METS.xml'), file_count=size)
+            tree = etree.parse(mets_path)
+            elements = sum(1 for _ in tree.getroot().iter())
+            start = time.perf_counter()
+            results = idrefs.check_tree(mets_path, tree)
+            checked = time.perf_counter() - start
+            del tree
+            extra = streamed(mets_path, True) - streamed(mets_path, False)
+            print('{:>10} {:>10} {:>12.3f} {:>12.3f} {:>12.3f}'.format(
+                size, elements, checked, checked / elements * 1e6, extra))
+            assert not [result for result in results if result.rule_id != idrefs.IDREF_TARGET]
+            os.remove(mets_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: metadata validation with fixity checks of a generated package, without
+a cache, with a result cache and with an incremental snapshot, then re-validated
+with the snapshot after editing one data file and after editing a representation
+METS. File times are set in the past so their digests can be recorded.
+
+    python benchmarks/incremental.py [--files 2000] [--reps 2] [--size KB]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mets_gen # noqa: E402
+from swagger_server.forge.cache import ResultCache, Snapshot # noqa: E402
+from swagger_server.forge.metadata import validate_ip # noqa: E402
+
+PAST = time.time() - 3600
+
+
+def write_data(root, file_count, size):
+    """Write file_count data files of size bytes to root/data."""
+    os.makedirs(os.path.join(root, 'data'), exist_ok=True)
+    for index in range(file_count):
+        touch(os.path.join(root, 'data', 'file{}.bin'.format(index)), os.urandom(size))
+
+
+def touch(path, content):
+    """Write content to path and set its times an hour in the past."""
+    with open(path, 'wb') as _f:
+        _f.write(content)
+    os.utime(path, (PAST, PAST))
+
+
+def timed(label, root, cache):
+    """Validate the package at root and print the elapsed seconds."""
+    start = time.perf_counter()
+    validate_ip(root, checksums=True, cache=cache)
+    print('{:<32} {:>10.3f}'.format(label, time.perf_counter() - start))
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2000, help='data files per METS')
+    parser.add_argument('--reps', type=int, default=2)
+    parser.add_argument('--size', type=int, default=1024, help='data file size in KB')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = mets_gen.write_package(os.path.join(tmp, 'ip'), file_count=args.files,
+                                      reps=args.reps, rep_file_count=args.files)
+        rep_root = os.path.join(root, 'representations', mets_gen.rep_name(0))
+        for folder in [root] + [os.path.join(root, 'representations', mets_gen.rep_name(i))
+                                for i in range(args.reps)]:
+            write_data(folder, args.files, args.size * 1024)
+            # Declare the data file size so the files are hashed
+            mets_path = os.path.join(folder, 'METS.xml')
+            with open(mets_path, 'rb') as _f:
+                mets = _f.read()
+            touch(mets_path, mets.replace(b'SIZE="1024"',
+                                          'SIZE="{}"'.format(args.size * 1024).encode()))
+        print('{:<32} {:>10}'.format('run', 'seconds'))
+        timed('no cache', root, None)
+        cache = ResultCache(os.path.join(tmp, 'cache.db'))
+        timed('result cache, first run', root, cache)
+        timed('result cache, unchanged', root, cache)
+        snapshot = Snapshot(os.path.join(tmp, 'snapshot.db'))
+        timed('snapshot, first run', root, snapshot)
+        timed('snapshot, unchanged', root, snapshot)
+        touch(os.path.join(root, 'data', 'file0.bin'), os.urandom(args.size * 1024))
+        timed('snapshot, one data file edited', root, snapshot)
+        mets_path = os.path.join(rep_root, 'METS.xml')
+        with open(mets_path, 'rb') as _f:
+            mets = _f.read()
+        touch(mets_path, mets.replace(b'LABEL="rep1"', b'LABEL="rep1 edited"'))
+        timed('snapshot, rep METS edited', root, snapshot)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: building the manifest of a tree of small files with the previous list
+based entries_from_dir and with the streaming builder, then the peak Python memory
+of a streamed summary that doesn't keep the entries against the full manifest.
+
+    python benchmarks/manifest_builder.py [--files 1000000] [--per-folder 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from swagger_server.forge import MODEL, manifests # noqa: E402
+
+
+def write_tree(root, file_count, per_folder):
+    """Write file_count 16 byte files to root, per_folder to a folder."""
+    for index in range(file_count):
+        folder = os.path.join(root, 'data', 'd{}'.format(index // per_folder))
+        if index % per_folder == 0:
+            os.makedirs(folder)
+        fd = os.open(os.path.join(folder, 'f{}.bin'.format(index)), os.O_WRONLY | os.O_CREAT)
+        os.write(fd, b'0123456789abcdef')
+        os.close(fd)
+
+
+def previous(root_dir, checksum_algs=None, recurse=True):
+    """The entries_from_dir used before the streaming builder."""
+    entries = []
+    for root, dirs, files in os.walk(root_dir):
+        if recurse:
+            for directory in dirs:
+                entries = entries + previous(directory, checksum_algs, recurse)
+        for file in files:
+            entries.append(manifests.entry_from_file(os.path.join(root, file), checksum_algs))
+    return entries
+
+
+def streamed_summary(root):
+    """Count and size the manifest entries of root without keeping them."""
+    summary = MODEL.ManifestSummary(file_count=0, total_size=0)
+    for _ in manifests.summarised(manifests.iter_entries(root), summary):
+        pass
+    return summary
+
+
+def timed(label, run, root):
+    """Run run(root), print the elapsed seconds and return the result."""
+    start = time.perf_counter()
+    result = run(root)
+    print('{:<24} {:>10.3f} s'.format(label, time.perf_counter() - start))
+    return result
+
+
+def peak(label, run, root):
+    """Print the peak traced memory of run(root)."""
+    tracemalloc.start()
+    run(root)
+    _, highest = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<24} {:>10.1f} MB'.format(label, highest / 1024 / 1024))
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=1000000)
+    parser.add_argument('--per-folder', type=int, default=1000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_tree(tmp, args.files, args.per_folder)
+        entries = timed('previous', previous, tmp)
+        manifest = timed('streaming manifest', manifests.manifest_from_directory, tmp)
+        summary = timed('streamed summary', streamed_summary, tmp)
+        assert len(entries) == manifest.summary.file_count == summary.file_count == args.files
+        del entries, manifest
+        peak('streamed summary', streamed_summary, tmp)
+        peak('streaming manifest', manifests.manifest_from_directory, tmp)
+
+
+if __name__ == '__main__':
+    main()
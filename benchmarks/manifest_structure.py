@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: structure checks of a package from the entry paths of its Manifest as
+the number of entries grows, the time per entry should stay flat.
+
+    python benchmarks/manifest_structure.py [--entries 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from swagger_server.forge import MODEL # noqa: E402
+from swagger_server.forge.tests import Structure # noqa: E402
+
+ROOT = '/archive/tape-0001/ip-1'
+FIXED = ['METS.xml', 'metadata/descriptive/ead.xml', 'metadata/preservation/premis.xml',
+         'schemas/mets.xsd', 'documentation/readme.txt']
+
+
+def manifest(entry_count, reps=4, folders=100):
+    """Return a Manifest of a package with entry_count data files spread over reps
+    representations, each with folders data sub-folders."""
+    entries = [MODEL.ManifestEntry('{}/{}'.format(ROOT, path), 1024, []) for path in FIXED]
+    for index in range(entry_count):
+        rep = 'representations/rep{}'.format(index % reps + 1)
+        entries.append(MODEL.ManifestEntry('{}/{}/data/d{}/file{}.bin'.format(
+            ROOT, rep, index % folders, index), 1024, []))
+    for index in range(reps):
+        entries.append(MODEL.ManifestEntry('{}/representations/rep{}/METS.xml'.format(
+            ROOT, index + 1), 1024, []))
+    return MODEL.Manifest(source='filesystem', entries=entries)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+    print('{:>10} {:>10} {:>14}'.format('entries', 'seconds', 'us per entry'))
+    for entry_count in args.entries:
+        to_test = manifest(entry_count)
+        start = time.perf_counter()
+        results = Structure.from_manifest(to_test, ROOT)
+        elapsed = time.perf_counter() - start
+        assert results.status == MODEL.StructStatus.WELLFORMED
+        print('{:>10} {:>10.3f} {:>14.2f}'.format(len(to_test.entries), elapsed,
+                                                   elapsed * 1e6 / len(to_test.entries)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Synthetic CSIP style METS documents and package trees for the benchmarks.
+"""
+import os
+
+METS_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    xmlns:csip="https://DILCIS.eu/XML/METS/CSIPExtensionMETS"
+    OBJID="{objid}" TYPE="Text" PROFILE="https://earkcsip.dilcis.eu/profile/E-ARK-CSIP.xml"
+    csip:CONTENTINFORMATIONTYPE="MIXED" LABEL="{objid}">
+  <mets:metsHdr CREATEDATE="2020-01-01T00:00:00" csip:OAISPACKAGETYPE="SIP">
+    <mets:agent ROLE="CREATOR" TYPE="OTHER" OTHERTYPE="SOFTWARE">
+      <mets:name>benchmark</mets:name>
+      <mets:note csip:NOTETYPE="SOFTWARE VERSION">1.0</mets:note>
+    </mets:agent>
+  </mets:metsHdr>
+  <mets:dmdSec ID="dmd-1" CREATED="2020-01-01T00:00:00" STATUS="CURRENT">
+    <mets:mdRef ID="dmd-ref-1" LOCTYPE="URL" xlink:type="simple"
+        xlink:href="metadata/descriptive/dc.xml" MDTYPE="DC" MIMETYPE="text/xml"
+        SIZE="1024" CREATED="2020-01-01T00:00:00" CHECKSUM="{checksum}" CHECKSUMTYPE="SHA-256"/>
+  </mets:dmdSec>
+  <mets:amdSec ID="amd-1">
+    <mets:digiprovMD ID="digiprov-1" STATUS="CURRENT">
+      <mets:mdRef ID="digiprov-ref-1" LOCTYPE="URL" xlink:type="simple"
+          xlink:href="metadata/preservation/premis.xml" MDTYPE="PREMIS" MIMETYPE="text/xml"
+          SIZE="1024" CREATED="2020-01-01T00:00:00" CHECKSUM="{checksum}" CHECKSUMTYPE="SHA-256"/>
+    </mets:digiprovMD>
+  </mets:amdSec>
+  <mets:fileSec ID="file-sec-1">
+"""
+FILE_GRP_HEAD = """    <mets:fileGrp ID="{grp_id}" USE="{use}"{extra}>
+"""
+FILE = """      <mets:file ID="{file_id}" MIMETYPE="application/octet-stream" SIZE="{size}"
+          CREATED="2020-01-01T00:00:00" CHECKSUM="{checksum}" CHECKSUMTYPE="SHA-256">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="{href}"/>
+      </mets:file>
+"""
+FILE_GRP_TAIL = """    </mets:fileGrp>
+"""
+METS_TAIL = """  </mets:fileSec>
+  <mets:structMap ID="struct-map-1" TYPE="PHYSICAL" LABEL="CSIP">
+    <mets:div ID="div-root" LABEL="{objid}">
+      <mets:div ID="div-md" LABEL="Metadata" ADMID="amd-1" DMDID="dmd-1"/>
+      <mets:div ID="div-docs" LABEL="Documentation">
+        <mets:fptr FILEID="grp-docs"/>
+      </mets:div>
+      <mets:div ID="div-schemas" LABEL="Schemas">
+        <mets:fptr FILEID="grp-schemas"/>
+      </mets:div>
+{rep_divs}    </mets:div>
+  </mets:structMap>
+</mets:mets>
+"""
+REP_DIV = """      <mets:div ID="div-{rep}" LABEL="Representations/{rep}">
+        <mets:mptr LOCTYPE="URL" xlink:type="simple" xlink:title="grp-{rep}"
+            xlink:href="representations/{rep}/METS.xml"/>
+      </mets:div>
+"""
+CHECKSUM = '0' * 64
+
+
+def rep_name(index):
+    """Return the folder name of representation number index."""
+    return 'rep{}'.format(index + 1)
+
+
+def write_mets(dest, objid='benchmark', file_count=10, reps=0, data_prefix='data'):
+    """Write a CSIP style METS document describing file_count data files and
+    reps representations to the path dest."""
+    with open(dest, 'w', encoding='UTF-8') as _f:
+        _f.write(METS_HEAD.format(objid=objid, checksum=CHECKSUM))
+        _write_file_grp(_f, 'grp-docs', 'Documentation',
+                        ['documentation/readme.txt'])
+        _write_file_grp(_f, 'grp-schemas', 'Schemas', ['schemas/mets.xsd'])
+        for index in range(reps):
+            rep = rep_name(index)
+            _write_file_grp(_f, 'grp-{}'.format(rep), 'Representations/{}'.format(rep),
+                            ['representations/{}/METS.xml'.format(rep)],
+                            extra=' csip:CONTENTINFORMATIONTYPE="MIXED"')
+        _write_file_grp(_f, 'grp-data', 'Representations',
+                        ('{}/file{}.bin'.format(data_prefix, i) for i in range(file_count)),
+                        extra=' csip:CONTENTINFORMATIONTYPE="MIXED"')
+        rep_divs = ''.join(REP_DIV.format(rep=rep_name(i)) for i in range(reps))
+        _f.write(METS_TAIL.format(objid=objid, rep_divs=rep_divs))
+    return dest
+
+
+def write_package(root, file_count=10, reps=0, rep_file_count=10):
+    """Create a package folder skeleton at root with a root METS.xml and reps
+    representations, each with its own METS.xml. No data files are written."""
+    for folder in ['metadata/descriptive', 'metadata/preservation', 'documentation', 'schemas']:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+    write_mets(os.path.join(root, 'METS.xml'), file_count=file_count, reps=reps)
+    for index in range(reps):
+        rep_root = os.path.join(root, 'representations', rep_name(index))
+        for folder in ['data', 'metadata']:
+            os.makedirs(os.path.join(rep_root, folder), exist_ok=True)
+        write_mets(os.path.join(rep_root, 'METS.xml'), objid=rep_name(index),
+                   file_count=rep_file_count)
+    return root
+
+
+def _write_file_grp(out, grp_id, use, hrefs, extra=''):
+    out.write(FILE_GRP_HEAD.format(grp_id=grp_id, use=use, extra=extra))
+    for index, href in enumerate(hrefs):
+        out.write(FILE.format(file_id='{}-file-{}'.format(grp_id, index), size=1024,
+                              checksum=CHECKSUM, href=href))
+    out.write(FILE_GRP_TAIL)
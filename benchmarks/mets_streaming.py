@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: peak memory and time of MetsValidator on METS files with growing
+fileSecs, comparing the default parse with the bounded memory streaming mode.
+Each run happens in a fresh process so peak RSS figures are independent.
+
+    python benchmarks/mets_streaming.py [--sizes 1000 10000 100000 1000000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mets_gen # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def run_child(mets_path, streaming):
+    """Validate mets_path and print the elapsed seconds and peak RSS in KiB."""
+    from swagger_server.forge.metadata import MetsValidator
+    ref_count = 0
+
+    def count_ref(_):
+        nonlocal ref_count
+        ref_count += 1
+
+    start = time.perf_counter()
+    validator = MetsValidator(os.path.dirname(mets_path), streaming=streaming,
+                              on_file_ref=count_ref)
+    validator.validate_mets(mets_path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(elapsed, peak, ref_count)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child[0], args.child[1] == 'streaming')
+        return
+    print('{:>10} {:>10} {:>10} {:>12}'.format('files', 'mode', 'seconds', 'peak MiB'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            mets_path = mets_gen.write_mets(os.path.join(tmp, 'METS.xml'), file_count=size)
+            for mode in ['parsed', 'streaming']:
+                output = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                         '--child', mets_path, mode],
+                                        check=True, capture_output=True, text=True).stdout
+                elapsed, peak, _ = output.split()
+                print('{:>10} {:>10} {:>10.2f} {:>12.1f}'.format(size, mode, float(elapsed),
+                                                                 int(peak) / 1024))
+            os.remove(mets_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: MD5, SHA1 and SHA256 checksums of one large file, read once per
+algorithm as entry_from_file did before, read once for all of them, and read once
+with the digests updated in parallel threads. The bytes read are counted.
+
+    python benchmarks/multi_digest.py [--size MB]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from swagger_server.forge import manifests # noqa: E402
+from swagger_server.forge.manifests import Checksums # noqa: E402
+from swagger_server.models import ChecksumAlg # noqa: E402
+
+ALGORITHMS = [ChecksumAlg.MD5, ChecksumAlg.SHA1, ChecksumAlg.SHA256]
+
+
+def per_algorithm(path):
+    """Read the file once per algorithm."""
+    return [Checksums.from_file(path, algorithm) for algorithm in ALGORITHMS]
+
+
+def single_read(path):
+    """Read the file once for every algorithm."""
+    return Checksums.all_from_file(path, ALGORITHMS)
+
+
+def parallel(path):
+    """Read the file once, updating the digests in parallel."""
+    return Checksums.all_from_file(path, ALGORITHMS, blocksize=manifests.PARALLEL_BLOCKSIZE,
+                                   parallel=True)
+
+
+def measured(run, path):
+    """Return the result, seconds and bytes read of run(path)."""
+    read = [0]
+    real_open = open
+
+    def counting_open(*args, **kwargs):
+        opened = real_open(*args, **kwargs)
+        real_read = opened.read
+
+        def counting_read(*read_args):
+            data = real_read(*read_args)
+            read[0] += len(data)
+            return data
+        opened.read = counting_read
+        return opened
+    with mock.patch('builtins.open', counting_open):
+        start = time.perf_counter()
+        result = run(path)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, read[0]
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=512, help='file size in MB')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.bin')
+        block = os.urandom(io.DEFAULT_BUFFER_SIZE * 128)
+        with open(path, 'wb') as _f:
+            for _ in range(args.size * 1024 * 1024 // len(block)):
+                _f.write(block)
+        print('{:<16} {:>10} {:>12}'.format('run', 'seconds', 'MB read'))
+        expected = None
+        for label, run in (('per algorithm', per_algorithm), ('single read', single_read),
+                           ('parallel', parallel)):
+            result, elapsed, read = measured(run, path)
+            expected = expected or result
+            assert result == expected
+            print('{:<16} {:>10.3f} {:>12.0f}'.format(label, elapsed, read / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: the file system calls of the structure checks, manifest sizes and fixity
+size checks of a generated package, each scanning the package on its own as they
+did before, and sharing one PackageTree snapshot. Calls are counted where Python
+makes them, os.DirEntry.stat calls of the snapshot are counted as stat calls.
+
+    python benchmarks/package_tree.py [--files 10000] [--reps 4]
+"""
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mets_gen # noqa: E402
+from swagger_server.forge import fixity, structure # noqa: E402
+from swagger_server.forge.metadata import FileRef # noqa: E402
+from swagger_server.forge.packagetree import PackageTree # noqa: E402
+
+
+def folders_and_files(dir_to_scan):
+    """The listing StructTests used before the snapshot."""
+    folders, files = set(), set()
+    if os.path.isdir(dir_to_scan):
+        for entry in os.listdir(dir_to_scan):
+            path = os.path.join(dir_to_scan, entry)
+            if os.path.isfile(path):
+                files.add(entry)
+            elif os.path.isdir(path):
+                folders.add(entry)
+    return folders, files
+
+
+def separate_scans(root, file_refs):
+    """Structure checks, manifest sizes and fixity stats, each on its own."""
+    folders, _ = folders_and_files(root)
+    if 'metadata' in folders:
+        folders_and_files(os.path.join(root, 'metadata'))
+    reps = os.path.join(root, 'representations')
+    if os.path.isdir(reps):
+        for entry in os.listdir(reps):
+            rep_folders, _ = folders_and_files(os.path.join(reps, entry))
+            if 'metadata' in rep_folders:
+                folders_and_files(os.path.join(reps, entry, 'metadata'))
+    for folder, _, files in os.walk(root):
+        for name in files:
+            os.path.getsize(os.path.join(folder, name))
+    fixity.check_file_refs(root, file_refs)
+
+
+def shared_tree(root, file_refs):
+    """The same checks sharing a PackageTree."""
+    tree = PackageTree.from_directory(root)
+    structure.PackageStructTests(root, tree)
+    for _, entry in tree.walk_files():
+        entry.stat()
+    fixity.check_file_refs(root, file_refs, tree=tree)
+    return tree
+
+
+def counted(run, *args):
+    """Return the seconds run takes and its Counter of os calls."""
+    counts = collections.Counter()
+
+    def wrap(name):
+        call = getattr(os, name)
+
+        def wrapped(*wrapped_args, **kwargs):
+            counts[name] += 1
+            return call(*wrapped_args, **kwargs)
+        return wrapped
+    names = ('stat', 'listdir', 'scandir')
+    patches = [mock.patch('os.' + name, wrap(name)) for name in names]
+    for patch in patches:
+        patch.start()
+    try:
+        start = time.perf_counter()
+        result = run(*args)
+        elapsed = time.perf_counter() - start
+    finally:
+        for patch in patches:
+            patch.stop()
+    if isinstance(result, PackageTree):
+        counts['stat'] += sum(1 for _ in result.walk_files())
+    return elapsed, counts
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=10000, help='data files per representation')
+    parser.add_argument('--reps', type=int, default=4)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = mets_gen.write_package(tmp, reps=args.reps)
+        file_refs = []
+        for index in range(args.reps):
+            data = os.path.join('representations', mets_gen.rep_name(index), 'data')
+            for number in range(args.files):
+                path = os.path.join(data, 'file{}.bin'.format(number))
+                with open(os.path.join(root, path), 'wb') as _f:
+                    _f.write(b'0' * 16)
+                file_refs.append(FileRef(path, '16', None))
+        print('{:<16} {:>10} {:>10} {:>10}'.format('run', 'seconds', 'listings', 'stats'))
+        for label, run in (('separate scans', separate_scans), ('shared tree', shared_tree)):
+            elapsed, counts = counted(run, root, file_refs)
+            print('{:<16} {:>10.3f} {:>10} {:>10}'.format(
+                label, elapsed, counts['listdir'] + counts['scandir'], counts['stat']))
+
+
+if __name__ == '__main__':
+    main()
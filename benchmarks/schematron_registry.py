@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: per package cost of Schematron validation with and without the
+process wide compiled rules registry.
+
+    python benchmarks/schematron_registry.py [--packages N] [--files N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from swagger_server.forge.metadata import RULES_REGISTRY, ValidationProfile # noqa: E402
+
+import mets_gen # noqa: E402
+
+
+def validate_package(mets_path, recompile, merged=False):
+    """Validate one package as validate_ip does, a new profile per package."""
+    if recompile:
+        # Reproduces the previous behaviour, every profile compiled its rules
+        RULES_REGISTRY.clear()
+    profile = ValidationProfile(merged=merged)
+    profile.validate(mets_path)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--packages', type=int, default=50)
+    parser.add_argument('--files', type=int, default=100)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        mets_path = mets_gen.write_mets(os.path.join(tmp, 'METS.xml'), file_count=args.files)
+        for label, recompile, merged in [('compile per profile', True, False),
+                                         ('shared registry', False, False),
+                                         ('merged rules', False, True)]:
+            RULES_REGISTRY.clear()
+            elapsed = timeit.timeit(lambda: validate_package(mets_path, recompile, merged),
+                                    number=args.packages)
+            print('{:<20} {:>8.2f} ms/package'.format(label, elapsed * 1000 / args.packages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: ip-check start up time, for --version and for a structure only run
+of a generated package, along with the import time of the specification module.
+Each command is run in a fresh interpreter.
+
+    python benchmarks/startup.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import mets_gen # noqa: E402
+
+
+def time_command(args, runs):
+    """Return the median and best wall clock seconds of running args runs times."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT,
+                                                               os.environ.get('PYTHONPATH')])))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=False)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), min(times)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        package = mets_gen.write_package(os.path.join(tmp, 'package'), reps=1)
+        commands = [
+            ('python (baseline)', [sys.executable, '-c', 'pass']),
+            ('ip-check --version', [sys.executable, '-m', 'swagger_server.cli.app',
+                                    '--version']),
+            ('ip-check --structure', [sys.executable, '-m', 'swagger_server.cli.app',
+                                      '--structure', package]),
+            ('import specification', [sys.executable, '-c',
+                                      'import swagger_server.forge.specification'])
+        ]
+        print('{:<22} {:>10} {:>10}'.format('command', 'median ms', 'best ms'))
+        for label, command in commands:
+            median, best = time_command(command, args.runs)
+            print('{:<22} {:>10.1f} {:>10.1f}'.format(label, median * 1000, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Benchmark: package metadata validation time as the number of representations
+grows, comparing the previous nested loop, which Schematron validated every
+representation once per passing schema result, with the ValidationPlan that
+checks each METS document once.
+
+    python benchmarks/validation_plan.py [--reps 1 10 100] [--files N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from swagger_server.forge.metadata import ( # noqa: E402
+    MetsValidator,
+    ValidationPlan,
+    ValidationProfile
+)
+
+import mets_gen # noqa: E402
+
+
+def nested_loop(root):
+    """The representation loop validate_ip used before the validation plan."""
+    schema_results = {}
+    validator = MetsValidator(root)
+    mets_path = os.path.join(root, 'METS.xml')
+    schema_results['root'] = validator.validate_mets(mets_path)
+    for mets in validator.subsequent_mets:
+        sub_validator = MetsValidator(mets[1].path)
+        schema_results[mets[0]] = sub_validator.validate_mets(os.path.join(root, mets[1].path))
+    profile = ValidationProfile()
+    profile.validate(mets_path)
+    for result in schema_results.values():
+        if result[0]:
+            for mets in validator.subsequent_mets:
+                profile.validate(os.path.join(root, mets[1].path), False)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reps', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--files', type=int, default=100)
+    args = parser.parse_args()
+    print('{:>6} {:>14} {:>14} {:>12} {:>12}'.format('reps', 'nested loop s', 'plan s',
+                                                   'schema s', 'schematron s'))
+    for reps in args.reps:
+        with tempfile.TemporaryDirectory() as tmp:
+            mets_gen.write_package(tmp, file_count=args.files, reps=reps,
+                                   rep_file_count=args.files)
+            start = time.perf_counter()
+            nested_loop(tmp)
+            nested = time.perf_counter() - start
+            plan = ValidationPlan(tmp)
+            start = time.perf_counter()
+            plan.run()
+            planned = time.perf_counter() - start
+            schema = sum(t.steps[ValidationPlan.SCHEMA] for t in plan.timings.values())
+            schematron = sum(t.steps[ValidationPlan.SCHEMATRON] for t in plan.timings.values())
+            print('{:>6} {:>14.3f} {:>14.3f} {:>12.3f} {:>12.3f}'.format(reps, nested, planned,
+                                                                       schema, schematron))
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,7 @@ setup(
             'swagger_server=swagger_server.__main__:main',
             'ip-check = swagger_server.cli.app:main',
             'corp-check = swagger_server.cli.corpora:main',
+            'ip-bundle = swagger_server.cli.bundle:main',
         ]},
     long_description="""\
     # REST API definition for E-ARK Information package validation For further details see [E-ARK information package validation](https://earkcsip.dilcis.eu/).
@@ -34,6 +34,10 @@ import sys
 import swagger_server.cli.testcases as TC
 import swagger_server.cli.java_runner as JR
 import swagger_server.forge.packages as PKG
+from swagger_server.forge.cache import ResultCache, Snapshot
+from swagger_server.forge.fileindex import FileIndex
+from swagger_server.forge.metadata import (ALL_RULES, RuleSelection, ValidationProfile,
+                                            get_rule_requirements)
 from swagger_server.models import ValidationReport
 
 __version__ = "0.1.0"
@@ -89,6 +93,72 @@ def parse_command_line():
                         dest="structureFlag",
                         default=False,
                         help="run package structure tests only")
+    PARSER.add_argument('--workers', '-w',
+                        type=int,
+                        dest="workers",
+                        default=1,
+                        help="number of processes used to validate representation METS files")
+    PARSER.add_argument('--engine', '-e',
+                        choices=['xslt', 'xpath'],
+                        dest="engine",
+                        default='xslt',
+                        help="Schematron rules engine used for METS metadata validation")
+    PARSER.add_argument('--merged', '-m',
+                        action="store_true",
+                        dest="merged",
+                        default=False,
+                        help="run the Schematron rules for all METS sections as one transform")
+    caching = PARSER.add_mutually_exclusive_group()
+    caching.add_argument('--cache',
+                         dest="cache",
+                         default=None,
+                         metavar='DB',
+                         help="SQLite file used to cache METS validation results between runs")
+    caching.add_argument('--incremental', '-i',
+                         dest="incremental",
+                         default=None,
+                         metavar='DB',
+                         help="SQLite snapshot of previous runs, only the checks of METS and "
+                              "data files changed since are run again")
+    PARSER.add_argument('--index',
+                        dest="index",
+                        default=None,
+                        metavar='DB',
+                        help="SQLite file used to index the files each METS references")
+    PARSER.add_argument('--references',
+                        action="store_true",
+                        dest="references",
+                        default=False,
+                        help="check METS element IDs are unique and ID references resolve")
+    PARSER.add_argument('--fail-fast', '-f',
+                        action="store_true",
+                        dest="failFast",
+                        default=False,
+                        help="stop validating a package at the first error")
+    PARSER.add_argument('--sections',
+                        nargs='+',
+                        choices=list(ValidationProfile.SECTIONS),
+                        dest="sections",
+                        default=None,
+                        help="only run the Schematron rules for these METS sections")
+    PARSER.add_argument('--rules',
+                        nargs='+',
+                        dest="rules",
+                        default=None,
+                        metavar='RULE_ID',
+                        help="only run these Schematron rules, ids may use * wildcards, "
+                             "e.g. CSIP1*")
+    PARSER.add_argument('--severities',
+                        nargs='+',
+                        choices=list(RuleSelection.SEVERITIES),
+                        dest="severities",
+                        default=None,
+                        help="only run Schematron rules of these severities")
+    PARSER.add_argument('--timings',
+                        action="store_true",
+                        dest="timings",
+                        default=False,
+                        help="print the time spent on each validation phase and METS check")
     PARSER.add_argument('--version',
                         action='version',
                         version=__version__)
@@ -114,12 +184,31 @@ def main():
     print('Exiting with {}'.format(_exit))
     sys.exit(_exit)
 
+def _selection(args):
+    if not (args.sections or args.rules or args.severities):
+        return ALL_RULES
+    severities = [RuleSelection.SEVERITIES[name] for name in args.severities or []]
+    return RuleSelection(sections=args.sections, rules=args.rules, severities=severities)
+
+def _cache(args):
+    if args.incremental:
+        return Snapshot(args.incremental)
+    return ResultCache(args.cache) if args.cache else None
+
 def _process_ips(args):
     # Iterate the file arguments
     _exit = 0
+    cache = _cache(args)
+    index = FileIndex(args.index) if args.index else None
     for file_arg in args.files:
         # Get the package root and find out if this is something we can validate
-        ret_stat, _ = _process_ip(file_arg, args.structureFlag)
+        ret_stat, _ = _process_ip(file_arg, args.structureFlag, workers=args.workers,
+                                  engine=args.engine, merged=args.merged,
+                                  checksums=args.inputChecksumFlag,
+                                  cache=cache, fail_fast=args.failFast,
+                                  selection=_selection(args),
+                                  index=index, references=args.references,
+                                  verbose=args.outputVerboseFlag, instrument=args.timings)
         # if ret_stat > 0 then this is somethign we can't handle
         if ret_stat > 0:
             sys.stderr.write(EXIT_CODES[ret_stat].format(file_arg))
@@ -128,15 +217,24 @@ def _process_ips(args):
             continue
     return _exit
 
-def _process_ip(info_pack, struct_only):
+def _process_ip(info_pack, struct_only, workers=None, engine='xslt', merged=False,
+                checksums=False, cache=None, fail_fast=False, selection=ALL_RULES,
+                index=None, references=False, verbose=False, instrument=False):
     to_validate = info_pack
     try:
-        to_validate, _ = PKG.get_ip_root(info_pack)
+        # Structure checks read archives without unpacking them
+        to_validate, _ = PKG.get_ip_root(info_pack, unpack=not struct_only)
     except FileNotFoundError:
         return 1, info_pack
     except ValueError:
         return 2, info_pack
-    is_valid, validation_report = PKG.validate(to_validate, struct_only=struct_only)
+    timings = {} if instrument else None
+    is_valid, validation_report = PKG.validate(to_validate, struct_only=struct_only,
+                                               workers=workers, engine=engine,
+                                               checksums=checksums, cache=cache,
+                                               fail_fast=fail_fast, selection=selection,
+                                               index=index, references=references,
+                                               timings=timings, merged=merged)
     ret_code, file_name, stderr = JR.java_runner(to_validate)
     print('ret: {}, stdout: {}'.format(ret_code, file_name))
     if ret_code == 0:
@@ -153,14 +251,52 @@ def _process_ip(info_pack, struct_only):
         print(stderr)
         print('')
     print(validation_report)
+    if verbose:
+        _print_requirements(validation_report)
+    if timings is not None:
+        _print_timings(timings)
     return 0, None
 
+def _print_requirements(validation_report):
+    """Print the specification requirement of each metadata validation message."""
+    if validation_report.metadata is None:
+        return
+    requirements = get_rule_requirements()
+    metadata = validation_report.metadata
+    # Schematron results are (is_valid, MetadataChecks) tuples by METS document name
+    for checks in [metadata.schema_results] + \
+            [checks for _, checks in metadata.schematron_results.values()]:
+        for result in checks.messages:
+            requirement = requirements.get(result.rule_id)
+            if requirement is not None:
+                print('{} {} [{}] {}: {}'.format(result.severity, requirement.id,
+                                                 requirement.level, requirement.name,
+                                                 result.location))
+
+def _print_timings(timings):
+    """Print the Timings of each validation phase and METS document, by path."""
+    for path, timing in timings.items():
+        print('{}: {}'.format(path, timing))
+        for section, steps in timing.sections.items():
+            print('    {}: {}'.format(section, ', '.join(
+                '{} {:.3f}s'.format(step, secs) for step, secs in steps.items()
+                if step != 'assertions')))
+
 def _process_test_cases(args):
     # Iterate the file arguments
     _exit = 0
+    cache = _cache(args)
+    index = FileIndex(args.index) if args.index else None
     for file_arg in args.files:
         # Get the package root and find out if this is something we can validate
-        ret_stat, path = _process_test_case(file_arg)
+        ret_stat, path = _process_test_case(file_arg, workers=args.workers,
+                                            engine=args.engine, merged=args.merged,
+                                            checksums=args.inputChecksumFlag,
+                                            cache=cache, fail_fast=args.failFast,
+                                            selection=_selection(args),
+                                            index=index, references=args.references,
+                                            verbose=args.outputVerboseFlag,
+                                            instrument=args.timings)
         # if ret_stat > 0 then this is somethign we can't handle
         if ret_stat > 0:
             sys.stderr.write(EXIT_CODES[ret_stat].format(path))
@@ -169,7 +305,9 @@ def _process_test_cases(args):
             continue
     return _exit
 
-def _process_test_case(case_path):
+def _process_test_case(case_path, workers=None, engine='xslt', merged=False,
+                       checksums=False, cache=None, fail_fast=False, selection=ALL_RULES,
+                       index=None, references=False, verbose=False, instrument=False):
     test_case = None
     try:
         test_case = TC.TestCase.from_path(case_path)
@@ -181,7 +319,14 @@ def _process_test_case(case_path):
     for rule in test_case.rules:
         for package in rule.packages:
             ret_stat, validation_report = _process_ip(package.resolve_path(case_path),
-                                                      struct_only=test_case.is_struct)
+                                                      struct_only=test_case.is_struct,
+                                                      workers=workers, engine=engine,
+                                                      merged=merged, checksums=checksums,
+                                                      cache=cache, fail_fast=fail_fast,
+                                                      selection=selection,
+                                                      index=index, references=references,
+                                                      verbose=verbose,
+                                                      instrument=instrument)
             if ret_stat > 0:
                 return ret_stat, validation_report
     return 0, case_path
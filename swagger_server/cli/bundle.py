@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+E-ARK : Information package validation
+        Build the precompiled resource bundle
+"""
+import argparse
+import json
+import os
+
+from importlib_resources import files
+
+import swagger_server.forge.resources.schematron as SCHEMATRON
+from swagger_server.forge import bundle
+from swagger_server.forge.metadata import CompiledRules, ValidationProfile, merge_rules
+from swagger_server.forge.specification import SPECIFICATIONS
+
+__version__ = "0.1.0"
+
+PARSER = argparse.ArgumentParser(description="""Build the precompiled Schematron XSLT
+and specification snapshot bundle loaded by the validators. Run this whenever the
+Schematron or profile resources change, a stale bundle is ignored.""")
+
+def parse_command_line():
+    """Parse command line arguments."""
+    PARSER.add_argument('--dest', '-d',
+                        dest="dest",
+                        default=bundle.BUNDLE_DIR,
+                        help="directory the bundle is written to")
+    PARSER.add_argument('--version',
+                        action='version',
+                        version=__version__)
+    return PARSER.parse_args()
+
+def build(dest=bundle.BUNDLE_DIR):
+    """Compile each Schematron rules file, and the standard rules merged, and snapshot
+    the specifications into dest."""
+    os.makedirs(dest, exist_ok=True)
+    manifest = os.path.join(dest, bundle.MANIFEST)
+    # A partly written bundle must never be current
+    if os.path.exists(manifest):
+        os.remove(manifest)
+    for resource in files(SCHEMATRON).iterdir():
+        if resource.name.endswith('_rules.xml'):
+            rules_path = str(resource)
+            CompiledRules.from_file(rules_path).to_bundle(bundle.rules_name(rules_path), dest)
+    sections = tuple(ValidationProfile.SECTIONS)
+    CompiledRules.from_tree(merge_rules(sections)).to_bundle(
+        bundle.rules_name(('merged',) + sections), dest)
+    with open(os.path.join(dest, bundle.SPECIFICATIONS), 'w') as _f:
+        json.dump({name: factory().to_dict() for name, factory in SPECIFICATIONS.items()},
+                  _f, separators=(',', ':'))
+    bundle.write_manifest(dest)
+
+def main():
+    """Main command line application."""
+    args = parse_command_line()
+    build(args.dest)
+    print('Resource bundle written to {}'.format(args.dest))
+
+if __name__ == "__main__":
+    main()
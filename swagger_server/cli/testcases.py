@@ -27,6 +27,7 @@ E-ARK : Information package validation
         E-ARK Test Case processing
 """
 import errno
+import functools
 import os
 
 import lxml.etree as ET
@@ -39,7 +40,12 @@ import swagger_server.forge.structure as STRUCT
 from swagger_server.forge.metadata import MetsValidator, ValidationProfile
 
 DEFAULT_NAME='testCase.xml'
-TC_SCHEMA = ET.XMLSchema(file=str(files(SCHEMA).joinpath('testCase.xsd')))
+TC_SCHEMA = str(files(SCHEMA).joinpath('testCase.xsd'))
+
+@functools.lru_cache(maxsize=None)
+def get_tc_schema():
+    """Return the test case schema, compiled on first use."""
+    return ET.XMLSchema(file=TC_SCHEMA)
 
 class TestCase():
     """
@@ -416,7 +422,7 @@ class TestCase():
                         self.schema_result = validator.validate_mets(mets_path)
                         # Now grab any errors
                         if self.schema_result is True:
-                            profile.validate(mets_path)
+                            profile.validate(validator.parsed_mets)
                             self.profile_results = profile.get_results()
                             self.schematron_result=profile.is_valid
                     self._validation_report = STRUCT.validate_package_structure(self.path)
@@ -449,7 +455,7 @@ class TestCase():
         return cls.from_xml_file(test_case_path)
 
     @classmethod
-    def from_xml_string(cls, xml, schema=TC_SCHEMA):
+    def from_xml_string(cls, xml, schema=None):
         """Create a test case from an XML string."""
         try:
             ele = ET.fromstring(xml)
@@ -458,7 +464,7 @@ class TestCase():
         return cls.from_element(ele, schema)
 
     @classmethod
-    def from_xml_file(cls, xml_file, schema=TC_SCHEMA):
+    def from_xml_file(cls, xml_file, schema=None):
         """Create a test case from an XML file."""
         tree = ET.parse(xml_file)
         return  cls._from_xml(tree, schema)
@@ -468,8 +474,9 @@ class TestCase():
         return cls.from_element(tree.getroot(), schema)
 
     @classmethod
-    def from_element(cls, case_ele, schema):
+    def from_element(cls, case_ele, schema=None):
         """Create a TestCase from an XML element."""
+        schema = schema if schema is not None else get_tc_schema()
         # Grab the testable att
         if not schema.validate(case_ele):
             details = TestCase.CaseDetails(None, str(schema.error_log.last_error))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Precompiled resource bundle, built by swagger_server.cli.bundle.
+
+The bundle holds the XSLT compiled from each Schematron rules file and a snapshot of
+the specifications. It's only used while its fingerprint matches the resources it
+was built from, otherwise callers compile from source as before.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+
+from importlib_resources import files
+from lxml import etree
+
+import swagger_server.forge.resources.compiled as COMPILED
+import swagger_server.forge.resources.profiles as PROFILES
+import swagger_server.forge.resources.schematron as SCHEMATRON
+from swagger_server.forge.structure import REQUIREMENTS
+
+# Bump when the format of the bundled files, or the code that builds them, changes
+BUNDLE_VERSION = 2
+MANIFEST = 'manifest.json'
+SPECIFICATIONS = 'specifications.json'
+BUNDLE_DIR = str(files(COMPILED))
+
+def fingerprint():
+    """Return the SHA-256 of everything the bundle is built from: the Schematron and
+    profile resources, the structural requirements and the lxml and libxslt versions
+    that compile the rules."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([BUNDLE_VERSION, etree.LXML_VERSION, etree.LIBXSLT_VERSION,
+                              REQUIREMENTS], default=lambda level: level.value,
+                             sort_keys=True).encode('utf-8'))
+    for package in (SCHEMATRON, PROFILES):
+        for resource in sorted(files(package).iterdir(), key=lambda res: res.name):
+            if resource.is_file() and resource.name.endswith('.xml'):
+                digest.update(resource.name.encode('utf-8'))
+                digest.update(resource.read_bytes())
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def is_current(bundle_dir=BUNDLE_DIR):
+    """Return True if the bundle in bundle_dir was built from the current resources."""
+    try:
+        with open(os.path.join(bundle_dir, MANIFEST), 'r') as _f:
+            manifest = json.load(_f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get('fingerprint') != fingerprint():
+        logging.debug("resource bundle %s is out of date, compiling from source", bundle_dir)
+        return False
+    return True
+
+def get_path(name, bundle_dir=BUNDLE_DIR):
+    """Return the path of the bundled file name, or None if there isn't a current
+    bundle holding it."""
+    path = os.path.join(bundle_dir, name)
+    if is_current(bundle_dir) and os.path.isfile(path):
+        return path
+    return None
+
+def rules_name(key):
+    """Return the bundle file name stem for a RulesRegistry key, either a standard
+    rules file path or a ('merged',) + sections tuple, None if it can't be bundled."""
+    if isinstance(key, tuple):
+        return 'mets_{}_rules'.format('_'.join(key))
+    if os.path.dirname(os.path.abspath(key)) == os.path.abspath(str(files(SCHEMATRON))):
+        return os.path.splitext(os.path.basename(key))[0]
+    return None
+
+def write_manifest(bundle_dir=BUNDLE_DIR):
+    """Write the manifest that marks the files in bundle_dir as current, call this
+    after every other bundle file has been written."""
+    with open(os.path.join(bundle_dir, MANIFEST), 'w') as _f:
+        json.dump({'version': BUNDLE_VERSION, 'fingerprint': fingerprint()}, _f)
+    is_current.cache_clear()
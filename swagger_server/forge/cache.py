@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Size bounded, least recently used on-disk cache of validation results.
+"""
+import json
+import os
+import sqlite3
+import time
+
+from swagger_server.forge.manifests import Checksums
+from swagger_server.models import ChecksumAlg
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Files modified this close to being hashed may change again within the timestamp
+# resolution of the file system, so their digests aren't kept
+RACY_NS = 2 * 1000 * 1000 * 1000
+
+class SQLiteStore():
+    """Base of the SQLite backed stores. The database connection is opened on first
+    use so a store can be passed to worker processes, each process opens its own
+    connection and SQLite serialises writes between them. Only the constructor
+    arguments named in STATE are pickled."""
+    STATE = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        """Return the connection for this process, creating the database if needed."""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._create(self._conn)
+            self._pid = os.getpid()
+        return self._conn
+
+    def _create(self, conn):
+        """Create the tables of the store on conn if they don't exist."""
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.STATE}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+class ResultCache(SQLiteStore):
+    """SQLite backed cache of JSON serialisable values by string key.
+
+    Entries are evicted least recently used first once the total size of the stored
+    values exceeds max_bytes."""
+    STATE = ('path', 'max_bytes')
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+
+    def _create(self, conn):
+        conn.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, '
+                     'value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+
+    def get(self, key):
+        """Return the value stored for key, or None if there isn't one."""
+        row = self.conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.conn.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """Store value for key, then evict the least recently used entries until the
+        cache is back within max_bytes."""
+        serialised = json.dumps(value, separators=(',', ':'))
+        size = len(serialised)
+        if size > self.max_bytes:
+            return
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                              (key, serialised, size, time.time()))
+            self._evict()
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        self.conn.execute('DELETE FROM results')
+
+    def digest(self, path, algorithm=ChecksumAlg.SHA256):
+        """Return the hex digest of the file at path, raises an OSError if the file
+        can't be read."""
+        return Checksums.from_file(path, algorithm).value
+
+    def get_digest(self, path, algorithm, stat):
+        """Return the digest of the file at path recorded while it had stat, or None.
+        Digests aren't recorded by a ResultCache, see Snapshot."""
+        return None
+
+    def put_digest(self, path, algorithm, stat, value):
+        """Record the digest of the file at path calculated while it had stat, a
+        ResultCache doesn't record digests."""
+
+    @property
+    def size(self):
+        """Return the total size in bytes of the stored values."""
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def _evict(self):
+        excess = self.size - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = 0
+        keys = []
+        for key, size in self.conn.execute('SELECT key, size FROM results ORDER BY accessed'):
+            keys.append((key,))
+            evicted += size
+            if evicted >= excess:
+                break
+        self.conn.executemany('DELETE FROM results WHERE key = ?', keys)
+
+class Snapshot(ResultCache):
+    """ResultCache that also records the digest of every file it hashes along with
+    a stat fingerprint of the file, its size, inode and modification and change
+    times. While the fingerprint is unchanged the recorded digest is used rather
+    than reading the file again, so re-validating a package after local edits only
+    hashes the files that changed, and results of unchanged METS documents are
+    found without hashing them. Recorded digests aren't size bounded, re-validating
+    a package replaces the entries of its files.
+
+    Unlike a ResultCache a Snapshot trusts file system metadata, a file rewritten
+    with the same size and restored times isn't hashed again."""
+    def _create(self, conn):
+        super()._create(conn)
+        # Digests are recorded one at a time, a lost write only costs a re-hash
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS digests (path TEXT NOT NULL, '
+                     'algorithm TEXT NOT NULL, stat TEXT NOT NULL, value TEXT NOT NULL, '
+                     'PRIMARY KEY (path, algorithm))')
+
+    def digest(self, path, algorithm=ChecksumAlg.SHA256):
+        """Return the hex digest of the file at path, only reading the file if it has
+        changed since its digest was recorded."""
+        stat = os.stat(path)
+        value = self.get_digest(path, algorithm, stat)
+        if value is None:
+            value = super().digest(path, algorithm)
+            self.put_digest(path, algorithm, stat, value)
+        return value
+
+    def get_digest(self, path, algorithm, stat):
+        """Return the digest of the file at path recorded while it had stat, or None."""
+        row = self.conn.execute('SELECT stat, value FROM digests WHERE path = ? AND '
+                                'algorithm = ?', (os.path.abspath(path), algorithm)).fetchone()
+        if row is None or row[0] != _fingerprint(stat):
+            return None
+        return row[1]
+
+    def put_digest(self, path, algorithm, stat, value):
+        """Record the digest of the file at path calculated while it had stat."""
+        if time.time() * 1e9 - stat.st_mtime_ns < RACY_NS:
+            return
+        self.conn.execute('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)',
+                          (os.path.abspath(path), algorithm, _fingerprint(stat), value))
+
+    def clear(self):
+        """Remove every entry, and every recorded digest, from the snapshot."""
+        super().clear()
+        self.conn.execute('DELETE FROM digests')
+
+def _fingerprint(stat):
+    return '{}:{}:{}:{}'.format(stat.st_size, stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns)
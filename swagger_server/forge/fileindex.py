@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+SQLite index of the files declared by METS documents, so repeat lookups and fixity
+checks of METS files with very large fileSecs don't parse them again.
+"""
+import os
+
+from swagger_server.forge import fixity
+from swagger_server.forge.cache import SQLiteStore
+from swagger_server.forge.metadata import FileRef, MetsValidator, mets_digest
+from swagger_server.models import Checksum
+
+BATCH_SIZE = 10000
+
+class FileIndex(SQLiteStore):
+    """SQLite backed index of the file and mdRef references of METS documents.
+
+    Documents are indexed by the SHA-256 digest of their content, so an index entry
+    is only used while the document is unchanged. Indexing a new version of a
+    document removes the entries of the previous version. Each entry records the
+    referenced path, the USE of its fileGrp, its declared size and checksum and the
+    METS line that declares it. Like any cache.SQLiteStore an index can be passed to
+    worker processes."""
+    def _create(self, conn):
+        conn.execute('CREATE TABLE IF NOT EXISTS mets (digest TEXT PRIMARY KEY, '
+                     'path TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS files (digest TEXT NOT NULL, '
+                     'path TEXT, grp TEXT, size TEXT, algorithm TEXT, '
+                     'checksum TEXT, line INTEGER, rep TEXT)')
+        conn.execute('CREATE INDEX IF NOT EXISTS files_path ON files (digest, path)')
+
+    def ensure(self, mets_path, digest=None):
+        """Index mets_path if it isn't already indexed, returns the digest that
+        identifies it in the index or None if it can't be read."""
+        digest = digest if digest else mets_digest(mets_path)
+        if digest is not None and not self.has(digest):
+            self.build(mets_path, digest)
+        return digest
+
+    def has(self, digest):
+        """Return True if the METS document with digest is indexed."""
+        return self.conn.execute('SELECT 1 FROM mets WHERE digest = ?',
+                                 (digest,)).fetchone() is not None
+
+    def build(self, mets_path, digest=None):
+        """Index mets_path from a single streaming validation pass, returns the digest
+        that identifies it in the index."""
+        digest = digest if digest else mets_digest(mets_path)
+        validator = MetsValidator(os.path.dirname(mets_path), streaming=True)
+        self.add(mets_path, digest, validator.iter_file_refs(mets_path),
+                 validator.subsequent_mets)
+        return digest
+
+    def add(self, mets_path, digest, file_refs, subsequent_mets=()):
+        """Index the FileRefs, and (representation, FileRef) tuples of representation
+        METS, found in mets_path. subsequent_mets is only read once file_refs is
+        exhausted so it can be filled while file_refs is generated."""
+        mets_path = os.path.abspath(mets_path)
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            for table in ('files', 'mets'):
+                self.conn.execute('DELETE FROM {} WHERE digest IN (SELECT digest FROM mets '
+                                  'WHERE path = ? OR digest = ?)'.format(table),
+                                  (mets_path, digest))
+            batch = []
+            for file_ref in file_refs:
+                batch.append(_row(digest, file_ref))
+                if len(batch) >= BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+            batch.extend(_row(digest, file_ref, rep) for rep, file_ref in subsequent_mets)
+            self._insert(batch)
+            self.conn.execute('INSERT INTO mets VALUES (?, ?)', (digest, mets_path))
+
+    def lookup(self, digest, path):
+        """Return the FileRef declaring path in the METS document with digest, or None
+        if path isn't declared."""
+        row = self.conn.execute('SELECT path, size, algorithm, checksum, grp, line FROM files '
+                                'WHERE digest = ? AND path = ?', (digest, path)).fetchone()
+        return _file_ref(row) if row else None
+
+    def file_refs(self, digest):
+        """Generator returning the FileRefs of the METS document with digest, in
+        document order, excluding representation METS."""
+        for row in self.conn.execute('SELECT path, size, algorithm, checksum, grp, line '
+                                     'FROM files WHERE digest = ? AND rep IS NULL '
+                                     'ORDER BY rowid', (digest,)):
+            yield _file_ref(row)
+
+    def subsequent_mets(self, digest):
+        """Return the (representation, FileRef) tuples of the representation METS listed
+        by the METS document with digest."""
+        return [(row[0], _file_ref(row[1:])) for row in self.conn.execute(
+            'SELECT rep, path, size, algorithm, checksum, grp, line FROM files '
+            'WHERE digest = ? AND rep IS NOT NULL ORDER BY rowid', (digest,))]
+
+    def check_fixity(self, mets_path, workers=None, fail_fast=False, package=None):
+        """Check the fixity of the files referenced by mets_path, indexing it first if
+        needed, returns the fixity MetadataChecks. Pass the package folder as package
+        when mets_path is a representation METS, references outside it aren't read."""
+        digest = self.ensure(mets_path)
+        file_refs = list(self.file_refs(digest)) + \
+            [file_ref for _, file_ref in self.subsequent_mets(digest)]
+        return fixity.check_file_refs(os.path.dirname(mets_path), file_refs,
+                                      workers=workers, fail_fast=fail_fast, package=package)
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM mets').fetchone()[0]
+
+    def _insert(self, rows):
+        self.conn.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+def _row(digest, file_ref, rep=None):
+    # A file without an FLocat has no FileRef, it's kept so the index matches the METS
+    if file_ref is None:
+        return digest, None, None, None, None, None, None, rep
+    checksum = file_ref.checksum
+    return (digest, file_ref.path, file_ref.group, file_ref.size,
+            checksum.algorithm if checksum else None, checksum.value if checksum else None,
+            file_ref.line, rep)
+
+def _file_ref(row):
+    if row[0] is None:
+        return None
+    path, size, algorithm, value, group, line = row
+    return FileRef(path, size, Checksum(algorithm, value) if algorithm else None, group, line)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Fixity checks of the files referenced by METS documents against package content.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+from urllib.parse import unquote, urlparse
+
+from swagger_server.forge.manifests import Checksums
+from swagger_server.models import (
+    Checksum,
+    MetadataChecks,
+    MetadataStatus,
+    Severity,
+    TestResult
+)
+
+FILE_MISSING = 'FIXITY_MISSING'
+SIZE_MISMATCH = 'FIXITY_SIZE'
+CHECKSUM_MISMATCH = 'FIXITY_CHECKSUM'
+BAD_REFERENCE = 'FIXITY_REFERENCE'
+# Large reads keep hashing I/O bound rather than call bound on big files
+HASH_BLOCKSIZE = 1024 * 1024
+
+class FixityChecker():
+    """Checks FileRefs against the files they reference under a root directory.
+
+    hrefs are resolved against root, references that resolve outside package, the
+    package folder which defaults to root, are reported without reading the file.
+    Sizes are checked first with a stat call per file, only the files whose sizes
+    match are hashed. hashlib releases the GIL while hashing so files are hashed in
+    a pool of threads, largest first so that one big file doesn't finish last.
+    If fail_fast is True checking stops at the first file that doesn't match.
+    Pass a cache.Snapshot as digests to reuse the digests of files that haven't
+    changed since they were last hashed, it's only used from the calling thread.
+    Pass the packagetree.PackageTree of the package as tree to take file sizes from
+    its snapshot rather than a stat call per file."""
+    def __init__(self, root, workers=None, fail_fast=False, digests=None, tree=None,
+                 package=None):
+        self.root = root
+        self.package = package if package else root
+        self.workers = workers if workers else min(32, (os.cpu_count() or 1) + 4)
+        self.fail_fast = fail_fast
+        self.digests = digests
+        self.tree = tree
+
+    def check(self, file_refs):
+        """Return the list of TestResults for the file_refs that don't match the
+        package content, in the order of file_refs. In fail fast mode only the first
+        failure found is returned."""
+        results = {}
+        to_hash = []
+        for index, file_ref in enumerate(file_refs):
+            # mets:file elements without an FLocat have no FileRef
+            path = self.resolve(file_ref.path) if file_ref is not None else None
+            if path is None:
+                continue
+            if not self.is_inside(path):
+                # Never stat or hash files outside the package
+                result = _result(BAD_REFERENCE, file_ref.path,
+                                 'File referenced in METS is outside the package.')
+                results[index] = result
+                if self.fail_fast:
+                    return [result]
+                continue
+            result, stat = self._check_size(path, file_ref)
+            if result is None and file_ref.checksum is not None and file_ref.checksum.value:
+                result = self._check_known(path, file_ref.checksum, stat)
+                if result is False:
+                    to_hash.append((stat, index, path, file_ref.checksum))
+                    continue
+            if result is not None:
+                results[index] = result
+                if self.fail_fast:
+                    return [result]
+        to_hash.sort(key=lambda item: item[0].st_size, reverse=True)
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        hashing = [executor.submit(_hash, path, expected) for _, _, path, expected in to_hash]
+        try:
+            for (stat, index, path, expected), future in zip(to_hash, hashing):
+                checksum = future.result()
+                if checksum is not None and self.digests is not None:
+                    self.digests.put_digest(path, expected.algorithm, stat, checksum.value)
+                result = _check_checksum(path, expected, checksum)
+                if result is not None:
+                    results[index] = result
+                    if self.fail_fast:
+                        return [result]
+        finally:
+            for future in hashing:
+                future.cancel()
+            executor.shutdown()
+        return [results[index] for index in sorted(results)]
+
+    def _check_size(self, path, file_ref):
+        """Return a (TestResult or None, os.stat_result) tuple for the file at path."""
+        stat = self._stat(path)
+        if stat is None:
+            return _result(FILE_MISSING, path, 'File referenced in METS not found.'), None
+        if file_ref.size is not None and not _size_matches(file_ref.size, stat.st_size):
+            return _result(SIZE_MISMATCH, path, 'METS SIZE {} does not match file size {}.'
+                           .format(file_ref.size, stat.st_size)), stat
+        return None, stat
+
+    def _stat(self, path):
+        if self.tree is not None:
+            return self.tree.stat(path)
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def _check_known(self, path, expected, stat):
+        """Return the checksum result of the file at path from its recorded digest,
+        or False if there isn't one and the file must be hashed."""
+        value = self.digests.get_digest(path, expected.algorithm, stat) \
+            if self.digests is not None else None
+        if value is None:
+            return False
+        return _check_checksum(path, expected, Checksum(expected.algorithm, value))
+
+    def resolve(self, href):
+        """Return the file system path of a METS href relative to root, or None if
+        href doesn't reference a local file."""
+        if not href:
+            return None
+        parsed = urlparse(href)
+        if parsed.scheme not in ('', 'file'):
+            return None
+        path = unquote(parsed.netloc + parsed.path if parsed.scheme else href)
+        return os.path.normpath(os.path.join(self.root, path))
+
+    def is_inside(self, path):
+        """Return True if the resolved path is below the package folder, absolute and
+        .. hrefs can resolve to files outside the package."""
+        root = os.path.abspath(self.package)
+        path = os.path.abspath(path)
+        return path != root and os.path.commonpath([root, path]) == root
+
+def check_file_refs(root, file_refs, workers=None, fail_fast=False, digests=None, tree=None,
+                    package=None):
+    """Check file_refs against the files under root, returns a MetadataChecks that is
+    NOTVALID if any referenced file is missing or has the wrong size or checksum.
+    Files outside package, root if not given, are never read."""
+    messages = FixityChecker(root, workers, fail_fast, digests, tree,
+                             package).check(file_refs)
+    status = MetadataStatus.NOTVALID if messages else MetadataStatus.VALID
+    return MetadataChecks(status=status, messages=messages)
+
+def _hash(path, expected):
+    try:
+        return Checksums.from_file(path, expected.algorithm, blocksize=HASH_BLOCKSIZE)
+    except OSError:
+        return None
+
+def _check_checksum(path, expected, checksum):
+    """Return a TestResult if the calculated checksum doesn't match expected, None
+    if it does. checksum is None if the file couldn't be read."""
+    if checksum is None:
+        return _result(FILE_MISSING, path, 'File referenced in METS could not be read.')
+    if checksum.value.casefold() != expected.value.casefold():
+        return _result(CHECKSUM_MISMATCH, path,
+                       'METS {} CHECKSUM {} does not match calculated value {}.'.format(
+                           expected.algorithm, expected.value, checksum.value))
+    return None
+
+def _size_matches(declared, size):
+    try:
+        return int(declared) == size
+    except ValueError:
+        return False
+
+def _result(rule_id, path, message):
+    return TestResult(rule_id=rule_id, location=path, message=message,
+                      severity=Severity.ERROR)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Cross-reference checks of the ID and IDREF attributes of METS documents.
+"""
+from swagger_server.models import Severity, TestResult
+
+METS_NS = '{http://www.loc.gov/METS/}'
+XLINK_NS = '{http://www.w3.org/1999/xlink}'
+DUPLICATE_ID = 'METS_ID_DUPLICATE'
+DANGLING_IDREF = 'METS_IDREF_DANGLING'
+IDREF_TARGET = 'METS_IDREF_TARGET'
+# The elements each METS IDREF attribute may reference, by attribute name
+ATTRIBUTE_TARGETS = {
+    'ADMID': {'amdSec', 'techMD', 'rightsMD', 'sourceMD', 'digiprovMD'},
+    'DMDID': {'dmdSec'},
+    'FILEID': {'file', 'fileGrp'},
+    'STRUCTID': {'div'},
+    'TRANSFORMBEHAVIOR': {'behavior'}
+}
+# IDREFs held by xlink attributes of particular elements, CSIP requires the mptr
+# title to be the ID of the representation's file group
+ELEMENT_TARGETS = {
+    'mptr': {XLINK_NS + 'title': {'fileGrp'}},
+    'smLink': {XLINK_NS + 'from': {'div'}, XLINK_NS + 'to': {'div'}}
+}
+# Every IDREF attribute of the elements with xlink IDREFs, by element name
+_TAG_TARGETS = {tag: dict(ATTRIBUTE_TARGETS, **targets) for tag, targets in ELEMENT_TARGETS.items()}
+
+class IdRefChecker():
+    """Checks that METS element IDs are unique and that every IDREF resolves to the
+    ID of an element of the right kind.
+
+    Elements are fed in document order, by a streaming parse or from a parsed tree,
+    and only their attributes are read so they can be freed once fed. IDs are kept
+    in a dictionary and references are resolved as they're fed, only references to
+    IDs that haven't been seen yet are kept until finish() is called. Time is linear
+    in the number of elements and memory proportional to the number of IDs."""
+    def __init__(self, location):
+        self.location = location
+        self._ids = {}
+        self._pending = []
+        self._results = []
+
+    def feed(self, element):
+        """Record the ID and check the IDREFs of a METS element."""
+        if not isinstance(element.tag, str) or not element.tag.startswith(METS_NS):
+            return
+        tag = element.tag[len(METS_NS):]
+        references = _TAG_TARGETS.get(tag, ATTRIBUTE_TARGETS)
+        # Only the values that are needed are read, reading every value is far slower
+        for attribute in element.keys():
+            if attribute == 'ID':
+                self._add_id(element.get(attribute), tag, element.sourceline)
+                continue
+            targets = references.get(attribute)
+            if targets is None:
+                continue
+            for idref in element.get(attribute).split():
+                reference = (element.sourceline, tag, attribute, idref, targets)
+                if idref in self._ids:
+                    self._check_target(*reference)
+                else:
+                    self._pending.append(reference)
+
+    def finish(self):
+        """Resolve the references to IDs that followed them, returns the TestResults
+        for duplicate IDs and unresolved or mistargeted references in document order."""
+        for line, tag, attribute, idref, targets in self._pending:
+            if idref in self._ids:
+                self._check_target(line, tag, attribute, idref, targets)
+            else:
+                self._add(DANGLING_IDREF, Severity.ERROR, line,
+                          'mets:{} {} references ID {} that does not exist.'.format(
+                              tag, _name(attribute), idref))
+        self._pending = []
+        return [result for _, result in sorted(self._results, key=lambda item: item[0] or 0)]
+
+    def _add_id(self, element_id, tag, line):
+        if element_id in self._ids:
+            self._add(DUPLICATE_ID, Severity.ERROR, line,
+                      'mets:{} ID {} is already used by a mets:{} element.'.format(
+                          tag, element_id, self._ids[element_id]))
+        else:
+            self._ids[element_id] = tag
+
+    def _check_target(self, line, tag, attribute, idref, targets):
+        if self._ids[idref] not in targets:
+            self._add(IDREF_TARGET, Severity.WARN, line,
+                      'mets:{} {} references ID {} of a mets:{} element, expected {}.'.format(
+                          tag, _name(attribute), idref, self._ids[idref],
+                          ' or '.join('mets:' + target for target in sorted(targets))))
+
+    def _add(self, rule_id, severity, line, message):
+        self._results.append((line, TestResult(rule_id=rule_id, location=self.location,
+                                               message='{} Line {}.'.format(message, line),
+                                               severity=severity)))
+
+def _name(attribute):
+    return attribute.replace(XLINK_NS, 'xlink:')
+
+def check_tree(location, tree):
+    """Return the ID and IDREF TestResults for a parsed METS document."""
+    checker = IdRefChecker(location)
+    for element in tree.getroot().iter():
+        checker.feed(element)
+    return checker.finish()
@@ -25,12 +25,18 @@
 """
 Factory methods for the manifest classes.
 """
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import os
 
 from swagger_server.forge import MODEL
+from swagger_server.forge.packagetree import scan_files
 
 BLOCKSIZE = 1024 * 64
+# Files at least this size have their digests updated in parallel, in larger blocks
+# so the hand off to the digest threads is a small part of each update
+PARALLEL_SIZE = 1024 * 1024 * 64
+PARALLEL_BLOCKSIZE = 1024 * 1024
 
 class Checksums():
     """Handy methods for creating Checksum instances."""
@@ -46,6 +52,28 @@ class Checksums():
                 hash_alg.update(chunk)
         return MODEL.Checksum(algorithm=algorithm, value=hash_alg.hexdigest())
 
+    @staticmethod
+    def all_from_file(to_checksum, algorithms, blocksize=BLOCKSIZE, parallel=False):
+        """
+        Returns a list of Checksum instances calculated from a single read of the
+        passed file to_checksum, one for each of the algorithms in order. If parallel
+        is True each block read is passed to the digests in a pool of threads,
+        hashlib releases the GIL while it hashes so large files are hashed by
+        several algorithms at once.
+        """
+        hash_algs = [_alg_instance(algorithm) for algorithm in algorithms]
+        executor = ThreadPoolExecutor(max_workers=len(hash_algs) - 1) \
+            if parallel and len(hash_algs) > 1 else None
+        try:
+            with open(to_checksum, "rb") as _f:
+                for chunk in iter(lambda: _f.read(blocksize), b""):
+                    _update_all(hash_algs, chunk, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return [MODEL.Checksum(algorithm=algorithm, value=hash_alg.hexdigest())
+                for algorithm, hash_alg in zip(algorithms, hash_algs)]
+
     @staticmethod
     def from_data(to_checksum, algorithm=MODEL.ChecksumAlg.MD5):
         """
@@ -56,6 +84,18 @@ class Checksums():
         hash_alg.update(to_checksum)
         return MODEL.Checksum(algorithm=algorithm, value=hash_alg.hexdigest())
 
+def _update_all(hash_algs, chunk, executor=None):
+    """Update every digest with chunk, the first on this thread while the others are
+    updated by executor if given."""
+    if executor is None:
+        for hash_alg in hash_algs:
+            hash_alg.update(chunk)
+        return
+    updates = [executor.submit(hash_alg.update, chunk) for hash_alg in hash_algs[1:]]
+    hash_algs[0].update(chunk)
+    for update in updates:
+        update.result()
+
 def _alg_instance(algorithm=MODEL.ChecksumAlg.MD5):
     if algorithm == MODEL.ChecksumAlg.SHA1:
         return hashlib.sha1()
@@ -65,39 +105,54 @@ def _alg_instance(algorithm=MODEL.ChecksumAlg.MD5):
         return hashlib.sha512()
     return hashlib.md5()
 
-def entry_from_file(file_path, checksum_algs=None, entry_path=None):
-    """Return a ManifestEntry based on a file path."""
+def entry_from_file(file_path, checksum_algs=None, entry_path=None, size=None):
+    """Return a ManifestEntry based on a file path, size saves a stat call if known.
+    The file is read once whatever the number of checksum algorithms."""
     checksum_algs = checksum_algs if checksum_algs else [ MODEL.ChecksumAlg.MD5 ]
     entry_path = entry_path if entry_path else file_path
-    size = os.path.getsize(file_path)
-    checksums = [
-        Checksums.from_file(file_path, alg) for alg in checksum_algs
-    ]
+    size = size if size is not None else os.path.getsize(file_path)
+    if size >= PARALLEL_SIZE and len(checksum_algs) > 1:
+        checksums = Checksums.all_from_file(file_path, checksum_algs,
+                                            blocksize=PARALLEL_BLOCKSIZE, parallel=True)
+    else:
+        checksums = Checksums.all_from_file(file_path, checksum_algs)
     return MODEL.ManifestEntry(file_path, size, checksums)
 
-def manifest_from_directory(root_dir, checksum_algs=None, recurse=True):
-    """Return a manfiest instance derived from scanning recursively from a root directory."""
-    entries = entries_from_dir(root_dir, checksum_algs, recurse)
-    summary = summary_from_entries(entries)
+def manifest_from_directory(root_dir, checksum_algs=None, recurse=True, tree=None):
+    """Return a manfiest instance derived from scanning recursively from a root directory.
+    Entries are created and counted as the directory is walked, only the returned
+    entries are held in memory. Pass the packagetree.PackageTree of root_dir as tree
+    to reuse an earlier scan."""
+    summary = MODEL.ManifestSummary(file_count=0, total_size=0)
+    entries = list(summarised(iter_entries(root_dir, checksum_algs, recurse, tree), summary))
     return MODEL.Manifest(source="filesystem", summary=summary, entries=entries)
 
 def summary_from_entries(entries=None):
     """ Returns a ManifestSummary created from the passed manifest entries."""
-    entries = entries if entries else []
-    total_size = 0
-    file_count = 0
+    summary = MODEL.ManifestSummary(file_count=0, total_size=0)
+    for _ in summarised(entries if entries else [], summary):
+        pass
+    return summary
+
+def summarised(entries, summary):
+    """Yields the passed manifest entries, adding each one to the file count and total
+    size of summary as it goes."""
     for entry in entries:
-        file_count += 1
-        total_size += entry.size()
-    return MODEL.ManifestSummary(file_count=file_count, total_size=total_size)
+        summary.file_count += 1
+        summary.total_size += entry.size
+        yield entry
 
-def entries_from_dir(root_dir, checksum_algs=None, recurse=True):
+def entries_from_dir(root_dir, checksum_algs=None, recurse=True, tree=None):
     """Returns a List of ManifestEntrys created by walking the passed directory tree."""
-    entries = []
-    for root, dirs, files in os.walk(root_dir):
-        if recurse:
-            for directory in dirs:
-                entries = entries + entries_from_dir(directory, checksum_algs, recurse)
-        for file in files:
-            entries.append(entry_from_file(os.path.join(root, file), checksum_algs))
-    return entries
+    return list(iter_entries(root_dir, checksum_algs, recurse, tree))
+
+def iter_entries(root_dir, checksum_algs=None, recurse=True, tree=None):
+    """Yields a ManifestEntry for each file found by a single os.scandir walk of the
+    passed directory tree, top down, without keeping the folder listings. If the
+    PackageTree snapshot of root_dir is passed as tree its listings are read instead."""
+    if tree is not None:
+        files = (entry for _, entry in tree.walk_files(tree.relative(root_dir), recurse))
+    else:
+        files = scan_files(root_dir, recurse)
+    for entry in files:
+        yield entry_from_file(entry.path, checksum_algs, size=entry.stat().st_size)
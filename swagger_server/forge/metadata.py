@@ -23,17 +23,24 @@
 # under the License.
 #
 """METS Schema validation."""
+# concurrent.futures only imports the process pool, and multiprocessing, when used
+from concurrent import futures
 import fnmatch
+import functools
+import hashlib
 import logging
 import os
+import threading
 
 from lxml import etree
-from lxml.isoschematron import Schematron
 
 from importlib_resources import files
 
 import swagger_server.forge.resources.schemas as SCHEMA
 import swagger_server.forge.resources.schematron as SCHEMATRON
+from swagger_server.forge import bundle, fixity, idrefs, specification
+from swagger_server.forge.manifests import Checksums
+from swagger_server.forge.timing import NO_TIMINGS, Timings
 from swagger_server.models import (
     MetadataStatus,
     TestResult,
@@ -51,13 +58,47 @@ QUAL_METS_NS = '{{{}}}'.format(METS_NS)
 DILCIS_EXT_NS = 'https://DILCIS.eu/XML/METS/CSIPExtensionMETS'
 SCHEMATRON_NS = "{http://purl.oclc.org/dsdl/schematron}"
 SVRL_NS = "{http://purl.oclc.org/dsdl/svrl}"
-ALGS = vars(ChecksumAlg)
+# METS CHECKSUMTYPE values for the supported ChecksumAlgs
+METS_ALGS = {
+    'MD5': ChecksumAlg.MD5,
+    'SHA-1': ChecksumAlg.SHA1,
+    'SHA-256': ChecksumAlg.SHA256,
+    'SHA-512': ChecksumAlg.SHA512
+}
+METS_SCHEMA = str(files(SCHEMA).joinpath('wrapper.xsd'))
+# Bump when the format of cached results changes
+CACHE_VERSION = 1
+# Rule id of the results that mark checks skipped by fail fast validation
+NOT_RUN = 'NOT_RUN'
+# The specification the standard Schematron rules implement
+RULES_SPECIFICATION = 'CSIP'
+
+_SCHEMAS = threading.local()
+
+def get_schema(schema_path=METS_SCHEMA):
+    """Return the compiled XML schema for schema_path.
+
+    Compiled schemas are cached by path and resources_fingerprint(), the key of
+    cached results, so they're compiled again when the validation resources change.
+    Each thread gets its own instance because an XMLSchema keeps the error log of
+    its last validation."""
+    cache = getattr(_SCHEMAS, 'cache', None)
+    if cache is None:
+        cache = _SCHEMAS.cache = {}
+    fingerprint = resources_fingerprint()
+    cached = cache.get(schema_path)
+    if cached is None or cached[0] != fingerprint:
+        logging.debug("compiling schema: %s", schema_path)
+        cached = cache[schema_path] = fingerprint, etree.XMLSchema(file=schema_path)
+    return cached[1]
 
 class FileRef():
-    def __init__(self, path, size, checksum):
+    def __init__(self, path, size, checksum, group=None, line=None):
         self._path = path
         self._size = size
         self._checksum = checksum
+        self._group = group
+        self._line = line
 
     @property
     def path(self):
@@ -71,100 +112,221 @@ class FileRef():
     def checksum(self):
         return self._checksum
 
+    @property
+    def group(self):
+        """Return the USE of the fileGrp declaring the file, None for mdRefs."""
+        return self._group
+
+    @property
+    def line(self):
+        """Return the METS source line of the declaring element, if known."""
+        return self._line
+
     def __str__(self):
         return '\'path\': \'{}\' \'size\': \'{}\' \'checksum\': \'{}\''.format(self.path, self.size, self.checksum)
 
 class MetsValidator():
     """Encapsulates METS schema validation."""
-    def __init__(self, root):
+    def __init__(self, root, streaming=False, on_file_ref=None, timings=NO_TIMINGS,
+                 fail_fast=False, references=False, collect_refs=True):
+        """Create a validator for the package rooted at root.
+
+        :param streaming: If True METS files are validated in a single streaming pass
+                          that frees each file, fileGrp, dmdSec and amdSec once it has
+                          been processed so memory use doesn't grow with the METS size.
+                          No parsed document is kept in this mode.
+        :param on_file_ref: Optional callable passed each FileRef as it's found, when
+                            not supplied FileRefs are collected in self.file_refs.
+        :param timings: Optional Timings that record the parse, xsd and file_refs steps,
+                        or the single stream step in streaming mode.
+        :param fail_fast: If True no FileRefs are collected from a document that
+                          isn't valid.
+        :param references: If True element IDs are checked for duplicates and ID
+                           references for targets that don't exist, see idrefs, in
+                           documents without schema errors. The check is part of the
+                           streaming pass in streaming mode.
+        :param collect_refs: If False a parsed document isn't searched for FileRefs,
+                             for callers that already have them, e.g. from a
+                             fileindex.FileIndex. Ignored in streaming mode.
+        """
         self.validation_errors = []
-        self.schema_wrapper = etree.XMLSchema(file=str(files(SCHEMA).joinpath('wrapper.xsd')))
+        self.schema_wrapper = get_schema(METS_SCHEMA)
         self.rootpath = root
         self.subsequent_mets = []
         self.file_refs = []
+        self.parsed_mets = None
+        self.streaming = streaming
+        self._on_file_ref = on_file_ref if on_file_ref else self.file_refs.append
+        self.timings = timings
+        self.fail_fast = fail_fast
+        self.references = references
+        self.collect_refs = collect_refs
 
-    def validate_mets(self, mets):
+    def validate_mets(self, mets, parsed_mets=None):
         '''
-        Validates a Mets file. The Mets file is parsed with etree.iterparse(),
-        which allows event-driven parsing of large files. On certain events/conditions
-        actions are taken, like file validation or adding Mets files found inside
-        representations to a list so that they will be evaluated later on.
+        Validates a Mets file. The Mets file is parsed once and the parsed document
+        is kept in self.parsed_mets so that the Schematron checks and any other
+        consumers can re-use it rather than parsing the file again. FileRefs are
+        extracted from the same document and Mets files found inside
+        representations are added to a list so that they will be evaluated later on.
+        In streaming mode the file is validated with etree.iterparse() instead.
 
-        @param mets:    Path leading to a Mets file that will be evaluated.
-        @return:        Boolean validation result.
+        @param mets:        Path leading to a Mets file that will be evaluated.
+        @param parsed_mets: Optional, already parsed Mets document, when supplied the
+                            file isn't parsed again.
+        @return:            Boolean validation result.
         '''
         # Handle relative package paths for representation METS files.
         self.rootpath, mets = _handle_rel_paths(self.rootpath, mets)
+        if self.streaming and parsed_mets is None:
+            start = self.timings.start()
+            for file_ref in self._stream_file_refs(mets):
+                self._on_file_ref(file_ref)
+            self.timings.stop(start, 'stream')
+            return self._get_results()
+        start = self.timings.start()
         try:
-            parsed_mets = etree.iterparse(mets, events=('start', 'end'), schema=self.schema_wrapper)
-            for event, element in parsed_mets:
-                # Define what to do with specific tags.
-                if event == 'end' and element.tag == _q(METS_NS, 'file'):
-                    # files
-                    self.file_refs.append(_file_ref_from_ele(element))
-                    # element.clear()
-                    # while element.getprevious() is not None:
-                    #     del element.getparent()[0]
-                elif event == 'end' and \
-                    element.tag == _q(METS_NS, 'fileGrp') and \
-                    element.attrib.get('USE', '').startswith('Representations/'):
-                    # representation mets files
-                    rep = element.attrib['USE'].rsplit('/', 1)[1]
-                    for file in element.iter(_q(METS_NS, 'file')):
-                        file_ref = _file_ref_from_ele(file)
-                        if os.path.basename(file_ref.path).casefold() == 'METS.xml'.casefold():
-                            sub_mets = rep, file_ref
-                            self.subsequent_mets.append(sub_mets)
-                        else:
-                            self.file_refs.append(file_ref)
-                    # element.clear()
-                    # while element.getprevious() is not None:
-                    #     del element.getparent()[0]
-                elif event == 'end' and element.tag == _q(METS_NS, 'dmdSec'):
-                    for ref in element.iter(_q(METS_NS, 'mdRef')):
-                        self.file_refs.append(_file_ref_from_mdref_ele(ref))
-                elif event == 'end' and element.tag == _q(METS_NS, 'amdSec'):
+            self.parsed_mets = parsed_mets if parsed_mets is not None else etree.parse(mets)
+        except etree.XMLSyntaxError as synt_err:
+            self.parsed_mets = None
+            self._add_error(mets, synt_err.msg)
+        self.timings.stop(start, 'parse')
+        if self.parsed_mets is not None:
+            start = self.timings.start()
+            if not self.schema_wrapper.validate(self.parsed_mets):
+                # Only the first error is reported, like validating while parsing
+                self._add_error(mets, self.schema_wrapper.error_log[0].message)
+            self.timings.stop(start, 'xsd')
+            # Like streaming validation, which stops at a schema error, IDs are only
+            # checked in documents that are valid
+            if self.references and not self.validation_errors:
+                start = self.timings.start()
+                self._add_results(idrefs.check_tree(mets, self.parsed_mets))
+                self.timings.stop(start, 'references')
+            if (self.fail_fast and self.validation_errors) or not self.collect_refs:
+                return self._get_results()
+            start = self.timings.start()
+            for element in self.parsed_mets.getroot().iter(_q(METS_NS, 'file'),
+                                                           _q(METS_NS, 'mdRef')):
+                for file_ref in self._file_refs_from_ele(element):
+                    self._on_file_ref(file_ref)
+            self.timings.stop(start, 'file_refs')
+        return self._get_results()
+
+    def iter_file_refs(self, mets):
+        """Generator that validates a Mets file in streaming mode, returning each
+        FileRef as it's found. Validation errors are in self.validation_errors once
+        the generator is exhausted."""
+        self.rootpath, mets = _handle_rel_paths(self.rootpath, mets)
+        yield from self._stream_file_refs(mets)
+
+    def _stream_file_refs(self, mets):
+        self.parsed_mets = None
+        tags = (_q(METS_NS, 'file'), _q(METS_NS, 'fileGrp'),
+                _q(METS_NS, 'dmdSec'), _q(METS_NS, 'amdSec'))
+        checker = idrefs.IdRefChecker(mets) if self.references else None
+        # The reference check reads the attributes of every element as it starts
+        events, tag = (('start', 'end'), None) if checker else (('end',), tags)
+        try:
+            for event, element in etree.iterparse(mets, events=events, tag=tag,
+                                                  schema=self.schema_wrapper):
+                if event == 'start':
+                    checker.feed(element)
+                    continue
+                if element.tag not in tags:
+                    continue
+                if element.tag == _q(METS_NS, 'file'):
+                    if element.getparent().tag == _q(METS_NS, 'file'):
+                        # Nested files are read, in document order, and freed along
+                        # with their top level file, which still needs its FLocat
+                        continue
+                    for file_ele in element.iter(_q(METS_NS, 'file')):
+                        yield from self._file_refs_from_ele(file_ele)
+                elif element.tag != _q(METS_NS, 'fileGrp'):
                     for ref in element.iter(_q(METS_NS, 'mdRef')):
-                        self.file_refs.append(_file_ref_from_mdref_ele(ref))
+                        yield from self._file_refs_from_ele(ref)
+                # Free the processed element and the siblings processed before it
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
         except etree.XMLSyntaxError as synt_err:
-            self.validation_errors.append(TestResult(rule_id="METS", location=mets,
-                                          message=synt_err.msg.replace(QUAL_METS_NS, "mets:"),
-                                          severity=Severity.ERROR))
-        # except Exception as base_err:
-        #     self.validation_errors.append(TestResult(rule_id="METS", location=mets,
-        #                                   message=str(base_err), severity=Severity.ERROR))
+            self._add_error(mets, synt_err.msg)
+            return
+        if checker:
+            self._add_results(checker.finish())
 
-        status = MetadataStatus.NOTVALID if len(self.validation_errors) else MetadataStatus.VALID
-        return status == MetadataStatus.VALID, MetadataChecks(status=status, messages=self.validation_errors)
+    def _file_refs_from_ele(self, element):
+        """Generator returning the FileRef for a file or mdRef element, representation
+        METS files are added to self.subsequent_mets instead."""
+        if element.tag == _q(METS_NS, 'mdRef'):
+            yield _file_ref_from_mdref_ele(element)
+            return
+        file_ref = _file_ref_from_ele(element)
+        rep = _rep_name(element)
+        if rep and file_ref and \
+            os.path.basename(file_ref.path).casefold() == 'METS.xml'.casefold():
+            # representation mets files
+            self.subsequent_mets.append((rep, file_ref))
+        else:
+            yield file_ref
+
+    def _add_error(self, mets, message):
+        self.validation_errors.append(TestResult(rule_id="METS", location=mets,
+                                      message=message.replace(QUAL_METS_NS, "mets:"),
+                                      severity=Severity.ERROR))
+
+    def _add_results(self, results):
+        """Add the TestResults of a further check, only the first error in fail fast
+        mode."""
+        for result in results:
+            self.validation_errors.append(result)
+            if self.fail_fast and result.severity == Severity.ERROR:
+                return
+
+    def _get_results(self):
+        status = MetadataStatus.NOTVALID if any(result.severity == Severity.ERROR
+                                                for result in self.validation_errors) \
+            else MetadataStatus.VALID
+        return status == MetadataStatus.VALID, MetadataChecks(status=status,
+                                                              messages=self.validation_errors)
+
+def _rep_name(file_ele):
+    """Return the representation name from the closest Representations/ file group
+    containing file_ele, or None if it isn't in a representation group."""
+    for grp in file_ele.iterancestors(_q(METS_NS, 'fileGrp')):
+        use = grp.attrib.get('USE', '')
+        if use.startswith('Representations/'):
+            return use.rsplit('/', 1)[1]
+    return None
 
 def _file_ref_from_ele(element):
-    algid = element.attrib.get('CHECKSUMTYPE', None)
-    chksm = element.attrib.get('CHECKSUM', None)
     size = element.attrib.get('SIZE', None)
-    checksum = None
+    checksum = _checksum_from_ele(element)
+    parent = element.getparent()
+    group = parent.get('USE') if parent is not None else None
     ref = None
-    for alg in ALGS:
-        if getattr(ChecksumAlg, alg) == algid:
-            checksum = Checksum(algid, chksm)
     for child in element.getchildren():
         if child.tag == _q(METS_NS, 'FLocat'):
             path = child.attrib[_q(XLINK_NS, 'href')]
-            ref = FileRef(path, size, checksum)
+            ref = FileRef(path, size, checksum, group, element.sourceline)
     return ref
 
 def _file_ref_from_mdref_ele(element):
-    algid = element.attrib.get('CHECKSUMTYPE', None)
-    chksm = element.attrib.get('CHECKSUM', None)
     size = element.attrib.get('SIZE', None)
-    checksum = None
-    ref = None
-    for alg in ALGS:
-        if getattr(ChecksumAlg, alg) == algid:
-            checksum = Checksum(algid, chksm)
+    checksum = _checksum_from_ele(element)
     path = element.attrib.get(_q(XLINK_NS, 'href'), None)
-    ref = FileRef(path, size, checksum)
+    ref = FileRef(path, size, checksum, line=element.sourceline)
     return ref
 
+def _checksum_from_ele(element):
+    """Return the Checksum of a mets:file or mets:mdRef element, or None if it has no
+    CHECKSUM or a CHECKSUMTYPE that isn't supported."""
+    algid = METS_ALGS.get(element.attrib.get('CHECKSUMTYPE', None))
+    chksm = element.attrib.get('CHECKSUM', None)
+    if algid is None or chksm is None:
+        return None
+    return Checksum(algid, chksm)
+
 
 def _handle_rel_paths(rootpath, metspath):
     if metspath.startswith('file://./'):
@@ -177,6 +339,274 @@ def _handle_rel_paths(rootpath, metspath):
 def _q(_ns, _v):
     return '{{{}}}{}'.format(_ns, _v)
 
+def _as_tree(to_validate):
+    """Return to_validate as a parsed document, only parsing it if it's a path or file."""
+    if isinstance(to_validate, etree._ElementTree): # pylint: disable-msg=W0212
+        return to_validate
+    return etree.parse(to_validate)
+
+class CompiledRules():
+    """The compiled, read only form of a Schematron rule set.
+
+    Instances are shared by every ValidationRules created for the same rules so
+    they must never hold per validation state."""
+    def __init__(self, schematron, transform, stylesheet=None):
+        self._schematron = schematron
+        self._transform = transform
+        self._stylesheet = stylesheet
+
+    @property
+    def schematron(self):
+        """Return the Schematron rules after include and expansion."""
+        return self._schematron
+
+    @property
+    def transform(self):
+        """Return the compiled validating XSLT transform."""
+        return self._transform
+
+    @property
+    def stylesheet(self):
+        """Return the validating XSLT document the transform was compiled from."""
+        return self._stylesheet
+
+    @classmethod
+    def from_file(cls, rules_path):
+        """Compile the Schematron rules file at rules_path."""
+        return cls.from_tree(etree.parse(rules_path))
+
+    @classmethod
+    def from_tree(cls, rules):
+        """Compile a parsed Schematron rules document."""
+        # Imported here as it's slow to import and only needed to compile rules
+        from lxml.isoschematron import Schematron # pylint: disable-msg=C0415
+        compiled = Schematron(rules, store_schematron=True, store_xslt=True)
+        return cls(compiled.schematron, etree.XSLT(compiled.validator_xslt),
+                   compiled.validator_xslt)
+
+    @classmethod
+    def from_bundle(cls, name):
+        """Load the rules precompiled under name from the resource bundle, returns None
+        if the bundle is missing, out of date or doesn't hold them."""
+        schematron_path = bundle.get_path(name + '.sch') if name else None
+        stylesheet_path = bundle.get_path(name + '.xsl') if name else None
+        if schematron_path is None or stylesheet_path is None:
+            return None
+        stylesheet = etree.parse(stylesheet_path)
+        return cls(etree.parse(schematron_path), etree.XSLT(stylesheet), stylesheet)
+
+    def to_bundle(self, name, bundle_dir=bundle.BUNDLE_DIR):
+        """Write the expanded rules and validating XSLT to bundle_dir under name."""
+        self._schematron.write(os.path.join(bundle_dir, name + '.sch'))
+        self._stylesheet.write(os.path.join(bundle_dir, name + '.xsl'))
+
+class RuleSelection():
+    """Selects the METS sections and Schematron asserts a profile validates.
+
+    sections is a list of section names, rules a list of assert ids that may use
+    fnmatch style wildcards and severities a list of Severity values, None selects
+    everything. Sections without a selected assert aren't validated at all and
+    unselected asserts are removed from the rules before they are compiled. Rules
+    left without asserts are kept with an assert that always holds, they still
+    decide which later rule in the same pattern fires for a node."""
+    SEVERITIES = {'ERROR': Severity.ERROR, 'WARN': Severity.WARN, 'INFO': Severity.INFO}
+
+    def __init__(self, sections=None, rules=None, severities=None):
+        self.sections = tuple(sections) if sections else None
+        self.rules = tuple(sorted(set(rules))) if rules else None
+        self.severities = tuple(sorted(set(severities))) if severities else None
+
+    @property
+    def key(self):
+        """Return a hashable key for the selection of asserts."""
+        return self.rules, self.severities
+
+    @property
+    def selects_all_rules(self):
+        """Return True if no asserts are removed from the selected sections."""
+        return self.rules is None and self.severities is None
+
+    def select_sections(self, sections):
+        """Return the selected sections of sections, in order, leaving out those whose
+        standard rules have no selected assert, raising a ValueError if any selected
+        section is unknown."""
+        sections = list(sections)
+        if self.sections is not None:
+            unknown = [section for section in self.sections if section not in sections]
+            if unknown:
+                raise ValueError('Unknown METS sections {}, expected {}.'.format(
+                    ', '.join(unknown), ', '.join(sections)))
+            sections = [section for section in sections if section in self.sections]
+        if self.selects_all_rules:
+            return sections
+        return [section for section in sections
+                if any(self.selects(test) for test in _section_tests(section))]
+
+    def selects(self, test):
+        """Return True if the Schematron assert or report element test is selected."""
+        if self.rules is not None and \
+            not any(fnmatch.fnmatchcase(test.get('id') or '', rule) for rule in self.rules):
+            return False
+        if self.severities is not None and _role_severity(test.get('role')) \
+            not in self.severities:
+            return False
+        return True
+
+    def apply(self, rules):
+        """Remove the unselected asserts and reports from a parsed Schematron document,
+        and the patterns left without any, returns the document."""
+        if self.selects_all_rules:
+            return rules
+        patterns = list(rules.getroot().iter(SCHEMATRON_NS + 'pattern'))
+        unselected = []
+        for pattern in patterns:
+            selected = False
+            for rule in pattern.iter(SCHEMATRON_NS + 'rule'):
+                tests = rule.findall(SCHEMATRON_NS + 'assert') + \
+                    rule.findall(SCHEMATRON_NS + 'report')
+                kept = [test for test in tests if self.selects(test)]
+                for test in tests:
+                    if test not in kept:
+                        rule.remove(test)
+                if not kept:
+                    # A schema rule needs at least one assert
+                    etree.SubElement(rule, SCHEMATRON_NS + 'assert', test='true()')
+                selected = selected or bool(kept)
+            if not selected:
+                unselected.append(pattern)
+        if len(unselected) == len(patterns):
+            # Keep one pattern, a schema needs at least one
+            unselected = unselected[1:]
+        for pattern in unselected:
+            pattern.getparent().remove(pattern)
+        return rules
+
+    def __eq__(self, other):
+        return isinstance(other, RuleSelection) and \
+            (self.sections, self.key) == (other.sections, other.key)
+
+    def __hash__(self):
+        return hash((self.sections, self.key))
+
+    def __repr__(self):
+        return 'RuleSelection(sections={!r}, rules={!r}, severities={!r})'.format(
+            self.sections, self.rules, self.severities)
+
+ALL_RULES = RuleSelection()
+
+def _role_severity(role):
+    """Return the Severity reported for a Schematron assert role."""
+    if role == 'ERROR':
+        return Severity.ERROR
+    if role == 'INFO':
+        return Severity.INFO
+    return Severity.WARN
+
+class RulesRegistry():
+    """Process wide registry that compiles each Schematron rule set only once, or
+    loads it precompiled from the resource bundle if that is current.
+
+    Lookups are thread safe, the lock is replaced in forked children so a fork
+    taken while another thread held it can't deadlock the child. Compiled rules
+    are inherited by forked children as is."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = {}
+
+    def get(self, rules_path, selection=ALL_RULES):
+        """Return the CompiledRules for the selected asserts of rules_path, compiling
+        them on first use."""
+        if selection.selects_all_rules:
+            return self._get(rules_path, lambda: CompiledRules.from_file(rules_path))
+        return self._get((rules_path,) + selection.key, lambda: CompiledRules.from_tree(
+            selection.apply(etree.parse(rules_path))), bundled=False)
+
+    def get_merged(self, sections, selection=ALL_RULES):
+        """Return the CompiledRules that merge the selected asserts of the standard rules
+        for all sections."""
+        sections = tuple(sections)
+        if selection.selects_all_rules:
+            return self._get(('merged',) + sections,
+                             lambda: CompiledRules.from_tree(merge_rules(sections)))
+        return self._get(('merged',) + sections + selection.key, lambda: CompiledRules.from_tree(
+            selection.apply(merge_rules(sections))), bundled=False)
+
+    def _get(self, key, compile_rules, bundled=True):
+        compiled = self._rules.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._rules.get(key)
+                if compiled is None:
+                    compiled = CompiledRules.from_bundle(bundle.rules_name(key)) \
+                        if bundled else None
+                    if compiled is None:
+                        logging.debug("compiling schematron: %s", key)
+                        compiled = compile_rules()
+                    self._rules[key] = compiled
+        return compiled
+
+    def clear(self):
+        """Discard all compiled rules."""
+        with self._lock:
+            self._rules = {}
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+def merge_rules(sections):
+    """Return a single Schematron document that holds the standard rules for every
+    section in sections. Each assert and report is flagged with the name of its
+    section so results from a single validation can be split by section."""
+    merged = etree.Element(SCHEMATRON_NS + 'schema', nsmap={None: SCHEMATRON_NS[1:-1]})
+    namespaces = {}
+    patterns = []
+    for section in sections:
+        rules = etree.parse(_rules_path(section)).getroot()
+        for ns_ele in rules.iter(SCHEMATRON_NS + 'ns'):
+            prefix, uri = ns_ele.get('prefix'), ns_ele.get('uri')
+            if namespaces.setdefault(prefix, uri) != uri:
+                raise ValueError('Schematron rules for section {} bind prefix {} to {}, '
+                                 'expected {}.'.format(section, prefix, uri, namespaces[prefix]))
+        for pattern in rules.iter(SCHEMATRON_NS + 'pattern'):
+            for test in pattern.iter(SCHEMATRON_NS + 'assert', SCHEMATRON_NS + 'report'):
+                test.set('flag', section)
+            patterns.append(pattern)
+    for prefix, uri in namespaces.items():
+        etree.SubElement(merged, SCHEMATRON_NS + 'ns', prefix=prefix, uri=uri)
+    merged.extend(patterns)
+    return etree.ElementTree(merged)
+
+def _rules_path(name):
+    """Return the path of the standard Schematron rules for METS section name."""
+    return str(files(SCHEMATRON).joinpath('mets_{}_rules.xml'.format(name)))
+
+@functools.lru_cache(maxsize=None)
+def _section_tests(name):
+    """Return the attributes of every assert and report in the standard Schematron
+    rules for METS section name. Read once, on first use."""
+    return tuple(dict(test.attrib) for _, test in etree.iterparse(
+        _rules_path(name), tag=(SCHEMATRON_NS + 'assert', SCHEMATRON_NS + 'report')))
+
+@functools.lru_cache(maxsize=None)
+def get_rule_requirements(name=RULES_SPECIFICATION):
+    """Return a dictionary mapping the id of every assert and report in the standard
+    Schematron rules to its Requirement in the Specification called name, or None if
+    it has no requirement. Built once, on first use."""
+    spec = specification.get_specification(name)
+    requirements = {}
+    for section in ValidationProfile.SECTIONS:
+        for _, test in etree.iterparse(_rules_path(section),
+                                       tag=(SCHEMATRON_NS + 'assert', SCHEMATRON_NS + 'report')):
+            requirements[test.get('id')] = spec.get_requirement_by_id(test.get('id'))
+    return requirements
+
+RULES_REGISTRY = RulesRegistry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=RULES_REGISTRY._reset_lock) # pylint: disable-msg=W0212
+
 class ValidationRules():
     REP_SKIPS = [
         'CSIP60',
@@ -186,7 +616,8 @@ class ValidationRules():
         'CSIP114'
     ]
     """Encapsulates a set of Schematron rules loaded from a single file."""
-    def __init__(self, name: str, rules_path: str=None):
+    def __init__(self, name: str, rules_path: str=None, ruleset: CompiledRules=None,
+                 selection: RuleSelection=ALL_RULES):
         """Initialise a set of validation rules from a file or name.
 
         Retrieve a validation profile by type and version # noqa: E501
@@ -199,59 +630,306 @@ class ValidationRules():
         :type type: str
         :param rules_path: A complete path to a set of schematron rules to load
         :type version: str
+        :param ruleset: Already compiled rules, when supplied no rules are loaded
+        :type ruleset: CompiledRules
+        :param selection: The asserts to load, unselected asserts are never compiled
+        :type selection: RuleSelection
         """
         self.name = name
-        if not rules_path:
-            # If no path is provided use the name param to try to load a standard ruleset
-            rules_path = str(files(SCHEMATRON).joinpath('mets_{}_rules.xml'.format(name)))
+        if ruleset is None:
+            if not rules_path:
+                # If no path is provided use the name param to try to load a standard ruleset
+                rules_path = _rules_path(name)
+            logging.debug("path: %s", rules_path)
+            # Get the compiled schematron for the path, shared across the process
+            ruleset = RULES_REGISTRY.get(rules_path, selection)
         self.rules_path = rules_path
-        logging.debug("path: %s", self.rules_path)
-        # Load the schematron file from the path
-        self.ruleset = Schematron(file=self.rules_path, store_schematron=True, store_report=True)
+        self.ruleset = ruleset
+        self.validation_report = None
+        self.timings = NO_TIMINGS
+
+    @classmethod
+    def merged(cls, sections, selection=ALL_RULES):
+        """Return a single rule set combining the selected standard rules for each of
+        sections."""
+        return cls('merged', ruleset=RULES_REGISTRY.get_merged(sections, selection))
 
     def get_assertions(self):
         """Generator that returns the rules one at a time."""
-        xml_rules = etree.XML(bytes(self.ruleset.schematron))
+        xml_rules = etree.XML(etree.tostring(self.ruleset.schematron))
 
         for ele in xml_rules.iter():
             if ele.tag == SCHEMATRON_NS + 'assert':
                 yield ele
 
     def validate(self, to_validate):
-        """Validate a file against the loaded Schematron ruleset."""
-        xml_file = etree.parse(to_validate)
-        self.ruleset.validate(xml_file)
+        """Validate a file, or an already parsed document, against the loaded Schematron
+        ruleset."""
+        xml_file = _as_tree(to_validate)
+        start = self.timings.start()
+        self.validation_report = self.ruleset.transform(xml_file)
+        self.timings.stop(start, 'transform', self.name)
 
     def get_report(self):
         """Get the report from the last validation."""
-        xml_report = etree.XML(bytes(self.ruleset.validation_report))
-        messages = []
+        return _checks_from_results(result for _, result in self._get_failed_asserts())
+
+    def get_section_reports(self, sections):
+        """Get the report from the last validation of merged rules, split into a
+        report for each of sections using the section flag of each assert."""
+        section_results = {section: [] for section in sections}
+        for section, result in self._get_failed_asserts():
+            section_results[section].append(result)
+        return {section: _checks_from_results(results)
+                for section, results in section_results.items()}
+
+    def check(self, to_validate):
+        """Validate a file or parsed document and return the MetadataChecks report."""
+        self.validate(to_validate)
+        start = self.timings.start()
+        report = self.get_report()
+        self.timings.stop(start, 'report', self.name)
+        return report
+
+    def check_sections(self, to_validate, sections):
+        """Validate a file or parsed document against merged rules and return the
+        MetadataChecks report for each of sections."""
+        self.validate(to_validate)
+        start = self.timings.start()
+        reports = self.get_section_reports(sections)
+        self.timings.stop(start, 'report', self.name)
+        return reports
+
+    def _get_failed_asserts(self):
+        """Generator returning (flag, TestResult) tuples for the failed asserts of the
+        last validation, read straight from the in memory SVRL report."""
         rule = None
-        status = MetadataStatus.VALID
-        for ele in xml_report.iter():
+        for ele in self.validation_report.getroot().iter(SVRL_NS + 'fired-rule',
+                                                         SVRL_NS + 'failed-assert'):
             if ele.tag == SVRL_NS + 'fired-rule':
                 rule = ele
-            elif ele.tag == SVRL_NS + 'failed-assert':
+            else:
                 rule_id = ele.get('id', '')
                 if rule_id in self.REP_SKIPS:
                     continue
-                severity = Severity.WARN
-                if ele.get('role') == 'ERROR':
-                    severity = Severity.ERROR
-                    status = MetadataStatus.NOTVALID
-                elif ele.get('role') == 'INFO':
-                    severity = Severity.INFO
-                messages.append(
-                    TestResult(
-                        rule_id=ele.get('id'),
-                        location=rule.get('context').replace('/*[local-name()=\'', '') +
-                        '/' + ele.get('test'),
-                        message=ele.find(SVRL_NS + 'text').text,
-                        severity=severity
-                    )
+                yield ele.get('flag'), TestResult(
+                    rule_id=ele.get('id'),
+                    location=rule.get('context').replace('/*[local-name()=\'', '') +
+                    '/' + ele.get('test'),
+                    message=ele.find(SVRL_NS + 'text').text,
+                    severity=_role_severity(ele.get('role'))
                 )
 
-        return MetadataChecks(status=status, messages=messages)
+def _checks_from_results(results):
+    """Return MetadataChecks for results, not valid if any result is an error."""
+    messages = list(results)
+    status = MetadataStatus.VALID
+    for result in messages:
+        if result.severity == Severity.ERROR:
+            status = MetadataStatus.NOTVALID
+    return MetadataChecks(status=status, messages=messages)
+
+class CompiledXPathRules():
+    """Schematron rules compiled to etree.XPath expressions, evaluated directly on a
+    parsed document without the ISO Schematron XSLT pipeline. Only rule contexts and
+    asserts are compiled, reports never appear in validation results."""
+    def __init__(self, patterns):
+        self._patterns = patterns
+
+    @property
+    def patterns(self):
+        """Return the compiled patterns, a list of (union, rules) tuples where union
+        selects every context node of the pattern in document order and each rule is a
+        (context, context xpath, asserts) tuple. Each assert is an
+        (id, role, flag, test, failing xpath, text) tuple, the failing xpath selects the
+        context nodes that fail the assert test."""
+        return self._patterns
+
+    @classmethod
+    def from_file(cls, rules_path):
+        """Compile the Schematron rules file at rules_path."""
+        return cls.from_tree(etree.parse(rules_path))
+
+    @classmethod
+    def from_tree(cls, rules):
+        """Compile a parsed Schematron rules document."""
+        root = rules.getroot() if hasattr(rules, 'getroot') else rules
+        namespaces = {ns_ele.get('prefix'): ns_ele.get('uri')
+                      for ns_ele in root.iter(SCHEMATRON_NS + 'ns')}
+        patterns = []
+        for pattern in root.iter(SCHEMATRON_NS + 'pattern'):
+            rules = []
+            selects = []
+            for rule in pattern.iter(SCHEMATRON_NS + 'rule'):
+                context = rule.get('context')
+                select = _absolute_context(context)
+                asserts = []
+                for test in rule.iter(SCHEMATRON_NS + 'assert'):
+                    if len(test):
+                        raise ValueError('Assert {} has markup in its message, only plain text '
+                                         'messages are supported.'.format(test.get('id')))
+                    if 'position()' in test.get('test') or 'last()' in test.get('test'):
+                        raise ValueError('Assert {} test depends on the context position, which '
+                                         'is not supported.'.format(test.get('id')))
+                    # Select every failing context node with a single evaluation
+                    failing = etree.XPath('({})[not({})]'.format(select, test.get('test')),
+                                          namespaces=namespaces)
+                    asserts.append((test.get('id'), test.get('role'), test.get('flag'),
+                                    test.get('test'), failing, test.text))
+                rules.append((context, etree.XPath(select, namespaces=namespaces), asserts))
+                selects.append(select)
+            if rules:
+                union = etree.XPath(' | '.join(selects), namespaces=namespaces)
+                patterns.append((union, rules))
+        return cls(patterns)
+
+def _absolute_context(context):
+    """Return the XPath selecting every node a Schematron rule context matches. Contexts
+    are XSLT match patterns, a relative pattern like mets:fileSec matches at any depth
+    so each alternative that doesn't start with / is prefixed with //."""
+    alternatives = []
+    depth = 0
+    quote = None
+    start = 0
+    for pos, char in enumerate(context):
+        if quote:
+            quote = None if char == quote else quote
+        elif char in '\'"':
+            quote = char
+        elif char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            alternatives.append(context[start:pos])
+            start = pos + 1
+    alternatives.append(context[start:])
+    return ' | '.join(alt.strip() if alt.strip().startswith('/') else '//' + alt.strip()
+                      for alt in alternatives)
+
+_XPATH_RULES = threading.local()
+
+def _get_xpath_rules(key, compile_rules):
+    """Return the CompiledXPathRules for key, compiling them once per thread because
+    lxml serialises evaluation of each XPath instance with a lock."""
+    cache = getattr(_XPATH_RULES, 'cache', None)
+    if cache is None:
+        cache = _XPATH_RULES.cache = {}
+    compiled = cache.get(key)
+    if compiled is None:
+        logging.debug("compiling xpath rules: %s", key)
+        compiled = cache[key] = compile_rules()
+    return compiled
+
+class XPathRules():
+    """A set of Schematron rules evaluated with compiled XPath expressions, a faster
+    alternative to ValidationRules that produces identical results."""
+    REP_SKIPS = ValidationRules.REP_SKIPS
+
+    def __init__(self, name: str, rules_path: str=None, rules: CompiledXPathRules=None,
+                 selection: RuleSelection=ALL_RULES):
+        """Initialise a set of rules from a file or name, as for ValidationRules."""
+        self.name = name
+        if rules is None:
+            if not rules_path:
+                rules_path = _rules_path(name)
+            rules = _get_xpath_rules((rules_path,) + selection.key,
+                                     lambda: CompiledXPathRules.from_tree(
+                                         selection.apply(etree.parse(rules_path))))
+        self.rules_path = rules_path
+        self.rules = rules
+        self._failed = []
+        self.timings = NO_TIMINGS
+
+    @classmethod
+    def merged(cls, sections, selection=ALL_RULES):
+        """Return a single rule set combining the selected standard rules for each of
+        sections."""
+        sections = tuple(sections)
+        return cls('merged', rules=_get_xpath_rules(
+            ('merged',) + sections + selection.key,
+            lambda: CompiledXPathRules.from_tree(selection.apply(merge_rules(sections)))))
+
+    def validate(self, to_validate):
+        """Validate a file, or an already parsed document, against the rules."""
+        tree = _as_tree(to_validate)
+        self._failed = []
+        start = self.timings.start()
+        for union, rules in self.rules.patterns:
+            failed = []
+            for index, rule in enumerate(rules):
+                for test in rule[2]:
+                    if self.timings.enabled:
+                        assert_start = self.timings.start()
+                        failed.extend((node, index, test) for node in test[4](tree))
+                        self.timings.stop_assertion(assert_start, test[2] or self.name, test[0])
+                    else:
+                        failed.extend((node, index, test) for node in test[4](tree))
+            if failed:
+                self._add_failures(tree, union, rules, failed)
+        self.timings.stop(start, 'transform', self.name)
+
+    def _add_failures(self, tree, union, rules, failed):
+        """Record the (node, rule index, assert) failures of a pattern in the order the
+        Schematron XSLT reports them."""
+        contexts = {}
+        def is_claimed(node, index):
+            # Like an XSLT template, only the first rule matching a node fires
+            for earlier in range(index):
+                if earlier not in contexts:
+                    contexts[earlier] = set(rules[earlier][1](tree))
+                if node in contexts[earlier]:
+                    return True
+            return False
+        failed = [failure for failure in failed if not is_claimed(failure[0], failure[1])]
+        if len(failed) > 1:
+            # Failures are reported in document order, sort is stable so the asserts
+            # for a node stay in rule order
+            order = {node: position for position, node in enumerate(union(tree))}
+            failed.sort(key=lambda failure: order[failure[0]])
+        for _, index, test in failed:
+            rule_id, role, flag, test_str, _, text = test
+            self._failed.append((rule_id, role, flag, rules[index][0], test_str, text))
+
+    def get_report(self):
+        """Get the report from the last validation."""
+        return _checks_from_results(result for _, result in self._get_failed_asserts())
+
+    def check(self, to_validate):
+        """Validate a file or parsed document and return the MetadataChecks report."""
+        self.validate(to_validate)
+        start = self.timings.start()
+        report = self.get_report()
+        self.timings.stop(start, 'report', self.name)
+        return report
+
+    def check_sections(self, to_validate, sections):
+        """Validate a file or parsed document against merged rules and return the
+        MetadataChecks report for each of sections."""
+        self.validate(to_validate)
+        start = self.timings.start()
+        reports = self.get_section_reports(sections)
+        self.timings.stop(start, 'report', self.name)
+        return reports
+
+    def get_section_reports(self, sections):
+        """Get the report from the last validation of merged rules, split by section."""
+        section_results = {section: [] for section in sections}
+        for section, result in self._get_failed_asserts():
+            section_results[section].append(result)
+        return {section: _checks_from_results(results)
+                for section, results in section_results.items()}
+
+    def _get_failed_asserts(self):
+        for rule_id, role, flag, context, test, text in self._failed:
+            if (rule_id or '') in self.REP_SKIPS:
+                continue
+            yield flag, TestResult(
+                rule_id=rule_id,
+                location=context.replace('/*[local-name()=\'', '') + '/' + test,
+                message=text,
+                severity=_role_severity(role)
+            )
 
 class ValidationProfile():
     """ A complete set of Schematron rule sets that comprise a complete validation profile."""
@@ -265,31 +943,78 @@ class ValidationProfile():
     }
     SECTIONS = NAMES.keys()
 
-    def __init__(self):
+    MERGED = 'merged'
+    ENGINES = {
+        'xslt': ValidationRules,
+        'xpath': XPathRules
+    }
+
+    def __init__(self, merged=False, engine='xslt', timings=NO_TIMINGS, fail_fast=False,
+                 selection=ALL_RULES):
+        """Load the rule sets for the profile. If merged is True the rules for all of
+        the sections are compiled into a single rule set so that each document is
+        validated with a single transform, results are still reported by section.
+        The engine is either 'xslt', the ISO Schematron XSLT implementation, or
+        'xpath' which evaluates the same rules as compiled XPath expressions.
+        Pass a Timings instance as timings to record the parse step and the transform
+        and report steps of each section. If fail_fast is True the sections after the
+        first one with an error aren't checked and are reported with UNKNOWN status,
+        merged rules are always checked in one pass. A RuleSelection limits the
+        sections and asserts that are loaded and checked, sections without any
+        selected assert are left out."""
+        if engine not in self.ENGINES:
+            raise ValueError('Unknown rules engine {}, expected one of {}.'.format(
+                engine, ', '.join(self.ENGINES)))
+        rules_class = self.ENGINES[engine]
         self.rulesets = {}
+        self.merged = merged
+        self.engine = engine
+        self.timings = timings
+        self.fail_fast = fail_fast
+        self.selection = selection
+        self.sections = selection.select_sections(self.SECTIONS)
         self.is_valid = False
         self.is_wellformed = False
         self.results = {}
         self.messages = []
-        for section in self.SECTIONS:
-            self.rulesets[section] = ValidationRules(section)
+        if merged and self.sections:
+            self.rulesets[self.MERGED] = rules_class.merged(self.sections, selection)
+        else:
+            for section in self.sections:
+                self.rulesets[section] = rules_class(section, selection=selection)
+        for ruleset in self.rulesets.values():
+            ruleset.timings = timings
 
     def validate(self, to_validate, is_root=True):
-        """Validates a file against each loaded ruleset."""
+        """Validates a file against each loaded ruleset. The file is only parsed once,
+        to_validate can also be a document that has already been parsed."""
         is_valid = True
         self.is_wellformed = True
         self.results = {}
         self.messages = []
-        for section in self.SECTIONS:
-            try:
-                self.rulesets[section].validate(to_validate)
-            except etree.XMLSyntaxError as parse_err:
-                self.is_wellformed = False
-                self.is_valid = False
-                self.messages.append(parse_err.msg)
-                return
-            self.results[section] = self.rulesets[section].get_report()
-            if self.results[section].status != MetadataStatus.VALID:
+        start = self.timings.start()
+        try:
+            to_validate = _as_tree(to_validate)
+        except etree.XMLSyntaxError as parse_err:
+            self.is_wellformed = False
+            self.is_valid = False
+            self.messages.append(parse_err.msg)
+            return False, MetadataChecks(status=MetadataStatus.NOTVALID, messages=[])
+        self.timings.stop(start, 'parse')
+        if self.merged:
+            self.results = self.rulesets[self.MERGED].check_sections(to_validate, self.sections) \
+                if self.sections else {}
+        else:
+            stopped = False
+            for section in self.sections:
+                if stopped:
+                    self.results[section] = _not_run(section, 'Schematron section')
+                    continue
+                self.results[section] = self.rulesets[section].check(to_validate)
+                stopped = self.fail_fast and \
+                    self.results[section].status == MetadataStatus.NOTVALID
+        for result in self.results.values():
+            if result.status != MetadataStatus.VALID:
                 is_valid = False
         self.is_valid = is_valid
         messages = []
@@ -309,27 +1034,350 @@ class ValidationProfile():
         """Return only the results for element name."""
         return self.results.get(name)
 
-def validate_ip(to_validate):
-    # Schematron validation profile
-    schema_results = {}
-    schematron_results = {}
-    package_files = {}
-    validator = MetsValidator(to_validate)
-    mets_path = os.path.join(to_validate, 'METS.xml')
-    results = validator.validate_mets(mets_path)
-    schema_results['root'] = results
-    package_files['root'] = validator.file_refs
-    for mets in validator.subsequent_mets:
-        sub_validator = MetsValidator(mets[1].path)
-        schema_results[mets[0]] = sub_validator.validate_mets(os.path.join(to_validate,
-                                                                           mets[1].path))
-        package_files[mets[0]] = sub_validator.file_refs
-    profile = ValidationProfile()
-    schematron_results['root'] = profile.validate(mets_path)
-    for name, result in schema_results.items():
-        if result[0]:
-            for mets in validator.subsequent_mets:
-                mets_path = mets[1].path
-                schematron_results[mets[0]] = profile.validate(os.path.join(to_validate, mets_path),
-                                                               False)
-    return schema_results['root'][0] and schematron_results['root'][0], MetadataResults(results[1], schematron_results)
+class ValidationPlan():
+    """Plans and runs the METS schema and Schematron validation of a package.
+
+    Each METS document in the package is scheduled exactly once for each check,
+    however many representations reference it, and results are shared by path.
+    The seconds spent on each check of each document are kept in timings as a
+    Timings instance by path."""
+    SCHEMA = 'schema'
+    SCHEMATRON = 'schematron'
+    FIXITY = 'fixity'
+
+    def __init__(self, to_validate, merged=False, engine='xslt', instrument=False,
+                 checksums=False, cache=None, fail_fast=False, selection=ALL_RULES,
+                 index=None, references=False, tree=None):
+        """Plan the validation of the package rooted at to_validate.
+
+        :param merged: If True each document's Schematron rules run as a single
+                       transform, see ValidationProfile.
+        :param engine: The Schematron rules engine, 'xslt' or 'xpath'.
+        :param instrument: If True timings also record the parse, xsd, transform and
+                           report steps, by section and for the XPath engine by
+                           assertion.
+        :param checksums: If True the files each METS document references are checked
+                          for existence, size and checksum, see fixity.FixityChecker.
+        :param cache: Optional cache.ResultCache that reuses the schema and Schematron
+                      results of documents with the same content, validated against
+                      the same resources, or a cache.Snapshot that also skips hashing
+                      the unchanged files of a package.
+        :param fail_fast: If True validation stops at the first error, checks that
+                          weren't run are reported with UNKNOWN status.
+        :param selection: A RuleSelection that limits the Schematron checks of every
+                          document.
+        :param index: Optional fileindex.FileIndex that records the files each document
+                      references, they're then read from the index instead of the
+                      document or the cache.
+        :param references: If True the schema check also cross-references element IDs,
+                           see idrefs.
+        :param tree: Optional packagetree.PackageTree of the package, fixity checks of
+                     the documents validated in this process take file sizes from it.
+        """
+        self.root = to_validate
+        self.tree = tree
+        self.profile_options = {'merged': merged, 'engine': engine, 'fail_fast': fail_fast,
+                                'selection': selection}
+        self.check_options = {'instrument': instrument, 'checksums': checksums, 'cache': cache,
+                              'index': index, 'references': references,
+                              'package': to_validate}
+        self.documents = {}
+        self.results = {}
+        self.timings = {}
+        self.stopped = False
+
+    def schedule(self, name, mets_path):
+        """Add the METS document at mets_path to the plan under name, returns True if
+        the document still needs validating."""
+        path = os.path.normpath(mets_path)
+        self.documents[name] = path
+        return path not in self.results
+
+    @property
+    def pending(self):
+        """Return the paths of scheduled documents that haven't been validated yet."""
+        return [path for path in dict.fromkeys(self.documents.values())
+                if path not in self.results]
+
+    def run(self, workers=None):
+        """Validate every document in the plan, starting with the package METS which
+        lists the representation METS documents. If workers is greater than 1 the
+        representation documents are validated in a pool of that many processes.
+        Results are always merged in the order the representations are listed in
+        the package METS. In fail fast mode the documents after the first one that
+        isn't valid aren't validated."""
+        self.schedule('root', os.path.join(self.root, 'METS.xml'))
+        root_path = self.documents['root']
+        self._record(root_path, _check_mets(root_path, **self.check_options,
+                                            tree=self.tree, **self.profile_options))
+        for name, file_ref in self.results[root_path][2]:
+            self.schedule(name, os.path.join(self.root, file_ref.path))
+        pending = self.pending
+        self.stopped = self.profile_options['fail_fast'] and \
+            not _is_valid(self.results[root_path])
+        if not self.stopped:
+            checks = self._check_all(pending, workers)
+            for path, checked in zip(pending, checks):
+                self._record(path, checked)
+                if self.profile_options['fail_fast'] and not _is_valid(checked):
+                    self.stopped = True
+                    break
+            checks.close()
+        for path in self.pending:
+            self.results[path] = None, (False, _not_run(path, 'Representation METS')), [], None
+        return self.get_results()
+
+    def get_results(self):
+        """Return the (is_valid, MetadataResults) tuple for the validated plan. The
+        package is only valid if every document passed its schema, Schematron and
+        fixity checks, in fail fast and full validation alike. Fixity failures and
+        the schema errors of representation METS are added to the schema results."""
+        root_path = self.documents['root']
+        paths = list(dict.fromkeys(self.documents.values()))
+        schematron_results = {name: self.results[path][1]
+                              for name, path in self.documents.items()}
+        schema_checks = self.results[root_path][0][1]
+        for path in paths:
+            rep_schema = self.results[path][0]
+            if path != root_path and rep_schema and not rep_schema[0]:
+                schema_checks = MetadataChecks(status=MetadataStatus.NOTVALID,
+                                               messages=schema_checks.messages +
+                                               rep_schema[1].messages)
+        fixity_results = [self.results[path][3] for path in paths
+                          if self.results[path][3] is not None]
+        fixity_valid = all(result.status != MetadataStatus.NOTVALID for result in fixity_results)
+        fixity_messages = [message for result in fixity_results for message in result.messages]
+        if fixity_messages:
+            status = schema_checks.status if fixity_valid else MetadataStatus.NOTVALID
+            schema_checks = MetadataChecks(status=status,
+                                           messages=schema_checks.messages + fixity_messages)
+        # Documents fail fast validation didn't run are never valid
+        is_valid = not self.stopped and all(_is_valid(self.results[path]) for path in paths)
+        return is_valid, MetadataResults(schema_checks, schematron_results)
+
+    def _check_all(self, paths, workers):
+        check = functools.partial(_check_mets, **self.check_options,
+                                  **self.profile_options)
+        if not workers or workers < 2 or len(paths) < 2:
+            yield from (check(path, tree=self.tree) for path in paths)
+            return
+        # The tree isn't sent to workers, pickling it for each document costs more
+        # than the stat calls it saves
+        executor = futures.ProcessPoolExecutor(max_workers=min(workers, len(paths)))
+        submitted = [executor.submit(check, path) for path in paths]
+        try:
+            # Results are yielded in submission order, whatever order workers finish in
+            for future in submitted:
+                yield future.result()
+        finally:
+            # Cancels the documents still queued if the caller stops early
+            for future in submitted:
+                future.cancel()
+            executor.shutdown()
+
+    def _record(self, path, checked):
+        schema_result, schematron_result, subsequent_mets, fixity_result, timings = checked
+        self.results[path] = schema_result, schematron_result, subsequent_mets, fixity_result
+        self.timings[path] = timings
+        logging.debug("%s: %s", path, timings)
+
+def _check_mets(mets_path, instrument=False, checksums=False, cache=None, index=None,
+                references=False, tree=None, package=None, **profile_options):
+    """Schema and Schematron validate a single METS document, this is run in worker
+    processes so it must stay a module level function. Returns the schema and
+    Schematron results, the representation METS the document lists, the fixity
+    MetadataChecks if checksums is True or None and the Timings of each check,
+    broken down further if instrument is True. Results are read from and written to
+    cache if given, the files the document references are recorded in index if given
+    and read back from it, rather than the parsed document, once indexed.
+    If references is True the schema check includes the ID cross-reference check.
+    Fixity checks look file sizes up in tree if given and report files outside
+    package, the package folder, defaulting to the folder of the document.
+    profile_options are passed to the ValidationProfile."""
+    timings = Timings()
+    detail = timings if instrument else NO_TIMINGS
+    fail_fast = profile_options.get('fail_fast', False)
+    digest = mets_digest(mets_path, cache) if cache is not None or index is not None else None
+    keys = _cache_keys(digest, references, **profile_options) \
+        if cache is not None and digest else {}
+    start = timings.start()
+    # An indexed document's FileRefs are read from the index rather than the parsed METS
+    indexed = index is not None and digest is not None and index.has(digest)
+    validator = MetsValidator(os.path.dirname(mets_path), timings=detail, fail_fast=fail_fast,
+                              references=references, collect_refs=not indexed)
+    cached = cache.get(keys[ValidationPlan.SCHEMA]) if keys else None
+    if cached is not None and cached['file_refs'] is None and index is None:
+        # The FileRefs were recorded in a FileIndex that isn't available
+        cached = None
+    if cached is None:
+        schema_result = validator.validate_mets(mets_path)
+        if indexed and not (fail_fast and not schema_result[0]):
+            _refs_from_index(validator, index, digest)
+        elif not indexed:
+            indexed = index is not None and digest is not None and \
+                validator.parsed_mets is not None and not (fail_fast and not schema_result[0])
+            if indexed:
+                index.add(mets_path, digest, validator.file_refs, validator.subsequent_mets)
+        if keys:
+            cache.put(keys[ValidationPlan.SCHEMA], _schema_to_cache(mets_path, schema_result,
+                                                                    validator, indexed))
+    else:
+        schema_result = _schema_from_cache(mets_path, cached, validator, index, digest)
+    timings.stop(start, ValidationPlan.SCHEMA)
+    if fail_fast and not schema_result[0]:
+        fixity_result = _not_run(mets_path, 'Fixity checks') if checksums else None
+        return schema_result, (False, _not_run(mets_path, 'Schematron validation')), \
+            validator.subsequent_mets, fixity_result, timings
+    start = timings.start()
+    cached = cache.get(keys[ValidationPlan.SCHEMATRON]) if keys else None
+    if cached is None:
+        profile = ValidationProfile(timings=detail, **profile_options)
+        schematron_result = profile.validate(_parsed_or_path(validator, mets_path))
+        if keys:
+            cache.put(keys[ValidationPlan.SCHEMATRON], _result_to_cache(schematron_result))
+    else:
+        schematron_result = _result_from_cache(cached)
+    timings.stop(start, ValidationPlan.SCHEMATRON)
+    fixity_result = None
+    if checksums and fail_fast and not schematron_result[0]:
+        fixity_result = _not_run(mets_path, 'Fixity checks')
+    elif checksums:
+        start = timings.start()
+        file_refs = validator.file_refs + [file_ref for _, file_ref in validator.subsequent_mets]
+        fixity_result = fixity.check_file_refs(os.path.dirname(mets_path), file_refs,
+                                               fail_fast=fail_fast, digests=cache, tree=tree,
+                                               package=package)
+        timings.stop(start, ValidationPlan.FIXITY)
+    return schema_result, schematron_result, validator.subsequent_mets, fixity_result, timings
+
+def validate_ip(to_validate, merged=False, workers=None, engine='xslt', checksums=False,
+                cache=None, fail_fast=False, selection=ALL_RULES, index=None,
+                references=False, tree=None, timings=None):
+    """Validate the METS files of the package rooted at to_validate against the METS
+    schema and the Schematron rules, and optionally check the fixity of the files
+    they reference, see ValidationPlan. Returns an (is_valid, MetadataResults) tuple,
+    pass a dictionary as timings to have it filled with the detailed Timings of each
+    document, by path."""
+    plan = ValidationPlan(to_validate, merged=merged, engine=engine,
+                          instrument=timings is not None, checksums=checksums, cache=cache,
+                          fail_fast=fail_fast, selection=selection, index=index,
+                          references=references, tree=tree)
+    validated = plan.run(workers)
+    if timings is not None:
+        timings.update(plan.timings)
+    return validated
+
+def _is_valid(checked):
+    """Return True if the schema, Schematron and any fixity checks of a document
+    validated by _check_mets all passed."""
+    schema_result, schematron_result, _, fixity_result = checked[:4]
+    return schema_result[0] and schematron_result[0] and \
+        (fixity_result is None or fixity_result.status != MetadataStatus.NOTVALID)
+
+def _not_run(location, check):
+    """Return the MetadataChecks reported for check at location when fail fast
+    validation stopped before running it."""
+    return MetadataChecks(status=MetadataStatus.UNKNOWN, messages=[
+        TestResult(rule_id=NOT_RUN, location=location, severity=Severity.INFO,
+                   message='{} not run, fail fast validation stopped at an earlier '
+                           'error.'.format(check))])
+
+def _parsed_or_path(validator, mets_path):
+    """Return the document parsed by validator or mets_path if it couldn't be parsed."""
+    return validator.parsed_mets if validator.parsed_mets is not None else mets_path
+
+@functools.lru_cache(maxsize=None)
+def resources_fingerprint():
+    """Return the SHA-256 of the METS schema and Schematron resources, validation
+    results can be reused for as long as the fingerprint doesn't change. The
+    resources are only hashed once per process."""
+    digest = hashlib.sha256()
+    for package in (SCHEMA, SCHEMATRON):
+        for resource in sorted(files(package).iterdir(), key=lambda res: res.name):
+            if resource.is_file() and resource.name.endswith(('.xsd', '.xml')):
+                digest.update(resource.name.encode('utf-8'))
+                digest.update(resource.read_bytes())
+    return digest.hexdigest()
+
+def mets_digest(mets_path, cache=None):
+    """Return the SHA-256 of the METS document at mets_path, the key of its cached
+    results and file index entries, or None if it can't be read. A cache.Snapshot
+    passed as cache returns the digest it recorded if the file hasn't changed."""
+    try:
+        if cache is not None:
+            return cache.digest(mets_path, ChecksumAlg.SHA256)
+        return Checksums.from_file(mets_path, ChecksumAlg.SHA256).value
+    except OSError:
+        return None
+
+def _cache_keys(digest, references=False, merged=False, engine='xslt', fail_fast=False,
+                selection=ALL_RULES):
+    """Return the cache keys of the schema and Schematron results of the METS document
+    with digest."""
+    prefix = '{}:{}:{}:{}'.format(CACHE_VERSION, digest, resources_fingerprint(),
+                                  'fail_fast' if fail_fast else 'full')
+    return {
+        ValidationPlan.SCHEMA: '{}:{}{}'.format(prefix, ValidationPlan.SCHEMA,
+                                                ':references' if references else ''),
+        ValidationPlan.SCHEMATRON: '{}:{}:{}:{}:{!r}'.format(prefix, ValidationPlan.SCHEMATRON,
+                                                             engine, merged, selection)
+    }
+
+def _result_to_cache(result, mets_path=None):
+    """Serialise an (is_valid, MetadataChecks) tuple, locations that are mets_path are
+    stored as None so results can be shared by documents with the same content."""
+    is_valid, checks = result
+    return [is_valid, checks.status,
+            [[None if message.location == mets_path else message.location,
+              message.rule_id, message.message, message.severity]
+             for message in checks.messages]]
+
+def _result_from_cache(cached, mets_path=None):
+    is_valid, status, messages = cached
+    return is_valid, MetadataChecks(status=status, messages=[
+        TestResult(rule_id=rule_id, location=mets_path if location is None else location,
+                   message=message, severity=severity)
+        for location, rule_id, message, severity in messages])
+
+def _schema_to_cache(mets_path, result, validator, indexed=False):
+    """Serialise the schema result of validator along with the FileRefs it found,
+    unless they're indexed, in which case they're stored as None."""
+    if indexed:
+        return {'result': _result_to_cache(result, mets_path), 'file_refs': None,
+                'subsequent_mets': None}
+    return {
+        'result': _result_to_cache(result, mets_path),
+        'file_refs': [_file_ref_to_cache(file_ref) for file_ref in validator.file_refs],
+        'subsequent_mets': [[rep, _file_ref_to_cache(file_ref)]
+                            for rep, file_ref in validator.subsequent_mets]
+    }
+
+def _schema_from_cache(mets_path, cached, validator, index=None, digest=None):
+    """Restore a cached schema result, and the FileRefs it found, to validator. Indexed
+    FileRefs are read from index, which indexes the document again if needed."""
+    if cached['file_refs'] is None:
+        _refs_from_index(validator, index, index.ensure(mets_path, digest))
+    else:
+        validator.file_refs.extend(_file_ref_from_cache(file_ref)
+                                   for file_ref in cached['file_refs'])
+        validator.subsequent_mets.extend((rep, _file_ref_from_cache(file_ref))
+                                         for rep, file_ref in cached['subsequent_mets'])
+    return _result_from_cache(cached['result'], mets_path)
+
+def _refs_from_index(validator, index, digest):
+    """Add the FileRefs, and representation METS, indexed for digest to validator."""
+    validator.file_refs.extend(index.file_refs(digest))
+    validator.subsequent_mets.extend(index.subsequent_mets(digest))
+
+def _file_ref_to_cache(file_ref):
+    if file_ref is None:
+        return None
+    checksum = file_ref.checksum
+    return [file_ref.path, file_ref.size,
+            checksum.algorithm if checksum else None, checksum.value if checksum else None]
+
+def _file_ref_from_cache(cached):
+    if cached is None:
+        return None
+    path, size, algorithm, value = cached
+    return FileRef(path, size, Checksum(algorithm, value) if algorithm else None)
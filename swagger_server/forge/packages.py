@@ -33,25 +33,40 @@ import zipfile
 
 from swagger_server.forge import manifests
 from swagger_server.forge import structure, metadata
-from swagger_server.models import PackageDetails, ValidationReport
+from swagger_server.forge.packagetree import PackageTree
+from swagger_server.forge.timing import NO_TIMINGS, Timings
+from swagger_server.models import ChecksumAlg, PackageDetails, ValidationReport
 
 class ArchivePackageHandler():
     """Class to handle archive / compressed information packages."""
     def __init__(self, unpack_root=tempfile.gettempdir()):
         self._unpack_root = unpack_root
+        self._checksums = []
 
     @property
     def unpack_root(self):
         """Returns the root directory for archive unpacking."""
         return self._unpack_root
 
-    def unpack_package(self, to_unpack, dest=None):
+    @property
+    def checksums(self):
+        """Returns the list of Checksums of the last archive unpacked."""
+        return self._checksums
+
+    def unpack_package(self, to_unpack, dest=None, checksum_algs=None):
         """Unpack an archived package to a destination (defaults to tempdir).
-        returns the destination folder."""
+        returns the destination folder. The archive's SHA1, which names the folder,
+        and its checksums for any other checksum_algs are calculated from a single
+        read of the archive and kept in checksums."""
         if not os.path.isfile(to_unpack) or not self.is_archive(to_unpack):
             raise ValueError('Parameter "to_unpack": {} does not reference a file'
                 'of known archive format (zip or tar).'.format(to_unpack))
-        sha1 = manifests.Checksums.from_file(to_unpack)
+        algorithms = [ChecksumAlg.SHA1] + [alg for alg in checksum_algs or []
+                                           if alg != ChecksumAlg.SHA1]
+        parallel = len(algorithms) > 1 and os.path.getsize(to_unpack) >= manifests.PARALLEL_SIZE
+        self._checksums = manifests.Checksums.all_from_file(
+            to_unpack, algorithms, blocksize=manifests.PARALLEL_BLOCKSIZE, parallel=parallel)
+        sha1 = self._checksums[0]
         dest_root = dest if dest else self.unpack_root
         destination = os.path.join(dest_root, sha1.value)
         if zipfile.is_zipfile(to_unpack):
@@ -69,7 +84,11 @@ class ArchivePackageHandler():
             return True
         return tarfile.is_tarfile(to_test)
 
-def get_ip_root(info_pack):
+def get_ip_root(info_pack, unpack=True):
+    """Return the folder to validate for info_pack and its PackageDetails. Archives
+    are unpacked unless unpack is False, they're then returned as they are, validate
+    runs the structure checks of an archive from its listing. Like the listing, an
+    unpacked archive holding a single folder is rooted at that folder."""
     # This is a var for the final source to validate
     to_validate = info_pack
 
@@ -81,12 +100,48 @@ def get_ip_root(info_pack):
             # If not we can't process
             raise ValueError('{} must be a zip/tar archive or an XML METS file.'.format(info_pack))
         # Unpack the archive and set the source
-        to_validate = ArchivePackageHandler().unpack_package(info_pack)
+        if unpack:
+            to_validate = ArchivePackageHandler().unpack_package(info_pack)
+            folder = PackageTree.from_directory(to_validate).root_folder()
+            if folder:
+                to_validate = os.path.join(to_validate, folder)
     return to_validate, PackageDetails(name=os.path.basename(to_validate))
 
-def validate(to_validate, struct_only=False):
-    struct_valid, struct_results = structure.validate(to_validate)
+def validate(to_validate, struct_only=False, workers=None, engine='xslt', checksums=False,
+             cache=None, fail_fast=False, selection=metadata.ALL_RULES, index=None,
+             references=False, timings=None, merged=False):
+    """Validate the structure and, if it's valid, the metadata of the package folder or
+    archive to_validate, returns an (is_valid, ValidationReport) tuple. With merged=True
+    the Schematron rules for every METS section are run as a single transform. Pass
+    a dictionary as timings to have it filled with Timings by path, the structure,
+    unpack and metadata phases under to_validate and the checks of each METS
+    document, see metadata.validate_ip."""
+    package = to_validate
+    phases = NO_TIMINGS
+    if timings is not None:
+        # The package phases are listed before its documents
+        phases = timings[package] = Timings()
+    # Archives are structure checked from their listing and only unpacked if needed,
+    # the scan of a package folder is shared by the structure and fixity checks
+    start = phases.start()
+    archive = to_validate if os.path.isfile(to_validate) else None
+    tree = PackageTree.from_archive(archive) if archive else \
+        PackageTree.from_directory(to_validate)
+    struct_valid, struct_results = structure.validate(tree.root, tree)
+    phases.stop(start, 'structure')
     if not struct_valid or struct_only:
-        return False, ValidationReport(structure=struct_results)
-    md_valid, md_results = metadata.validate_ip(to_validate)
-    return md_valid, ValidationReport(structure=struct_results, metadata=md_results)
+        validated = False, ValidationReport(structure=struct_results)
+    else:
+        if archive:
+            start = phases.start()
+            to_validate, _ = get_ip_root(archive)
+            tree = PackageTree.from_directory(to_validate)
+            phases.stop(start, 'unpack')
+        start = phases.start()
+        md_valid, md_results = metadata.validate_ip(
+            to_validate, merged=merged, workers=workers, engine=engine, checksums=checksums,
+            cache=cache, fail_fast=fail_fast, selection=selection, index=index,
+            references=references, tree=tree, timings=timings)
+        phases.stop(start, 'metadata')
+        validated = md_valid, ValidationReport(structure=struct_results, metadata=md_results)
+    return validated
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+In memory snapshot of the folders and files of an information package.
+"""
+import os
+import stat
+import tarfile
+import zipfile
+
+class PackageTree():
+    """Snapshot of the folders and files under a package root.
+
+    Each folder is listed with a single os.scandir call the first time it's needed
+    and the listing is kept, so the structure checks, manifest building and fixity
+    checks of a package share one walk, however many of them look at a folder.
+    Folders and files are told apart from the entry types the listing returns and
+    the stat result of an entry is read the first time it's asked for and kept.
+    Paths in the snapshot are relative to the root and use / separators, the root
+    folder is ''. Names are kept in the order the file system listed them.
+
+    A tree can also be built from a listing of paths, such as the members of an
+    archive, its root is then a name for the listing and the file system is never
+    read, paths that aren't listed don't exist."""
+    def __init__(self, root, folders=None):
+        self._root = root
+        self._prefix = os.path.join(os.path.normpath(root), '')
+        self._listed = folders is not None
+        self._folders = folders if folders is not None else {}
+
+    @classmethod
+    def from_directory(cls, root):
+        """Return the snapshot of the directory tree rooted at root."""
+        return cls(root)
+
+    @classmethod
+    def from_paths(cls, root, listing):
+        """Return the tree of listing, an iterable of (path, is_folder, size)
+        tuples with / separated paths relative to root, size may be None. Folders
+        don't need to be listed before their contents, or at all. Paths that climb
+        out of the root with .. are left out. Listing order is kept."""
+        folders = {'': {}}
+        for path, is_folder, size in listing:
+            parent, _, name = path.strip('/').rpartition('/')
+            entries = folders.get(parent)
+            if entries is None or name in ('', '.', '..'):
+                # Folder paths are kept normalised, so only the first path listed in
+                # a folder, or a path that isn't normalised, is split
+                parts = [part for part in path.split('/') if part not in ('', '.')]
+                if not parts or '..' in parts:
+                    continue
+                parent = ''
+                for part in parts[:-1]:
+                    parent = _add_listed(folders, parent, part, True, None)
+                    if parent is None:
+                        break
+                else:
+                    _add_listed(folders, parent, parts[-1], is_folder, size)
+            elif name not in entries:
+                entries[name] = ListedEntry(name, is_folder, size)
+                if is_folder:
+                    folders[_join(parent, name)] = {}
+        return cls(root, folders)
+
+    @classmethod
+    def from_archive(cls, archive):
+        """Return the tree of the members of a zip or tar archive, read from the zip
+        central directory or the tar headers without extracting anything. If the
+        archive holds a single root folder, as CSIPSTR1 requires, that's the root of
+        the tree and its path is archive/folder, otherwise the root is the archive."""
+        if zipfile.is_zipfile(archive):
+            with zipfile.ZipFile(archive) as zip_ip:
+                tree = cls.from_paths(archive, ((info.filename, info.is_dir(), info.file_size)
+                                                for info in zip_ip.infolist()))
+        elif tarfile.is_tarfile(archive):
+            with tarfile.open(archive) as tar_ip:
+                tree = cls.from_paths(archive, ((member.name, member.isdir(), member.size)
+                                                for member in tar_ip
+                                                if member.isdir() or member.isreg()))
+        else:
+            raise ValueError('{} is not an archive of known format (zip or tar).'
+                             .format(archive))
+        folder = tree.root_folder()
+        return tree._subtree(folder) if folder else tree
+
+    @classmethod
+    def from_manifest(cls, manifest, root):
+        """Return the tree of the entry paths of a Manifest below the package root
+        folder root, read in one pass over its entries. The root must be given, a
+        root guessed from the entries can't tell a package missing its root METS.xml
+        from a package with a single representation."""
+        entries = manifest.entries or []
+        anchor = os.sep if entries and os.path.isabs(entries[0].path) else ''
+        tree = cls.from_paths(anchor, ((entry.path.replace(os.sep, '/'), False, entry.size)
+                                       for entry in entries))
+        return tree._subtree('/'.join(part for part in root.replace(os.sep, '/').split('/')
+                                      if part not in ('', '.')))
+
+    @property
+    def root(self):
+        """Returns the file system path of the package root."""
+        return self._root
+
+    def root_folder(self):
+        """Return the name of the folder in the root if it's the only entry there, the
+        package root folder of an archive as CSIPSTR1 requires, otherwise None."""
+        names = self.names()
+        return names[0] if len(names) == 1 and self.is_dir(names[0]) else None
+
+    def relative(self, path):
+        """Return the snapshot path of the file system path, or None if path isn't
+        below the package root."""
+        if path == self._root:
+            return ''
+        if path.startswith(self._prefix):
+            # Saves relpath's absolute path resolution for paths joined to the root
+            relative = os.path.normpath(path[len(self._prefix):])
+        else:
+            relative = os.path.relpath(path, self._root)
+        if relative == os.curdir:
+            return ''
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+        return relative.replace(os.sep, '/')
+
+    def names(self, path=''):
+        """Return the names in the folder at path in listing order, an empty list if
+        there's no such folder."""
+        return list(self._listing(path) or ())
+
+    def folders(self, path=''):
+        """Return the frozenset of the names of the sub-folders of the folder at path."""
+        return frozenset(name for name, entry in (self._listing(path) or {}).items()
+                         if entry.is_dir())
+
+    def files(self, path=''):
+        """Return the frozenset of the names of the files in the folder at path."""
+        return frozenset(name for name, entry in (self._listing(path) or {}).items()
+                         if entry.is_file())
+
+    def is_dir(self, path):
+        """Return True if path is a folder."""
+        return self._listing(path) is not None
+
+    def is_file(self, path):
+        """Return True if path is a file."""
+        entry = self._entry(path)
+        return entry is not None and entry.is_file()
+
+    def walk_files(self, path='', recurse=True):
+        """Yield a (path, os.DirEntry) tuple for each file below the folder at path,
+        folder by folder, top down in listing order. The entry's path is the file
+        system path, its stat method returns the snapshot's stat result. Like os.walk
+        symbolic links to folders aren't followed. Only the folder's own files are
+        returned if recurse is False."""
+        to_walk = [path]
+        while to_walk:
+            folder = to_walk.pop()
+            entries = self._listing(folder) or {}
+            for name, entry in entries.items():
+                if entry.is_file():
+                    yield _join(folder, name), entry
+            if recurse:
+                to_walk.extend(reversed([_join(folder, name) for name, entry in entries.items()
+                                         if entry.is_dir(follow_symlinks=False)]))
+
+    def stat(self, path):
+        """Return the os.stat_result of the file system path, following symbolic
+        links like os.stat, or None if there's no such file. Paths outside the
+        package root are looked up on the file system."""
+        relative = self.relative(path)
+        if not relative and self._listed:
+            return None
+        if not relative:
+            try:
+                return os.stat(path)
+            except OSError:
+                return None
+        entry = self._entry(relative)
+        try:
+            return entry.stat() if entry is not None else None
+        except OSError:
+            return None
+
+    def _entry(self, path):
+        folder, _, name = path.rpartition('/')
+        return (self._listing(folder) or {}).get(name) if name else None
+
+    def _listing(self, path):
+        """Return the {name: os.DirEntry} dict of the folder at path, or None if it
+        can't be listed, listing it on first use."""
+        if path is None:
+            return None
+        try:
+            return self._folders[path]
+        except KeyError:
+            if self._listed:
+                return None
+        listing = None
+        entry = self._entry(path)
+        if path == '' or entry is not None and entry.is_dir():
+            try:
+                with os.scandir(os.path.join(self._root, path.replace('/', os.sep))) as scan:
+                    listing = {entry.name: entry for entry in scan}
+            except OSError:
+                pass
+        self._folders[path] = listing
+        return listing
+
+    def _subtree(self, folder):
+        """Return the listed tree of the folder at path folder."""
+        if not folder:
+            return self
+        prefix = folder + '/'
+        folders = {path[len(prefix):] if path != folder else '': entries
+                   for path, entries in self._folders.items() if path.startswith(prefix)
+                   or path == folder}
+        return PackageTree(os.path.join(self._root, folder.replace('/', os.sep)), folders)
+
+class ListedEntry():
+    """A file or folder of a listed PackageTree, with the os.DirEntry methods the
+    tree uses. Its stat result only holds the entry type and size."""
+    __slots__ = ('name', '_is_folder', '_size')
+
+    def __init__(self, name, is_folder, size=None):
+        self.name = name
+        self._is_folder = is_folder
+        self._size = size
+
+    def is_dir(self, follow_symlinks=True):
+        """Return True if the entry is a folder."""
+        return self._is_folder
+
+    def is_file(self, follow_symlinks=True):
+        """Return True if the entry is a file."""
+        return not self._is_folder
+
+    def stat(self, follow_symlinks=True):
+        """Return an os.stat_result with the entry's type and size."""
+        mode = stat.S_IFDIR if self._is_folder else stat.S_IFREG
+        return os.stat_result((mode, 0, 0, 0, 0, 0, self._size or 0, 0, 0, 0))
+
+def scan_files(root, recurse=True):
+    """Yield the os.DirEntry of each file below the folder root from a single os.scandir
+    walk, folder by folder, top down in listing order, without keeping the listings
+    as a PackageTree does. Like os.walk folders that can't be listed are skipped and
+    symbolic links to folders aren't followed. Only the files in root are returned
+    if recurse is False."""
+    to_scan = [root]
+    while to_scan:
+        folder = to_scan.pop()
+        subfolders = []
+        try:
+            with os.scandir(folder) as scan:
+                for entry in scan:
+                    if entry.is_file():
+                        yield entry
+                    elif recurse and entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.path)
+        except OSError:
+            continue
+        to_scan.extend(reversed(subfolders))
+
+def _add_listed(folders, folder, name, is_folder, size):
+    """Add the entry name to folder in a listed tree, return its path or None if
+    folder was listed as a file."""
+    entries = folders.get(folder)
+    if entries is None:
+        return None
+    path = _join(folder, name)
+    if name not in entries:
+        entries[name] = ListedEntry(name, is_folder, size)
+        if is_folder:
+            folders[path] = {}
+    return path
+
+def _join(folder, name):
+    return folder + '/' + name if folder else name
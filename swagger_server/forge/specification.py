@@ -23,15 +23,19 @@
 # under the License.
 #
 """Module covering information package structure validation and navigation."""
+import functools
+import json
+
 import lxml.etree as ET
 
 from importlib_resources import files
 
 import swagger_server.forge.resources.profiles as PROFILES
 import swagger_server.forge.resources.schemas as SCHEMA
-from swagger_server.forge.structure import REQUIREMENTS
+from swagger_server.forge import bundle
+from swagger_server.forge.structure import REQUIREMENTS, Level
 
-METS_PROF_SCHEMA = ET.XMLSchema(file=str(files(SCHEMA).joinpath('mets.profile.v2-0.xsd')))
+METS_PROF_SCHEMA = str(files(SCHEMA).joinpath('mets.profile.v2-0.xsd'))
 CSIP_XML = str(files(PROFILES).joinpath('E-ARK-CSIP.xml'))
 SIP_XML = str(files(PROFILES).joinpath('E-ARK-SIP.xml'))
 DIP_XML = str(files(PROFILES).joinpath('E-ARK-DIP.xml'))
@@ -44,6 +48,18 @@ class Specification:
         self._version = version
         self._date = date
         self._requirements = requirements if requirements else {}
+        self._index_requirements()
+
+    def _index_requirements(self):
+        """Index the requirements in order, by id and by level."""
+        self._all = []
+        self._by_id = {}
+        self._by_level = {}
+        for section in self._requirements:
+            for requirement in self._requirements[section]:
+                self._all.append(requirement)
+                self._by_id[requirement.id] = requirement
+                self._by_level.setdefault(_level_name(requirement.level), []).append(requirement)
 
     @property
     def name(self):
@@ -63,27 +79,27 @@ class Specification:
     @property
     def requirements(self):
         """Get the specification rules."""
-        for section in self.sections:
-            for requirement in self._requirements[section]:
-                yield requirement
+        for requirement in self._all:
+            yield requirement
 
     @property
     def requirement_count(self):
         """Return the number of requirments in the specification."""
-        req_count = 0
-        for sect in self.sections:
-            req_count += len(self._requirements[sect])
-        return req_count
+        return len(self._all)
 
     def section_requirements(self, section=None):
         """Get the specification requirements, by section if offered."""
-        requirements = []
         if section:
-            requirements = self._requirements[section]
-        else:
-            for sect in self.sections:
-                requirements += self._requirements[sect]
-        return requirements
+            return self._requirements[section]
+        return list(self._all)
+
+    def get_requirement_by_id(self, req_id):
+        """Return the requirement with the id req_id, or None if there isn't one."""
+        return self._by_id.get(req_id)
+
+    def level_requirements(self, level):
+        """Get the specification requirements of a level, MUST, SHOULD or MAY."""
+        return list(self._by_level.get(_level_name(level), []))
 
     @property
     def section_count(self):
@@ -99,8 +115,29 @@ class Specification:
         return "name:" + self.name + ", version:" + \
             str(self.version) + ", date:" + str(self.date)
 
+    def to_dict(self):
+        """Return the specification as a JSON serialisable dictionary."""
+        return {
+            'name': self.name,
+            'version': self.version,
+            'date': self.date,
+            'requirements': {section: [requirement.to_dict() for requirement in reqs]
+                             for section, reqs in self._requirements.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, dikt):
+        """Create a Specification from a dictionary returned by to_dict()."""
+        requirements = {}
+        for section, reqs in dikt['requirements'].items():
+            requirements[section] = [
+                cls.StructuralRequirement.from_dict(req) if 'message' in req
+                else cls.Requirement.from_dict(req) for req in reqs
+            ]
+        return cls(dikt['name'], dikt['version'], dikt['date'], requirements=requirements)
+
     @classmethod
-    def from_xml_string(cls, xml, schema=METS_PROF_SCHEMA):
+    def from_xml_string(cls, xml, schema=None):
         """Create a Specification from an XML string."""
         tree = ET.fromstring(xml)
         return cls._from_xml(tree, schema)
@@ -108,20 +145,20 @@ class Specification:
     @classmethod
     def csip(cls):
         """Create a Specification from an XML file with CSIP."""
-        return  cls.from_xml_file(xml_file=CSIP_XML, schema=METS_PROF_SCHEMA, add_struct=True)
+        return  cls.from_xml_file(xml_file=CSIP_XML, add_struct=True)
 
     @classmethod
     def sip(cls):
         """Create a Specification from an XML file with SIP."""
-        return  cls.from_xml_file(xml_file=SIP_XML, schema=METS_PROF_SCHEMA)
+        return  cls.from_xml_file(xml_file=SIP_XML)
 
     @classmethod
     def dip(cls):
         """Create a Specification from an XML file with DIP."""
-        return  cls.from_xml_file(xml_file=DIP_XML, schema=METS_PROF_SCHEMA)
+        return  cls.from_xml_file(xml_file=DIP_XML)
 
     @classmethod
-    def from_xml_file(cls, xml_file=CSIP_XML, schema=METS_PROF_SCHEMA, add_struct=False):
+    def from_xml_file(cls, xml_file=CSIP_XML, schema=None, add_struct=False):
         """Create a Specification from an XML file."""
         tree = ET.parse(xml_file)
         return  cls._from_xml(tree, schema, add_struct=add_struct)
@@ -132,9 +169,9 @@ class Specification:
         return spec
 
     @classmethod
-    def from_element(cls, spec_ele, schema=METS_PROF_SCHEMA, add_struct=False):
+    def from_element(cls, spec_ele, schema=None, add_struct=False):
         """Create a Specification from an XML element."""
-        # is_valid = schema.assertValid(spec_ele)
+        # is_valid = (schema or get_profile_schema()).assertValid(spec_ele)
         # if not is_valid:
         #     raise ValueError('Specification invalid')
         version = spec_ele.get('ID')
@@ -201,11 +238,22 @@ class Specification:
         def __str__(self):
             return "id:" + self.id + ", name:" + self.name
 
+        def to_dict(self):
+            """Return the requirement as a JSON serialisable dictionary."""
+            return {'id': self.id, 'name': self.name, 'level': self.level,
+                    'xpath': self.xpath, 'cardinality': self.cardinality}
+
+        @classmethod
+        def from_dict(cls, dikt):
+            """Create a Requirement from a dictionary returned by to_dict()."""
+            return cls(dikt['id'], dikt['name'], dikt['level'], dikt['xpath'],
+                       dikt['cardinality'])
+
         @classmethod
         def from_element(cls, req_ele):
             """Return a Requirement instance from an XML element."""
             req_id = req_ele.get('ID')
-            level = req_ele.get('LEVEL')
+            level = req_ele.get('REQLEVEL')
             name = ''
             for child in req_ele:
                 if child.tag == '{http://www.loc.gov/METS_Profile/v2}description':
@@ -239,6 +287,16 @@ class Specification:
         def __str__(self):
             return "id:" + self.id + ", level:" + str(self.level)
 
+        def to_dict(self):
+            """Return the requirement as a JSON serialisable dictionary."""
+            level = self.level.value if isinstance(self.level, Level) else self.level
+            return {'id': self.id, 'level': level, 'message': self.message}
+
+        @classmethod
+        def from_dict(cls, dikt):
+            """Create a StructuralRequirement from a dictionary returned by to_dict()."""
+            return cls.from_values(dikt['id'], Level(dikt['level']), dikt['message'])
+
         @classmethod
         def from_rule_no(cls, rule_no):
             """Create an StructuralRequirement from a numerical rule id and a sub_message."""
@@ -266,8 +324,38 @@ class Specification:
                                                                 message=req.get('message')))
             return reqs
 
+def _level_name(level):
+    return level.value if isinstance(level, Level) else level
+
 SPECIFICATIONS = {
-    'CSIP': Specification.csip(),
-    'SIP': Specification.sip(),
-    'DIP': Specification.dip()
+    'CSIP': Specification.csip,
+    'SIP': Specification.sip,
+    'DIP': Specification.dip
 }
+
+@functools.lru_cache(maxsize=None)
+def get_profile_schema():
+    """Return the METS profile schema, compiled on first use."""
+    return ET.XMLSchema(file=METS_PROF_SCHEMA)
+
+@functools.lru_cache(maxsize=None)
+def get_specification(name):
+    """Return the Specification called name, one of the SPECIFICATIONS keys, loading
+    it on first use from the resource bundle snapshot, or the profile XML if there
+    isn't a current bundle."""
+    snapshot = _get_snapshot()
+    if snapshot is not None and name in snapshot:
+        return Specification.from_dict(snapshot[name])
+    return SPECIFICATIONS[name]()
+
+@functools.lru_cache(maxsize=None)
+def _get_snapshot():
+    snapshot_path = bundle.get_path(bundle.SPECIFICATIONS)
+    if snapshot_path is None:
+        return None
+    with open(snapshot_path, 'r') as _f:
+        return json.load(_f)
+
+def get_specifications():
+    """Return a dictionary of all of the Specifications by name."""
+    return {name: get_specification(name) for name in SPECIFICATIONS}
@@ -26,6 +26,7 @@
 from enum import Enum, unique
 import os
 
+from swagger_server.forge.packagetree import PackageTree
 from swagger_server.models import (
     Severity,
     TestResult,
@@ -215,10 +216,12 @@ def _test_severity(base, to_test):
     return to_test == Severity.ERROR
 
 class StructTests():
-    def __init__(self, dir_to_scan):
-        self.folders, self.files = _folders_and_files(dir_to_scan)
+    def __init__(self, dir_to_scan, tree=None):
+        tree = tree if tree is not None else PackageTree.from_directory(dir_to_scan)
+        path = tree.relative(dir_to_scan)
+        self.folders, self.files = _folders_and_files(tree, path)
         if DIR_NAMES['META'] in self.folders:
-            self.md_folders, _ = _folders_and_files(os.path.join(dir_to_scan, DIR_NAMES['META']))
+            self.md_folders, _ = _folders_and_files(tree, _subpath(path, DIR_NAMES['META']))
         else:
             self.md_folders = set()
 
@@ -255,14 +258,14 @@ class StructTests():
         return DIR_NAMES['SCHM'] in self.folders
 
 class PackageStructTests():
-    def __init__(self, dir_to_scan):
+    def __init__(self, dir_to_scan, tree=None):
         self.name = os.path.basename(dir_to_scan)
-        self.struct_tests = StructTests(dir_to_scan)
+        tree = tree if tree is not None else PackageTree.from_directory(dir_to_scan)
+        self.struct_tests = StructTests(dir_to_scan, tree)
         self.representations = {}
         _reps = os.path.join(dir_to_scan, DIR_NAMES['REPS'])
-        if os.path.isdir(_reps):
-            for entry in  os.listdir(_reps):
-                self.representations[entry] = StructTests(os.path.join(_reps, entry))
+        for entry in tree.names(tree.relative(_reps)):
+            self.representations[entry] = StructTests(os.path.join(_reps, entry), tree)
 
     def get_test_results(self):
         results = self.get_root_results()
@@ -326,18 +329,16 @@ class PackageStructTests():
         return status
 
 
-def _folders_and_files(dir_to_scan):
-    folders = set()
-    files = set()
-    if os.path.isdir(dir_to_scan):
-        for entry in os.listdir(dir_to_scan):
-            path = os.path.join(dir_to_scan, entry)
-            if os.path.isfile(path):
-                files.add(entry)
-            elif os.path.isdir(path):
-                folders.add(entry)
-    return folders, files
+def _folders_and_files(tree, path):
+    if path is None:
+        return set(), set()
+    return set(tree.folders(path)), set(tree.files(path))
 
-def validate(to_validate):
-    struct_tests = PackageStructTests(to_validate).get_test_results()
+def _subpath(path, name):
+    if path is None:
+        return None
+    return path + '/' + name if path else name
+
+def validate(to_validate, tree=None):
+    struct_tests = PackageStructTests(to_validate, tree).get_test_results()
     return struct_tests.status == StructStatus.WELLFORMED, struct_tests
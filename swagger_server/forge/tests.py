@@ -26,6 +26,7 @@
 Factory methods for validation testing classes.
 """
 from swagger_server.forge import structure
+from swagger_server.forge.packagetree import PackageTree
 
 
 class Structure():
@@ -40,10 +41,23 @@ class Structure():
 
     @classmethod
     def from_archive(cls, to_test):
-        """Returns a structure test result from an information package archive (zip or tar)."""
-        pass
+        """Returns a structure test result from an information package archive (zip or tar).
+        The archive's listing is tested, nothing is extracted."""
+        return cls._from_tree(PackageTree.from_archive(to_test))
 
     @classmethod
-    def from_manifest(cls, to_test):
-        """Returns a structure test result from a maninfest instance."""
-        pass
+    def from_manifest(cls, to_test, root):
+        """Returns a structure test result from a maninfest instance. Only the entry
+        paths are tested, root is the package root folder of the entry paths."""
+        return cls._from_tree(PackageTree.from_manifest(to_test, root))
+
+    @classmethod
+    def from_paths(cls, name, to_test):
+        """Returns a structure test result from an iterable of / separated paths
+        relative to the package root folder, folder paths end with /."""
+        return cls._from_tree(PackageTree.from_paths(name, ((path, path.endswith('/'), None)
+                                                            for path in to_test)))
+
+    @staticmethod
+    def _from_tree(tree):
+        return structure.PackageStructTests(tree.root, tree).get_test_results()
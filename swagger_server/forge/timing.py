@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding=UTF-8
+#
+# E-ARK Validation
+# Copyright (C) 2019
+# All rights reserved.
+#
+# Licensed to the E-ARK project under one
+# or more contributor license agreements. See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership. The E-ARK project licenses
+# this file to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License. You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""
+Optional timing instrumentation for metadata validation.
+"""
+import time
+
+class Timings():
+    """Seconds spent on each step of validating a METS document, with Schematron steps
+    broken down by section and, for the XPath engine, by assertion."""
+    enabled = True
+
+    def __init__(self):
+        self._steps = {}
+        self._sections = {}
+
+    @property
+    def steps(self):
+        """Return a dictionary of document level step names and seconds."""
+        return self._steps
+
+    @property
+    def sections(self):
+        """Return a dictionary of step name and seconds dictionaries by section, the
+        'assertions' entry holds seconds by assertion id."""
+        return self._sections
+
+    def start(self):
+        """Return a start time to pass to stop()."""
+        return time.perf_counter()
+
+    def stop(self, start, step, section=None):
+        """Add the seconds since start to step, for section if given."""
+        elapsed = time.perf_counter() - start
+        steps = self._steps if section is None else self._sections.setdefault(section, {})
+        steps[step] = steps.get(step, 0.0) + elapsed
+
+    def stop_assertion(self, start, section, assertion):
+        """Add the seconds since start to assertion of section."""
+        elapsed = time.perf_counter() - start
+        assertions = self._sections.setdefault(section, {}).setdefault('assertions', {})
+        assertions[assertion] = assertions.get(assertion, 0.0) + elapsed
+
+    def as_dict(self):
+        """Return the timings as plain dictionaries."""
+        return {
+            'steps': dict(self._steps),
+            'sections': {section: {step: dict(secs) if isinstance(secs, dict) else secs
+                                   for step, secs in steps.items()}
+                         for section, steps in self._sections.items()}
+        }
+
+    def __str__(self):
+        return ', '.join('{} {:.3f}s'.format(step, secs) for step, secs in self._steps.items())
+
+class NullTimings(Timings):
+    """Timings that record nothing, used when instrumentation is off."""
+    enabled = False
+
+    def start(self):
+        return None
+
+    def stop(self, start, step, section=None):
+        pass
+
+    def stop_assertion(self, start, section, assertion):
+        pass
+
+NO_TIMINGS = NullTimings()
@@ -0,0 +1,43 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import os
+import tempfile
+import unittest
+
+from lxml import etree
+
+from swagger_server.cli.bundle import build
+from swagger_server.forge import bundle
+from swagger_server.forge.specification import SPECIFICATIONS, Specification
+
+
+class TestBundle(unittest.TestCase):
+    """Unit tests for the precompiled resource bundle."""
+
+    def test_build(self):
+        """A freshly built bundle is current and holds every rule set."""
+        with tempfile.TemporaryDirectory() as dest:
+            build(dest)
+            self.assertTrue(bundle.is_current(dest))
+            self.assertIsNotNone(bundle.get_path('mets_root_rules.xsl', dest))
+            etree.XSLT(etree.parse(bundle.get_path('mets_structmap_rules.xsl', dest)))
+            with open(os.path.join(dest, bundle.MANIFEST), 'w') as _f:
+                json.dump({'fingerprint': 'stale'}, _f)
+            bundle.is_current.cache_clear()
+            self.assertFalse(bundle.is_current(dest))
+            self.assertIsNone(bundle.get_path('mets_root_rules.xsl', dest))
+
+    def test_specification_snapshot(self):
+        """Specifications survive the round trip through the snapshot format."""
+        for factory in SPECIFICATIONS.values():
+            spec = factory()
+            loaded = Specification.from_dict(json.loads(json.dumps(spec.to_dict())))
+            self.assertEqual(loaded.to_dict(), spec.to_dict())
+            self.assertEqual(loaded.requirement_count, spec.requirement_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
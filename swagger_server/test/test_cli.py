@@ -0,0 +1,98 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from swagger_server.cli import app
+from swagger_server.forge.manifests import Checksums
+
+METS = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    OBJID="{name}" TYPE="Text" LABEL="{name}">
+  <mets:metsHdr CREATEDATE="2020-01-01T00:00:00"/>
+  <mets:fileSec ID="file-sec-1">
+    <mets:fileGrp ID="grp-1" USE="{use}">
+      <mets:file ID="file-1" MIMETYPE="text/xml" SIZE="1" CHECKSUM="0"
+          CHECKSUMTYPE="SHA-256">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="{href}"/>
+      </mets:file>
+    </mets:fileGrp>
+  </mets:fileSec>
+</mets:mets>
+"""
+
+FILES = {
+    'METS.xml': METS.format(name='pkg', use='Representations/rep1',
+                            href='representations/rep1/METS.xml'),
+    'metadata/descriptive/dc.xml': 'dc',
+    'metadata/preservation/premis.xml': 'premis',
+    'representations/rep1/METS.xml': METS.format(name='rep1', use='Data', href='data/a.txt'),
+    'representations/rep1/data/a.txt': 'a',
+    'schemas/x.xsd': 'x'
+}
+
+
+class TestCommandLine(unittest.TestCase):
+    """Tests for the ip-check command line application."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'pkg')
+        for path, content in FILES.items():
+            os.makedirs(os.path.dirname(os.path.join(self.root, path)), exist_ok=True)
+            with open(os.path.join(self.root, path), 'w') as _f:
+                _f.write(content)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, *args):
+        """Run ip-check with args, without the external Java validator, and return the
+        exit code and printed output."""
+        output = io.StringIO()
+        # Arguments are added to the module parser each time the command line is parsed
+        with mock.patch.object(app, 'PARSER', argparse.ArgumentParser()), \
+                mock.patch.object(sys, 'argv', ['ip-check'] + list(args)), \
+                mock.patch.object(app.JR, 'java_runner', return_value=(1, None, '')), \
+                contextlib.redirect_stdout(output), \
+                self.assertRaises(SystemExit) as exited:
+            app.main()
+        return exited.exception.code, output.getvalue()
+
+    def test_verbose(self):
+        """Verbose output prints the requirement of each metadata message."""
+        code, output = self._run('--verbose', self.root)
+        self.assertEqual(code, 0)
+        self.assertIn('[MUST]', output)
+
+    def test_verbose_archive(self):
+        """Verbose output works for an archived package that's unpacked to validate."""
+        archive = shutil.make_archive(os.path.join(self.tmp.name, 'ip'), 'zip',
+                                      root_dir=self.tmp.name, base_dir='pkg')
+        unpack_root = os.path.join(tempfile.gettempdir(), Checksums.from_file(archive).value)
+        try:
+            code, output = self._run('--verbose', archive)
+        finally:
+            shutil.rmtree(unpack_root, ignore_errors=True)
+        self.assertEqual(code, 0)
+        self.assertIn('[MUST]', output)
+
+    def test_timings(self):
+        """Timings are printed for the package and each METS document."""
+        code, output = self._run('--timings', self.root)
+        self.assertEqual(code, 0)
+        self.assertIn('{}: '.format(self.root), output)
+        self.assertIn('{}: '.format(os.path.join(self.root, 'METS.xml')), output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from swagger_server.forge import metadata
+from swagger_server.forge.fileindex import FileIndex
+from swagger_server.forge.metadata import MetsValidator, mets_digest
+from swagger_server.models import MetadataStatus
+
+METS = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    OBJID="ip-1">
+  <mets:dmdSec ID="dmd-1">
+    <mets:mdRef LOCTYPE="URL" MDTYPE="EAD" xlink:type="simple"
+        xlink:href="metadata/descriptive/ead.xml" SIZE="5" CHECKSUMTYPE="MD5"
+        CHECKSUM="5d41402abc4b2a76b9719d911017c592"/>
+  </mets:dmdSec>
+  <mets:fileSec ID="files">
+    <mets:fileGrp ID="grp-doc" USE="Documentation">
+      <mets:file ID="file-1" MIMETYPE="text/plain" SIZE="5">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="documentation/a.txt"/>
+      </mets:file>
+      <mets:file ID="file-2" MIMETYPE="text/plain" SIZE="7">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="documentation/b.txt"/>
+      </mets:file>
+    </mets:fileGrp>
+    <mets:fileGrp ID="grp-rep" USE="Representations/rep1">
+      <mets:file ID="file-3" MIMETYPE="text/xml" SIZE="9">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple"
+            xlink:href="representations/rep1/METS.xml"/>
+      </mets:file>
+    </mets:fileGrp>
+  </mets:fileSec>
+</mets:mets>
+"""
+
+
+class TestFileIndex(unittest.TestCase):
+    """Unit tests for the METS file index."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mets_path = os.path.join(self.tmp.name, 'METS.xml')
+        with open(self.mets_path, 'w') as _f:
+            _f.write(METS)
+        self.index = FileIndex(os.path.join(self.tmp.name, 'index.db'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_build(self):
+        """The index holds the same FileRefs as a parsed validation."""
+        digest = self.index.build(self.mets_path)
+        validator = MetsValidator(self.tmp.name)
+        validator.validate_mets(self.mets_path)
+        self.assertEqual([_as_tuple(ref) for ref in self.index.file_refs(digest)],
+                         [_as_tuple(ref) for ref in validator.file_refs])
+        self.assertEqual([(rep, _as_tuple(ref)) for rep, ref in self.index.subsequent_mets(digest)],
+                         [(rep, _as_tuple(ref)) for rep, ref in validator.subsequent_mets])
+        file_ref = self.index.lookup(digest, 'documentation/b.txt')
+        self.assertEqual((file_ref.group, file_ref.size), ('Documentation', '7'))
+        self.assertEqual(self.index.lookup(digest, 'metadata/descriptive/ead.xml').checksum.value,
+                         '5d41402abc4b2a76b9719d911017c592')
+        self.assertIsNone(self.index.lookup(digest, 'documentation/c.txt'))
+
+    def test_nested_files(self):
+        """Files nested in another file are indexed along with it."""
+        with open(self.mets_path, 'w') as _f:
+            _f.write(METS.replace('documentation/a.txt"/>', 'documentation/a.txt"/>' + """
+        <mets:file ID="file-4" MIMETYPE="text/plain" SIZE="3">
+          <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="documentation/c.txt"/>
+        </mets:file>"""))
+        digest = self.index.build(self.mets_path)
+        validator = MetsValidator(self.tmp.name)
+        validator.validate_mets(self.mets_path)
+        self.assertEqual([_as_tuple(ref) for ref in self.index.file_refs(digest)],
+                         [_as_tuple(ref) for ref in validator.file_refs])
+        self.assertIsNotNone(self.index.lookup(digest, 'documentation/a.txt'))
+
+    def test_invalidated(self):
+        """Changing the METS document replaces its index entries."""
+        digest = self.index.ensure(self.mets_path)
+        self.assertEqual(self.index.ensure(self.mets_path), digest)
+        with open(self.mets_path, 'w') as _f:
+            _f.write(METS.replace('documentation/b.txt', 'documentation/c.txt'))
+        self.assertFalse(self.index.has(mets_digest(self.mets_path)))
+        changed = self.index.ensure(self.mets_path)
+        self.assertNotEqual(changed, digest)
+        self.assertFalse(self.index.has(digest))
+        self.assertEqual(len(self.index), 1)
+        self.assertIsNotNone(self.index.lookup(changed, 'documentation/c.txt'))
+
+    def test_check_fixity(self):
+        """Fixity checks read the indexed FileRefs."""
+        result = self.index.check_fixity(self.mets_path)
+        self.assertEqual(result.status, MetadataStatus.NOTVALID)
+        self.assertEqual(len(result.messages), 4)
+
+    def test_index_only(self):
+        """Without a cache an indexed document isn't indexed again and its FileRefs
+        are read from the index rather than the parsed METS."""
+        first = metadata._check_mets(self.mets_path, checksums=True, index=self.index)
+        with mock.patch.object(FileIndex, 'add') as add, \
+                mock.patch.object(MetsValidator, '_file_refs_from_ele') as from_ele:
+            second = metadata._check_mets(self.mets_path, checksums=True, index=self.index)
+        add.assert_not_called()
+        from_ele.assert_not_called()
+        self.assertEqual([(rep, _as_tuple(ref)) for rep, ref in second[2]],
+                         [(rep, _as_tuple(ref)) for rep, ref in first[2]])
+        self.assertEqual([(msg.rule_id, msg.location) for msg in second[3].messages],
+                         [(msg.rule_id, msg.location) for msg in first[3].messages])
+
+    def test_pickle(self):
+        """An unpickled index opens its own connection to the same database."""
+        digest = self.index.ensure(self.mets_path)
+        copy = pickle.loads(pickle.dumps(self.index))
+        self.assertIsNone(copy._conn)
+        self.assertTrue(copy.has(digest))
+
+
+def _as_tuple(file_ref):
+    checksum = file_ref.checksum
+    return (file_ref.path, file_ref.size, checksum.value if checksum else None,
+            file_ref.group, file_ref.line)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from swagger_server.forge import fixity
+from swagger_server.forge.metadata import FileRef
+from swagger_server.models import Checksum, ChecksumAlg, MetadataStatus
+
+CONTENT = b'E-ARK fixity test content'
+
+
+def _sha256(data):
+    return Checksum(ChecksumAlg.SHA256, hashlib.sha256(data).hexdigest().upper())
+
+
+class TestFixity(unittest.TestCase):
+    """Unit tests for checking METS file references against package content."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'data dir'))
+        with open(os.path.join(self.root, 'data dir', 'a.txt'), 'wb') as _f:
+            _f.write(CONTENT)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _check(self, *file_refs):
+        return fixity.check_file_refs(self.root, file_refs, workers=2)
+
+    def test_match(self):
+        """Files with matching sizes and checksums pass, hrefs are URL decoded."""
+        checks = self._check(FileRef('data%20dir/a.txt', str(len(CONTENT)), _sha256(CONTENT)),
+                             FileRef('file://./data dir/a.txt', None, None))
+        self.assertEqual(checks.status, MetadataStatus.VALID)
+        self.assertEqual(checks.messages, [])
+
+    def test_failures(self):
+        """Missing files, size and checksum mismatches are reported in order."""
+        checks = self._check(FileRef('data dir/b.txt', '1', None),
+                             FileRef('data dir/a.txt', '1', _sha256(CONTENT)),
+                             FileRef('data dir/a.txt', str(len(CONTENT)), _sha256(b'other')))
+        self.assertEqual(checks.status, MetadataStatus.NOTVALID)
+        self.assertEqual([message.rule_id for message in checks.messages],
+                         [fixity.FILE_MISSING, fixity.SIZE_MISMATCH, fixity.CHECKSUM_MISMATCH])
+
+    def test_fail_fast(self):
+        """Fail fast checking stops at the first failure."""
+        checks = fixity.check_file_refs(self.root, [
+            FileRef('data dir/a.txt', str(len(CONTENT)), _sha256(b'other')),
+            FileRef('data dir/b.txt', '1', None)], fail_fast=True)
+        self.assertEqual(checks.status, MetadataStatus.NOTVALID)
+        self.assertEqual(len(checks.messages), 1)
+
+    def test_remote_refs_skipped(self):
+        """References to remote resources aren't checked."""
+        checks = self._check(FileRef('https://example.org/a.txt', '1', None))
+        self.assertEqual(checks.messages, [])
+
+    def test_outside_refs(self):
+        """References outside the package are reported and never read."""
+        outside = os.path.join(os.path.dirname(self.root), 'outside.txt')
+        hrefs = ['/etc/passwd', '../outside.txt', 'data dir/../../outside.txt',
+                 'file:///etc/passwd', 'file://' + outside]
+        with mock.patch('os.stat', wraps=os.stat) as stat:
+            checks = self._check(*(FileRef(href, '1', _sha256(b'other')) for href in hrefs))
+        self.assertEqual(stat.call_count, 0)
+        self.assertEqual(checks.status, MetadataStatus.NOTVALID)
+        self.assertEqual([(message.rule_id, message.location) for message in checks.messages],
+                         [(fixity.BAD_REFERENCE, href) for href in hrefs])
+
+    def test_package_boundary(self):
+        """References from a subfolder may leave it but not the package."""
+        rep_root = os.path.join(self.root, 'representations', 'rep1')
+        file_refs = [FileRef('../../data dir/a.txt', str(len(CONTENT)), _sha256(CONTENT)),
+                     FileRef('../../../outside.txt', '1', None)]
+        checks = fixity.check_file_refs(rep_root, file_refs, package=self.root)
+        self.assertEqual([(message.rule_id, message.location) for message in checks.messages],
+                         [(fixity.BAD_REFERENCE, '../../../outside.txt')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import tempfile
+import unittest
+
+from lxml import etree
+
+from swagger_server.forge import idrefs
+from swagger_server.forge.metadata import MetsValidator
+from swagger_server.models import Severity
+
+METS = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    OBJID="ip-1">
+  <mets:dmdSec ID="dmd-1"/>
+  <mets:amdSec ID="amd-1">
+    <mets:digiprovMD ID="digiprov-1"/>
+  </mets:amdSec>
+  <mets:fileSec ID="files">
+    <mets:fileGrp ID="grp-docs" USE="Documentation" ADMID="digiprov-1">
+      <mets:file ID="file-1" DMDID="dmd-1">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="documentation/a.txt"/>
+      </mets:file>
+    </mets:fileGrp>
+    <mets:fileGrp ID="grp-rep" USE="Representations/rep1">
+      <mets:file ID="file-2">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple"
+            xlink:href="representations/rep1/METS.xml"/>
+      </mets:file>
+    </mets:fileGrp>
+  </mets:fileSec>
+  <mets:structMap ID="struct-1" LABEL="CSIP">
+    <mets:div ID="div-1">
+      <mets:div ID="div-2" ADMID="amd-1 digiprov-1" DMDID="dmd-1"/>
+      <mets:div ID="div-3">
+        <mets:fptr FILEID="grp-docs"/>
+      </mets:div>
+      <mets:div ID="div-4">
+        <mets:mptr LOCTYPE="URL" xlink:type="simple" xlink:title="grp-rep"
+            xlink:href="representations/rep1/METS.xml"/>
+      </mets:div>
+    </mets:div>
+  </mets:structMap>
+</mets:mets>
+"""
+BROKEN = METS.replace('ID="file-2"', 'ID="file-1"') \
+    .replace('DMDID="dmd-1"/>', 'DMDID="dmd-1 dmd-2"/>') \
+    .replace('FILEID="grp-docs"', 'FILEID="div-1"') \
+    .replace('xlink:title="grp-rep"', 'xlink:title="grp-rep2"')
+
+
+class TestIdRefs(unittest.TestCase):
+    """Unit tests for the METS ID and IDREF cross-reference check."""
+
+    def test_valid(self):
+        """Resolved references, including forward references, give no results."""
+        self.assertEqual(idrefs.check_tree('METS.xml', _tree(METS)), [])
+
+    def test_broken(self):
+        """Duplicate IDs, dangling and mistargeted references are reported in order."""
+        results = idrefs.check_tree('METS.xml', _tree(BROKEN))
+        self.assertEqual([(result.rule_id, result.severity) for result in results], [
+            (idrefs.DUPLICATE_ID, Severity.ERROR),
+            (idrefs.DANGLING_IDREF, Severity.ERROR),
+            (idrefs.IDREF_TARGET, Severity.WARN),
+            (idrefs.DANGLING_IDREF, Severity.ERROR)
+        ])
+        self.assertIn('xlink:title', results[-1].message)
+
+    def test_validator(self):
+        """Parsed and streaming validation report the same results, warnings about
+        mistargeted references don't make a document invalid."""
+        with tempfile.TemporaryDirectory() as tmp:
+            mets_path = os.path.join(tmp, 'METS.xml')
+            with open(mets_path, 'w') as _f:
+                _f.write(METS.replace('FILEID="grp-docs"', 'FILEID="div-1"'))
+            for streaming in (False, True):
+                validator = MetsValidator(tmp, streaming=streaming, references=True)
+                is_valid, checks = validator.validate_mets(mets_path)
+                self.assertTrue(is_valid)
+                self.assertEqual([result.rule_id for result in checks.messages],
+                                 [idrefs.IDREF_TARGET])
+                self.assertEqual(len(validator.file_refs), 1)
+
+
+def _tree(xml):
+    return etree.ElementTree(etree.fromstring(xml.encode('UTF-8')))
+
+
+if __name__ == '__main__':
+    unittest.main()
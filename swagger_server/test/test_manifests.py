@@ -0,0 +1,63 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from swagger_server.forge import manifests
+from swagger_server.forge.manifests import Checksums
+from swagger_server.forge.packages import ArchivePackageHandler
+from swagger_server.models import ChecksumAlg
+
+ALGORITHMS = [ChecksumAlg.MD5, ChecksumAlg.SHA1, ChecksumAlg.SHA256, ChecksumAlg.SHA512]
+
+
+class TestChecksums(unittest.TestCase):
+    """Unit tests for single read multi algorithm checksums."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'data.bin')
+        with open(self.path, 'wb') as _f:
+            _f.write(os.urandom(300000))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_all_from_file(self):
+        """Checksums from one read match those of a read per algorithm."""
+        expected = [Checksums.from_file(self.path, algorithm) for algorithm in ALGORITHMS]
+        for parallel in (False, True):
+            with mock.patch('builtins.open', wraps=open) as opened:
+                checksums = Checksums.all_from_file(self.path, ALGORITHMS, parallel=parallel)
+            self.assertEqual(opened.call_count, 1)
+            self.assertEqual(checksums, expected)
+
+    def test_entry_from_file(self):
+        """Manifest entries of large files are hashed in parallel with the same result."""
+        entry = manifests.entry_from_file(self.path, ALGORITHMS)
+        with mock.patch.object(manifests, 'PARALLEL_SIZE', 1):
+            self.assertEqual(manifests.entry_from_file(self.path, ALGORITHMS), entry)
+        self.assertEqual(entry.size, 300000)
+        self.assertEqual(entry.checksums[2], Checksums.from_file(self.path, ChecksumAlg.SHA256))
+
+    def test_unpack_package(self):
+        """Unpacking an archive names the destination by SHA1 and keeps the other
+        checksums read with it."""
+        archive = shutil.make_archive(os.path.join(self.root, 'ip'), 'zip', root_dir=self.root,
+                                      base_dir='data.bin')
+        handler = ArchivePackageHandler(self.root)
+        destination = handler.unpack_package(archive, checksum_algs=[ChecksumAlg.SHA256])
+        sha1, sha256 = handler.checksums
+        self.assertEqual(sha1, Checksums.from_file(archive, ChecksumAlg.SHA1))
+        self.assertEqual(sha256, Checksums.from_file(archive, ChecksumAlg.SHA256))
+        self.assertEqual(destination, os.path.join(self.root, sha1.value))
+        self.assertTrue(os.path.isfile(os.path.join(destination, 'data.bin')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,498 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from swagger_server.forge import fixity, metadata, packages
+
+ROOT_METS = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    OBJID="pkg" TYPE="Text" LABEL="pkg">
+  <mets:metsHdr CREATEDATE="2020-01-01T00:00:00"/>
+  <mets:fileSec ID="file-sec-1">{}
+  </mets:fileSec>
+</mets:mets>
+"""
+
+REP_GRP = """
+    <mets:fileGrp ID="grp-{name}" USE="Representations/{name}">
+      <mets:file ID="file-{name}" MIMETYPE="text/xml" SIZE="1" CHECKSUM="0"
+          CHECKSUMTYPE="SHA-256">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="{href}"/>
+      </mets:file>
+    </mets:fileGrp>"""
+
+REP_METS = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    OBJID="{name}"{attributes}>
+  <mets:fileSec ID="file-sec-{name}">
+    <mets:fileGrp ID="grp-data" USE="Data">
+      <mets:file ID="file-1" MIMETYPE="text/plain" SIZE="1">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="data/a.txt"/>
+      </mets:file>
+    </mets:fileGrp>
+  </mets:fileSec>
+</mets:mets>
+"""
+
+# Accepts any METS document, so only the well formedness of a document is checked
+ANY_METS_SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="http://www.loc.gov/METS/">
+  <xs:element name="mets">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:any processContents="skip" minOccurs="0" maxOccurs="unbounded"/>
+      </xs:sequence>
+      <xs:anyAttribute processContents="skip"/>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+
+# Requires an OBJID and a fileSec ID and only allows integer TYPEs
+STRICT_METS_SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="http://www.loc.gov/METS/"
+    elementFormDefault="qualified">
+  <xs:element name="mets">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="fileSec" minOccurs="0">
+          <xs:complexType>
+            <xs:sequence>
+              <xs:any processContents="skip" minOccurs="0" maxOccurs="unbounded"/>
+            </xs:sequence>
+            <xs:attribute name="ID" type="xs:ID" use="required"/>
+          </xs:complexType>
+        </xs:element>
+      </xs:sequence>
+      <xs:attribute name="OBJID" type="xs:string" use="required"/>
+      <xs:attribute name="TYPE" type="xs:integer"/>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+
+# Breaks each rule of STRICT_METS_SCHEMA
+INVALID_METS = """<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    TYPE="Text">
+  <mets:fileSec>
+    <mets:fileGrp ID="grp-data" USE="Data">
+      <mets:file ID="file-1" MIMETYPE="text/plain" SIZE="1">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="data/a.txt"/>
+      </mets:file>
+    </mets:fileGrp>
+  </mets:fileSec>
+</mets:mets>
+"""
+
+NESTED_FILE = """
+        <mets:file ID="file-2" MIMETYPE="text/plain" SIZE="2">
+          <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="data/b.txt"/>
+        </mets:file>"""
+
+SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:element name="root" type="xs:string"/>
+</xs:schema>
+"""
+
+
+def _write_package(root, reps, hrefs=None):
+    """Write a package with a METS document for each of reps, each with different
+    Schematron errors, and a root METS listing them at hrefs by rep name, returns
+    the path of the root METS."""
+    hrefs = hrefs or {}
+    for index, name in enumerate(reps):
+        rep_path = os.path.join(root, 'representations', name, 'METS.xml')
+        os.makedirs(os.path.dirname(rep_path))
+        attributes = ''.join(' {}="{}"'.format(attribute, name) for attribute in
+                             ('TYPE', 'LABEL', 'PROFILE')[:index % 4])
+        with open(rep_path, 'w') as _f:
+            _f.write(REP_METS.format(name=name, attributes=attributes))
+    mets_path = os.path.join(root, 'METS.xml')
+    with open(mets_path, 'w') as _f:
+        _f.write(ROOT_METS.format(''.join(REP_GRP.format(
+            name=name, href=hrefs.get(name, 'representations/{}/METS.xml'.format(name)))
+                                          for name in reps)))
+    return mets_path
+
+
+def _strict_schema():
+    return metadata.etree.XMLSchema(metadata.etree.XML(STRICT_METS_SCHEMA.encode()))
+
+
+def _messages(checks):
+    return [(message.rule_id, message.location, message.severity)
+            for message in checks.messages]
+
+
+def _file_ref(file_ref):
+    checksum = file_ref.checksum
+    return (file_ref.path, file_ref.size, checksum.value if checksum else None,
+            file_ref.group, file_ref.line)
+
+
+class TestRulesRegistry(unittest.TestCase):
+    """Unit tests for the process wide compiled Schematron registry."""
+
+    def test_compiled_once(self):
+        """Rules are compiled on first use and shared by later lookups."""
+        registry = metadata.RulesRegistry()
+        rules_path = metadata._rules_path('hdr')
+        with mock.patch.object(metadata.CompiledRules, 'from_bundle', return_value=None), \
+                mock.patch.object(metadata.CompiledRules, 'from_file',
+                                  wraps=metadata.CompiledRules.from_file) as from_file:
+            compiled = registry.get(rules_path)
+            self.assertIs(registry.get(rules_path), compiled)
+        self.assertEqual(from_file.call_count, 1)
+        self.assertEqual(len(registry), 1)
+        registry.clear()
+        self.assertEqual(len(registry), 0)
+
+    def test_profiles_share_rules(self):
+        """Every profile validates with the same compiled rules."""
+        first = metadata.ValidationProfile()
+        second = metadata.ValidationProfile()
+        for section in metadata.ValidationProfile.SECTIONS:
+            self.assertIs(first.rulesets[section].ruleset, second.rulesets[section].ruleset)
+
+    @unittest.skipUnless(hasattr(os, 'register_at_fork'), 'needs os.register_at_fork')
+    def test_fork_resets_lock(self):
+        """A child forked while the registry lock is held can still compile rules."""
+        with metadata.RULES_REGISTRY._lock:
+            pid = os.fork()
+            if pid == 0:
+                # pylint: disable-msg=W0212
+                os._exit(0 if metadata.RULES_REGISTRY._lock.acquire(timeout=5) else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+
+class TestSchemaCache(unittest.TestCase):
+    """Unit tests for the compiled schema cache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.schema_path = os.path.join(self.tmp.name, 'schema.xsd')
+        with open(self.schema_path, 'w') as _f:
+            _f.write(SCHEMA)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compiled_once(self):
+        """A schema is compiled once per thread and the instance is reused."""
+        with mock.patch.object(metadata.etree, 'XMLSchema',
+                               wraps=metadata.etree.XMLSchema) as compile_schema:
+            schema = metadata.get_schema(self.schema_path)
+            self.assertIs(metadata.get_schema(self.schema_path), schema)
+        self.assertEqual(compile_schema.call_count, 1)
+        others = []
+        thread = threading.Thread(
+            target=lambda: others.append(metadata.get_schema(self.schema_path)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(others[0], schema)
+
+    def test_resources_changed(self):
+        """A schema is compiled again when the validation resources change."""
+        schema = metadata.get_schema(self.schema_path)
+        with mock.patch.object(metadata, 'resources_fingerprint', return_value='changed'):
+            changed = metadata.get_schema(self.schema_path)
+            self.assertIsNot(changed, schema)
+            self.assertIs(metadata.get_schema(self.schema_path), changed)
+
+    def test_validators_share_schema(self):
+        """METS validators of the same thread share the compiled METS schema."""
+        first = metadata.MetsValidator(self.tmp.name)
+        self.assertIs(metadata.MetsValidator(self.tmp.name).schema_wrapper,
+                      first.schema_wrapper)
+
+
+class TestParseOnce(unittest.TestCase):
+    """Unit tests for validating each METS document from a single parse."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mets_path = _write_package(self.tmp.name, ['rep1'])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_check_mets(self):
+        """The schema and every Schematron section are checked from one parse."""
+        expected = metadata._check_mets(self.mets_path)
+        with mock.patch.object(metadata.etree, 'parse', wraps=metadata.etree.parse) as parse:
+            checked = metadata._check_mets(self.mets_path)
+        parse.assert_called_once_with(self.mets_path)
+        self.assertEqual(_messages(checked[0][1]), _messages(expected[0][1]))
+        self.assertEqual(_messages(checked[1][1]), _messages(expected[1][1]))
+
+    def test_profile(self):
+        """A profile passed a path parses it once for all its sections."""
+        profile = metadata.ValidationProfile()
+        expected = profile.validate(metadata.etree.parse(self.mets_path))
+        with mock.patch.object(metadata.etree, 'parse', wraps=metadata.etree.parse) as parse:
+            is_valid, checks = profile.validate(self.mets_path)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual((is_valid, _messages(checks)), (expected[0], _messages(expected[1])))
+        self.assertTrue(_messages(checks))
+
+    def test_first_schema_error(self):
+        """Only the first schema error of a parsed document is reported."""
+        with open(self.mets_path, 'w') as _f:
+            _f.write(INVALID_METS)
+        with mock.patch.object(metadata, 'get_schema', return_value=_strict_schema()):
+            validator = metadata.MetsValidator(self.tmp.name)
+            is_valid, checks = validator.validate_mets(self.mets_path)
+        self.assertFalse(is_valid)
+        self.assertEqual([message.message for message in checks.messages],
+                         ["Element 'mets:mets', attribute 'TYPE': 'Text' is not a valid value "
+                          "of the atomic type 'xs:integer'."])
+
+
+class TestMergedRules(unittest.TestCase):
+    """Unit tests for validating all sections with a single merged transform."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mets_path = _write_package(self.tmp.name, ['rep1', 'rep2', 'rep3', 'rep4'])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_results(self):
+        """Merged rules report the same results for each section as separate rules."""
+        paths = [self.mets_path] + [os.path.join(self.tmp.name, 'representations', name,
+                                                 'METS.xml')
+                                    for name in ('rep1', 'rep2', 'rep3', 'rep4')]
+        for engine in metadata.ValidationProfile.ENGINES:
+            separate = metadata.ValidationProfile(engine=engine)
+            merged = metadata.ValidationProfile(merged=True, engine=engine)
+            for path in paths:
+                self.assertEqual(separate.validate(path)[0], merged.validate(path)[0])
+                self.assertEqual(
+                    {name: _messages(checks) for name, checks in separate.get_results().items()},
+                    {name: _messages(checks) for name, checks in merged.get_results().items()})
+
+    def test_package(self):
+        """Packages validated with merged rules get the same results."""
+        is_valid, results = metadata.validate_ip(self.tmp.name)
+        merged_valid, merged = metadata.validate_ip(self.tmp.name, merged=True)
+        self.assertEqual(merged_valid, is_valid)
+        self.assertEqual(merged.to_dict(), results.to_dict())
+
+    def test_package_validate(self):
+        """Package validation passes merged on to the metadata checks."""
+        with mock.patch.object(packages.structure, 'validate', return_value=(True, None)), \
+                mock.patch.object(metadata, 'validate_ip',
+                                  wraps=metadata.validate_ip) as validate_ip:
+            _, report = packages.validate(self.tmp.name, merged=True)
+        self.assertTrue(validate_ip.call_args[1]['merged'])
+        self.assertEqual(report.metadata.to_dict(),
+                         metadata.validate_ip(self.tmp.name)[1].to_dict())
+
+
+class TestStreaming(unittest.TestCase):
+    """Unit tests for streaming METS schema validation."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mets_path = _write_package(self.tmp.name, ['rep1', 'rep2'])
+        self.paths = [self.mets_path, os.path.join(self.tmp.name, 'representations', 'rep1',
+                                                   'METS.xml')]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _validated(self, mets_path, **options):
+        validator = metadata.MetsValidator(self.tmp.name, **options)
+        is_valid, checks = validator.validate_mets(mets_path)
+        return (is_valid, _messages(checks),
+                [_file_ref(file_ref) for file_ref in validator.file_refs],
+                [(rep, _file_ref(file_ref)) for rep, file_ref in validator.subsequent_mets])
+
+    def test_same_results(self):
+        """Streaming validation gives the same results and FileRefs as parsing."""
+        for path in self.paths:
+            for references in (False, True):
+                expected = self._validated(path, references=references)
+                self.assertEqual(self._validated(path, streaming=True, references=references),
+                                 expected)
+        self.assertEqual(len(expected[2]), 1)
+        self.assertEqual([rep for rep, _ in self._validated(self.mets_path)[3]],
+                         ['rep1', 'rep2'])
+
+    def test_nested_files(self):
+        """Nested files don't free the FLocat of the file that holds them."""
+        rep_path = self.paths[1]
+        with open(rep_path) as _f:
+            nested = _f.read().replace('data/a.txt"/>', 'data/a.txt"/>' + NESTED_FILE)
+        with open(rep_path, 'w') as _f:
+            _f.write(nested)
+        expected = self._validated(rep_path)
+        self.assertEqual([file_ref[0] for file_ref in expected[2]], ['data/a.txt', 'data/b.txt'])
+        self.assertEqual(self._validated(rep_path, streaming=True), expected)
+
+    def test_schema_errors(self):
+        """Streaming reports the same schema errors as parsing."""
+        with open(self.paths[1], 'w') as _f:
+            # The ID reference isn't checked once the schema check fails
+            _f.write(INVALID_METS.replace('USE="Data"', 'USE="Data" ADMID="amd-missing"'))
+        with mock.patch.object(metadata, 'get_schema', return_value=_strict_schema()):
+            for references in (False, True):
+                expected = self._validated(self.paths[1], references=references)
+                self.assertFalse(expected[0])
+                self.assertEqual(len(expected[1]), 1)
+                self.assertEqual(self._validated(self.paths[1], streaming=True,
+                                                 references=references)[:2], expected[:2])
+
+    def test_not_well_formed(self):
+        """Syntax errors are reported like those of a parsed document."""
+        with open(self.mets_path, 'a') as _f:
+            _f.write('<mets:mets>')
+        expected = self._validated(self.mets_path)
+        self.assertFalse(expected[0])
+        self.assertEqual(self._validated(self.mets_path, streaming=True)[:2], expected[:2])
+
+    def test_no_tree(self):
+        """Streaming keeps no parsed document and passes each FileRef on as it's found."""
+        found = []
+        validator = metadata.MetsValidator(self.tmp.name, streaming=True,
+                                           on_file_ref=found.append)
+        validator.validate_mets(self.paths[1])
+        self.assertIsNone(validator.parsed_mets)
+        self.assertEqual(validator.file_refs, [])
+        self.assertEqual([file_ref.path for file_ref in found], ['data/a.txt'])
+
+
+class TestWorkers(unittest.TestCase):
+    """Unit tests for validating representation METS in worker processes."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.reps = ['rep{}'.format(index) for index in range(8, 0, -1)]
+        _write_package(self.tmp.name, self.reps)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_as_serial(self):
+        """Results from a worker pool match serial validation, in listing order."""
+        for checksums in (False, True):
+            serial = metadata.validate_ip(self.tmp.name, checksums=checksums)
+            pooled = metadata.validate_ip(self.tmp.name, workers=4, checksums=checksums)
+            self.assertEqual(pooled[0], serial[0])
+            self.assertEqual(pooled[1].to_dict(), serial[1].to_dict())
+            self.assertEqual(list(pooled[1].schematron_results), ['root'] + self.reps)
+
+
+class TestValidationPlan(unittest.TestCase):
+    """Unit tests for the per-package validation plan."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # rep3 is listed again under another name and via an unnormalised path
+        self.mets_path = _write_package(self.tmp.name, ['rep1', 'rep2', 'rep3', 'rep4'], {
+            'rep2': 'representations/rep1/METS.xml',
+            'rep4': 'representations/./rep3/METS.xml'})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_each_document_once(self):
+        """Each METS document is validated once however many names list it."""
+        plan = metadata.ValidationPlan(self.tmp.name)
+        with mock.patch.object(metadata, '_check_mets',
+                               wraps=metadata._check_mets) as check_mets:
+            _, results = plan.run()
+        self.assertEqual(sorted(call[0][0] for call in check_mets.call_args_list), sorted([
+            os.path.normpath(self.mets_path),
+            os.path.join(self.tmp.name, 'representations', 'rep1', 'METS.xml'),
+            os.path.join(self.tmp.name, 'representations', 'rep3', 'METS.xml')]))
+        self.assertEqual(len(plan.timings), 3)
+        self.assertEqual(plan.pending, [])
+        schematron = results.schematron_results
+        self.assertEqual(list(schematron), ['root', 'rep1', 'rep2', 'rep3', 'rep4'])
+        self.assertIs(schematron['rep2'], schematron['rep1'])
+        self.assertIs(schematron['rep4'], schematron['rep3'])
+        self.assertNotEqual(_messages(schematron['rep1'][1]), _messages(schematron['rep3'][1]))
+
+    def test_schedule(self):
+        """Scheduling a validated document again doesn't add work."""
+        plan = metadata.ValidationPlan(self.tmp.name)
+        plan.run()
+        rep_path = os.path.join(self.tmp.name, 'representations', 'rep1', 'METS.xml')
+        self.assertFalse(plan.schedule('again', os.path.join(self.tmp.name, 'representations',
+                                                             '.', 'rep1', 'METS.xml')))
+        self.assertEqual(plan.documents['again'], rep_path)
+
+
+class TestVerdict(unittest.TestCase):
+    """Unit tests for the package validity reported by full and fail fast validation."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        _write_package(self.tmp.name, ['rep1', 'rep2'])
+        with open(os.path.join(self.tmp.name, 'representations', 'rep2', 'METS.xml'),
+                  'a') as _f:
+            _f.write('<mets:mets>')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_invalid_representation(self):
+        """A valid root METS with an invalid representation METS isn't valid in
+        either mode, and both report the representation's schema errors."""
+        schema = metadata.etree.XMLSchema(metadata.etree.XML(ANY_METS_SCHEMA.encode()))
+        # No Schematron rule is selected, only the schema checks decide validity
+        selection = metadata.RuleSelection(rules=['NONE'])
+        with mock.patch.object(metadata, 'get_schema', return_value=schema):
+            verdicts = [metadata.validate_ip(self.tmp.name, selection=selection,
+                                             fail_fast=fail_fast)
+                        for fail_fast in (False, True)]
+        rep_path = os.path.join(self.tmp.name, 'representations', 'rep2', 'METS.xml')
+        for is_valid, results in verdicts:
+            self.assertFalse(is_valid)
+            self.assertTrue(results.schematron_results['root'][0])
+            self.assertEqual({message.location for message in results.schema_results.messages},
+                             {rep_path})
+
+
+class TestFixity(unittest.TestCase):
+    """Unit tests for the fixity checks of package validation."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        _write_package(self.tmp.name, ['rep1'])
+        rep_path = os.path.join(self.tmp.name, 'representations', 'rep1', 'METS.xml')
+        with open(rep_path) as _f:
+            rep_mets = _f.read()
+        with open(rep_path, 'w') as _f:
+            _f.write(rep_mets.replace('data/a.txt', '../../schemas/x.xsd'))
+        os.makedirs(os.path.join(self.tmp.name, 'schemas'))
+        with open(os.path.join(self.tmp.name, 'schemas', 'x.xsd'), 'w') as _f:
+            _f.write('x')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_package_references(self):
+        """Representation METS may reference files elsewhere in the package."""
+        _, results = metadata.validate_ip(self.tmp.name, checksums=True)
+        rep_path = os.path.join(self.tmp.name, 'representations', 'rep1', 'METS.xml')
+        # Only the size declared for the representation METS by the root METS is wrong
+        self.assertEqual([(message.rule_id, message.location)
+                          for message in results.schema_results.messages
+                          if message.rule_id.startswith('FIXITY')],
+                         [(fixity.SIZE_MISMATCH, rep_path)])
+
+
+if __name__ == '__main__':
+    unittest.main()
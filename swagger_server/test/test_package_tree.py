@@ -0,0 +1,190 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+from unittest import mock
+
+from swagger_server.forge import MODEL, fixity, manifests, packages, structure
+from swagger_server.forge.manifests import Checksums
+from swagger_server.forge.metadata import FileRef
+from swagger_server.forge.packagetree import PackageTree
+from swagger_server.forge.tests import Structure
+
+FILES = [
+    'METS.xml',
+    'metadata/descriptive/ead.xml',
+    'metadata/preservation/premis.xml',
+    'representations/rep1/METS.xml',
+    'representations/rep1/data/a.txt',
+    'representations/rep2/data/b/c.txt',
+    'representations/notes.txt'
+]
+
+
+class TestPackageTree(unittest.TestCase):
+    """Unit tests for the package tree snapshot."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path in FILES:
+            os.makedirs(os.path.dirname(os.path.join(self.root, path)), exist_ok=True)
+            with open(os.path.join(self.root, path), 'w') as _f:
+                _f.write(path)
+        os.makedirs(os.path.join(self.root, 'schemas'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_snapshot(self):
+        """Folders, files and stat results agree with the file system."""
+        tree = PackageTree.from_directory(self.root)
+        self.assertEqual(tree.folders(), {'metadata', 'representations', 'schemas'})
+        self.assertEqual(tree.files(), {'METS.xml'})
+        self.assertEqual(tree.names('representations'),
+                         os.listdir(os.path.join(self.root, 'representations')))
+        self.assertTrue(tree.is_dir('representations/rep2/data/b'))
+        self.assertTrue(tree.is_file('representations/notes.txt'))
+        self.assertFalse(tree.is_dir('representations/notes.txt'))
+        self.assertEqual(tree.folders('missing'), frozenset())
+        self.assertEqual(sorted(path for path, _ in tree.walk_files()), sorted(FILES))
+        self.assertEqual([path for path, _ in tree.walk_files('representations', False)],
+                         ['representations/notes.txt'])
+        path = os.path.join(self.root, 'representations', 'rep1', 'data', 'a.txt')
+        self.assertEqual(tree.stat(path), os.stat(path))
+        self.assertIsNone(tree.stat(os.path.join(self.root, 'representations', 'a.txt')))
+        self.assertIsNone(tree.relative(os.path.dirname(self.root)))
+
+    def test_single_scan(self):
+        """Every folder is listed once, however many checks read the snapshot."""
+        tree = PackageTree.from_directory(self.root)
+        with mock.patch('os.scandir', wraps=os.scandir) as scandir:
+            struct_tests = structure.PackageStructTests(self.root, tree)
+            manifests.entries_from_dir(self.root, tree=tree)
+            fixity.check_file_refs(self.root, [FileRef(path, str(len(path)), None)
+                                               for path in FILES], tree=tree)
+        self.assertEqual(scandir.call_count, len(list(os.walk(self.root))))
+        self.assertEqual(set(struct_tests.representations), {'rep1', 'rep2', 'notes.txt'})
+
+    def test_structure(self):
+        """Structure results from a snapshot match those of a new scan."""
+        results = structure.PackageStructTests(self.root).get_test_results()
+        shared = structure.PackageStructTests(self.root, PackageTree.from_directory(self.root))
+        self.assertEqual([result.rule_id for result in shared.get_test_results().messages],
+                         [result.rule_id for result in results.messages])
+
+    def test_archive_modes(self):
+        """An archive gets the same structure results from its listing and unpacked."""
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = shutil.make_archive(os.path.join(tmp, 'ip'), 'zip',
+                                          root_dir=os.path.dirname(self.root),
+                                          base_dir=os.path.basename(self.root))
+            _, listed = packages.validate(archive, struct_only=True)
+            unpack_root = os.path.join(tempfile.gettempdir(), Checksums.from_file(archive).value)
+            try:
+                unpacked, _ = packages.get_ip_root(archive)
+                self.assertEqual(unpacked, os.path.join(unpack_root, os.path.basename(self.root)))
+                _, extracted = packages.validate(unpacked, struct_only=True)
+            finally:
+                shutil.rmtree(unpack_root, ignore_errors=True)
+        self.assertEqual(listed.structure.status, structure.StructStatus.WELLFORMED)
+        self.assertEqual(extracted.structure.status, listed.structure.status)
+        # Representations are tested in listing order
+        self.assertEqual(sorted((result.rule_id, result.location)
+                                for result in extracted.structure.messages),
+                         sorted((result.rule_id, result.location)
+                                for result in listed.structure.messages))
+
+    def test_timings(self):
+        """Instrumented package validation times each phase it runs."""
+        timings = {}
+        self.assertEqual(packages.validate(self.root, struct_only=True, timings=timings),
+                         packages.validate(self.root, struct_only=True))
+        self.assertEqual(list(timings), [self.root])
+        self.assertEqual(list(timings[self.root].steps), ['structure'])
+
+    def test_listing(self):
+        """Trees built from path listings infer folders and never read the disk."""
+        tree = PackageTree.from_paths('listed', [('./a/b/c.txt', False, 3), ('a/', True, None),
+                                                 ('a/b/c.txt/d', False, 1), ('../e', False, 1),
+                                                 ('f', False, 2)])
+        self.assertEqual(tree.names(), ['a', 'f'])
+        self.assertEqual(tree.folders('a'), {'b'})
+        self.assertEqual(tree.files('a/b'), {'c.txt'})
+        self.assertEqual(tree.stat(os.path.join('listed', 'a', 'b', 'c.txt')).st_size, 3)
+        self.assertIsNone(tree.stat(os.path.join('listed', 'a', 'x')))
+        self.assertIsNone(tree.stat(self.root))
+        self.assertFalse(tree.is_dir('x'))
+
+    def test_archives(self):
+        """Structure results from zip and tar listings match the unpacked package."""
+        package = os.path.join(self.root, 'representations', 'rep1')
+        expected = Structure.from_directory(package)
+        archives = [shutil.make_archive(os.path.join(self.root, 'ip'), archive_format,
+                                        root_dir=os.path.dirname(package), base_dir='rep1')
+                    for archive_format in ('zip', 'tar', 'gztar')]
+        for archive in archives:
+            tree = PackageTree.from_archive(archive)
+            self.assertEqual(tree.root, os.path.join(archive, 'rep1'))
+            self.assertEqual(tree.files('data'), {'a.txt'})
+            results = Structure.from_archive(archive)
+            self.assertEqual(results.status, expected.status)
+            self.assertEqual([(result.rule_id, result.location) for result in results.messages],
+                             [(result.rule_id, result.location)
+                              for result in expected.messages])
+        with tarfile.open(archives[1], 'a') as tar_ip:
+            tar_ip.add(os.path.join(self.root, 'METS.xml'), 'METS.xml')
+        self.assertEqual(PackageTree.from_archive(archives[1]).names(), ['rep1', 'METS.xml'])
+        with self.assertRaises(ValueError):
+            PackageTree.from_archive(os.path.join(self.root, 'METS.xml'))
+
+    def test_manifest(self):
+        """Structure results from manifest entry paths match the package folder."""
+        os.rmdir(os.path.join(self.root, 'schemas'))
+        manifest = MODEL.Manifest(source='filesystem',
+                                  entries=manifests.entries_from_dir(self.root))
+        tree = PackageTree.from_manifest(manifest, self.root)
+        self.assertEqual(tree.root, self.root)
+        self.assertEqual(tree.stat(os.path.join(self.root, 'METS.xml')).st_size, len('METS.xml'))
+        expected = Structure.from_directory(self.root)
+        for results in (Structure.from_manifest(manifest, self.root),
+                        Structure.from_paths(self.root, FILES)):
+            # Representations are tested in listing order
+            self.assertEqual(sorted((result.rule_id, result.location)
+                                    for result in results.messages),
+                             sorted((result.rule_id, result.location)
+                                    for result in expected.messages))
+        self.assertEqual(PackageTree.from_manifest(manifest, os.path.join(
+            self.root, 'metadata')).folders(), {'descriptive', 'preservation'})
+
+    def test_manifest_missing_mets(self):
+        """A package with one representation and no root METS.xml isn't well formed."""
+        rep = os.path.join(self.root, 'representations', 'rep1')
+        manifest = MODEL.Manifest(source='filesystem', entries=manifests.entries_from_dir(rep))
+        results = Structure.from_manifest(manifest, self.root)
+        self.assertEqual(results.status, structure.StructStatus.NOTWELLFORMED)
+        self.assertIn('CSIPSTR4', [result.rule_id for result in results.messages])
+
+    def test_manifest_builder(self):
+        """Streamed manifest entries and totals match the files, with or without
+        a snapshot."""
+        manifest = manifests.manifest_from_directory(self.root)
+        self.assertEqual(sorted(entry.path for entry in manifest.entries),
+                         sorted(os.path.join(self.root, path) for path in FILES))
+        self.assertEqual(manifest.summary.file_count, len(FILES))
+        self.assertEqual(manifest.summary.total_size, sum(len(path) for path in FILES))
+        self.assertEqual(manifests.summary_from_entries(manifest.entries), manifest.summary)
+        shared = manifests.manifest_from_directory(self.root,
+                                                   tree=PackageTree.from_directory(self.root))
+        self.assertEqual(shared, manifest)
+        self.assertEqual([entry.path for entry in manifests.iter_entries(self.root,
+                                                                         recurse=False)],
+                         [os.path.join(self.root, 'METS.xml')])
+
+
+if __name__ == '__main__':
+    unittest.main()
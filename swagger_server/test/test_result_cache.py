@@ -0,0 +1,115 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from swagger_server.forge import fixity, metadata
+from swagger_server.forge.cache import ResultCache, Snapshot
+from swagger_server.forge.metadata import FileRef
+from swagger_server.models import Checksum, ChecksumAlg, MetadataStatus
+
+
+class TestResultCache(unittest.TestCase):
+    """Unit tests for the on-disk validation result cache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'results.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        """Stored values are returned unchanged, missing keys return None."""
+        cache = ResultCache(self.path)
+        value = [True, 'Valid', [[None, 'CSIP1', 'message', 'Error']]]
+        cache.put('key', value)
+        self.assertEqual(cache.get('key'), value)
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(ResultCache(self.path).get('key'), value)
+
+    def test_lru_eviction(self):
+        """The least recently used entries are evicted once max_bytes is exceeded."""
+        cache = ResultCache(self.path, max_bytes=25)
+        cache.put('a', 'x' * 8)
+        cache.put('b', 'y' * 8)
+        cache.get('a')
+        cache.put('c', 'z' * 8)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertLessEqual(cache.size, 25)
+
+    def test_pickle(self):
+        """Caches can be passed to worker processes."""
+        cache = ResultCache(self.path)
+        cache.put('key', 1)
+        self.assertEqual(pickle.loads(pickle.dumps(cache)).get('key'), 1)
+
+    def test_fingerprint(self):
+        """Cache keys of many documents only hash the validation resources once."""
+        metadata.resources_fingerprint.cache_clear()
+        with mock.patch.object(metadata, 'files', wraps=metadata.files) as resources:
+            keys = [metadata._cache_keys(str(digest)) for digest in range(10)]
+        self.assertEqual(resources.call_count, 2)
+        self.assertEqual(len({key[metadata.ValidationPlan.SCHEMA] for key in keys}), 10)
+
+
+class TestSnapshot(unittest.TestCase):
+    """Unit tests for the incremental validation snapshot."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot = Snapshot(os.path.join(self.tmp.name, 'snapshot.db'))
+        self.data = os.path.join(self.tmp.name, 'data.bin')
+        self._write(b'first')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, content, age=60):
+        with open(self.data, 'wb') as _f:
+            _f.write(content)
+        past = time.time() - age
+        os.utime(self.data, (past, past))
+
+    def test_digest(self):
+        """Digests are reused until the file changes."""
+        expected = hashlib.sha256(b'first').hexdigest()
+        self.assertEqual(self.snapshot.digest(self.data), expected)
+        self.assertEqual(self.snapshot.get_digest(self.data, ChecksumAlg.SHA256,
+                                                  os.stat(self.data)), expected)
+        self._write(b'second', age=120)
+        self.assertIsNone(self.snapshot.get_digest(self.data, ChecksumAlg.SHA256,
+                                                   os.stat(self.data)))
+        self.assertEqual(self.snapshot.digest(self.data), hashlib.sha256(b'second').hexdigest())
+
+    def test_racy(self):
+        """Digests of files modified just before they're hashed aren't recorded."""
+        self._write(b'first', age=0)
+        self.snapshot.digest(self.data)
+        self.assertIsNone(self.snapshot.get_digest(self.data, ChecksumAlg.SHA256,
+                                                   os.stat(self.data)))
+
+    def test_fixity(self):
+        """Fixity checks record digests, and use them rather than reading the file."""
+        file_ref = FileRef('data.bin', '5', Checksum(ChecksumAlg.MD5,
+                                                     hashlib.md5(b'first').hexdigest()))
+        result = fixity.check_file_refs(self.tmp.name, [file_ref], digests=self.snapshot)
+        self.assertEqual(result.status, MetadataStatus.VALID)
+        stat = os.stat(self.data)
+        self.assertIsNotNone(self.snapshot.get_digest(self.data, ChecksumAlg.MD5, stat))
+        self.snapshot.put_digest(self.data, ChecksumAlg.MD5, stat, 'recorded')
+        result = fixity.check_file_refs(self.tmp.name, [file_ref], digests=self.snapshot)
+        self.assertEqual(result.messages[0].rule_id, fixity.CHECKSUM_MISMATCH)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import fnmatch
+import os
+import tempfile
+import unittest
+
+from lxml import etree
+
+from swagger_server.forge.metadata import (RuleSelection, ValidationProfile, ValidationRules,
+                                            XPathRules, validate_ip)
+from swagger_server.forge.timing import Timings
+from swagger_server.models import MetadataStatus, Severity
+
+METS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink"
+    xmlns:csip="https://DILCIS.eu/XML/METS/CSIPExtensionMETS" OBJID="pkg" TYPE="Text"
+    PROFILE="https://earkcsip.dilcis.eu/profile/E-ARK-CSIP.xml" LABEL="pkg"
+    csip:CONTENTINFORMATIONTYPE="MIXED">
+  <mets:metsHdr CREATEDATE="2020-01-01T00:00:00" csip:OAISPACKAGETYPE="SIP">
+    <mets:agent ROLE="CREATOR" TYPE="OTHER" OTHERTYPE="SOFTWARE">
+      <mets:name>test</mets:name>
+      <mets:note csip:NOTETYPE="SOFTWARE VERSION">1.0</mets:note>
+    </mets:agent>
+  </mets:metsHdr>
+  <mets:dmdSec ID="dmd-1" CREATED="2020-01-01T00:00:00" STATUS="CURRENT">
+    <mets:mdRef ID="dmd-ref-1" LOCTYPE="URL" xlink:type="simple" MDTYPE="DC"
+        xlink:href="metadata/descriptive/dc.xml" MIMETYPE="text/xml" SIZE="1"
+        CREATED="2020-01-01T00:00:00" CHECKSUM="0" CHECKSUMTYPE="SHA-256"/>
+  </mets:dmdSec>
+  <mets:amdSec ID="amd-1">
+    <mets:digiprovMD ID="digiprov-1" STATUS="CURRENT">
+      <mets:mdRef ID="digiprov-ref-1" LOCTYPE="URL" xlink:type="simple" MDTYPE="PREMIS"
+          xlink:href="metadata/preservation/premis.xml" MIMETYPE="text/xml" SIZE="1"
+          CREATED="2020-01-01T00:00:00" CHECKSUM="0" CHECKSUMTYPE="SHA-256"/>
+    </mets:digiprovMD>
+  </mets:amdSec>
+  <mets:fileSec ID="file-sec-1">
+    <mets:fileGrp ID="grp-docs" USE="Documentation">
+      <mets:file ID="file-1" MIMETYPE="text/plain" SIZE="1" CREATED="2020-01-01T00:00:00"
+          CHECKSUM="0" CHECKSUMTYPE="SHA-256">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple" xlink:href="documentation/a.txt"/>
+      </mets:file>
+    </mets:fileGrp>
+    <mets:fileGrp ID="grp-rep" USE="Representations/rep1" csip:CONTENTINFORMATIONTYPE="MIXED">
+      <mets:file ID="file-2" MIMETYPE="text/xml" SIZE="1" CREATED="2020-01-01T00:00:00"
+          CHECKSUM="0" CHECKSUMTYPE="SHA-256">
+        <mets:FLocat LOCTYPE="URL" xlink:type="simple"
+            xlink:href="representations/rep1/METS.xml"/>
+      </mets:file>
+    </mets:fileGrp>
+  </mets:fileSec>
+  <mets:structMap ID="struct-1" TYPE="PHYSICAL" LABEL="CSIP">
+    <mets:div ID="div-1" LABEL="pkg">
+      <mets:div ID="div-2" LABEL="Metadata" ADMID="amd-1" DMDID="dmd-1"/>
+      <mets:div ID="div-3" LABEL="Documentation">
+        <mets:fptr FILEID="grp-docs"/>
+      </mets:div>
+      <mets:div ID="div-4" LABEL="Representations/rep1">
+        <mets:mptr LOCTYPE="URL" xlink:type="simple" xlink:title="grp-rep"
+            xlink:href="representations/rep1/METS.xml"/>
+      </mets:div>
+    </mets:div>
+  </mets:structMap>
+</mets:mets>
+"""
+
+RELATIVE_RULES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<schema xmlns="http://purl.oclc.org/dsdl/schematron">
+  <ns prefix="mets" uri="http://www.loc.gov/METS/"/>
+  <pattern>
+    <rule context="mets:file | mets:mdRef[@MDTYPE='DC']">
+      <assert id="REL1" role="ERROR" test="@SIZE > 1">Files must not be empty.</assert>
+    </rule>
+    <rule context="mets:fileGrp">
+      <assert id="REL2" role="WARN" test="@ADMID">File groups should have an ADMID.</assert>
+    </rule>
+  </pattern>
+</schema>
+"""
+
+
+def _mets_variants():
+    """Yield the sample METS plus a variant for every attribute and element removed,
+    followed by any METS.xml documents under the EARK_CORPUS directory."""
+    yield etree.ElementTree(etree.fromstring(METS))
+    element_count = len(list(etree.fromstring(METS).iter()))
+    for index in range(element_count):
+        root = etree.fromstring(METS)
+        element = list(root.iter())[index]
+        for name in element.attrib:
+            variant = etree.fromstring(METS)
+            del list(variant.iter())[index].attrib[name]
+            yield etree.ElementTree(variant)
+        if element.getparent() is not None:
+            element.getparent().remove(element)
+            yield etree.ElementTree(root)
+    corpus = os.environ.get('EARK_CORPUS')
+    if corpus:
+        for root, _, files in os.walk(corpus):
+            for name in files:
+                if name == 'METS.xml':
+                    yield etree.parse(os.path.join(root, name))
+
+
+def _results(profile, tree):
+    is_valid, checks = profile.validate(tree)
+    return is_valid, {section: (result.status, [result.to_dict() for result in result.messages])
+                      for section, result in profile.get_results().items()}, checks.status
+
+
+def _selected(message):
+    return message['severity'] == Severity.ERROR and \
+        any(fnmatch.fnmatchcase(message['rule_id'], rule) for rule in ('CSIP1*', 'CSIP8?'))
+
+
+class TestRuleEngines(unittest.TestCase):
+    """Conformance tests for the XSLT and XPath Schematron rule engines."""
+
+    def test_engines_agree(self):
+        """Both engines give identical results for every METS variant."""
+        for merged in (False, True):
+            xslt = ValidationProfile(merged=merged, engine='xslt')
+            xpath = ValidationProfile(merged=merged, engine='xpath')
+            for tree in _mets_variants():
+                self.assertEqual(_results(xslt, tree), _results(xpath, tree))
+
+    def test_relative_contexts(self):
+        """Relative rule contexts match at any depth with both engines."""
+        with tempfile.TemporaryDirectory() as tmp:
+            rules_path = os.path.join(tmp, 'relative.xml')
+            with open(rules_path, 'wb') as _f:
+                _f.write(RELATIVE_RULES)
+            xslt = ValidationRules('relative', rules_path)
+            xpath = XPathRules('relative', rules_path)
+            tree = etree.ElementTree(etree.fromstring(METS))
+            expected = xslt.check(tree)
+            self.assertEqual({message.rule_id for message in expected.messages},
+                             {'REL1', 'REL2'})
+            self.assertEqual(xpath.check(tree).to_dict(), expected.to_dict())
+
+    def test_timings(self):
+        """Instrumented profiles give the same results and time every section."""
+        tree = etree.ElementTree(etree.fromstring(METS))
+        for engine in ValidationProfile.ENGINES:
+            timings = Timings()
+            profile = ValidationProfile(engine=engine, timings=timings)
+            self.assertEqual(_results(ValidationProfile(engine=engine), tree),
+                             _results(profile, tree))
+            self.assertEqual(set(timings.sections), set(ValidationProfile.SECTIONS))
+            for steps in timings.sections.values():
+                self.assertIn('transform', steps)
+                self.assertIn('report', steps)
+            if engine == 'xpath':
+                self.assertTrue(timings.sections['structmap']['assertions'])
+
+    def test_package_timings(self):
+        """Instrumented package validation returns the detailed timings of each document."""
+        with tempfile.TemporaryDirectory() as root:
+            mets_path = os.path.join(root, 'METS.xml')
+            rep_path = os.path.join(root, 'representations', 'rep1', 'METS.xml')
+            os.makedirs(os.path.dirname(rep_path))
+            for path in (mets_path, rep_path):
+                with open(path, 'wb') as _f:
+                    _f.write(METS)
+            timings = {}
+            self.assertEqual(validate_ip(root, timings=timings), validate_ip(root))
+        self.assertEqual(list(timings), [mets_path, rep_path])
+        for timing in timings.values():
+            self.assertIn('schematron', timing.steps)
+            self.assertIn('xsd', timing.steps)
+            self.assertEqual(set(timing.sections), set(ValidationProfile.SECTIONS))
+
+    def test_fail_fast(self):
+        """Fail fast profiles skip the sections after the first one with an error."""
+        tree = etree.ElementTree(etree.fromstring(METS))
+        del tree.getroot().attrib['OBJID']
+        for engine in ValidationProfile.ENGINES:
+            profile = ValidationProfile(engine=engine, fail_fast=True)
+            is_valid, _ = profile.validate(tree)
+            self.assertFalse(is_valid)
+            statuses = [result.status for result in profile.get_results().values()]
+            self.assertEqual(statuses[0], MetadataStatus.NOTVALID)
+            self.assertEqual(set(statuses[1:]), {MetadataStatus.UNKNOWN})
+
+    def test_selection(self):
+        """Selected rules report the same messages as filtering the full results."""
+        selection = RuleSelection(sections=['root', 'structmap'], rules=['CSIP1*', 'CSIP8?'],
+                                  severities=[Severity.ERROR])
+        for merged in (False, True):
+            for engine in ValidationProfile.ENGINES:
+                full = ValidationProfile(merged=merged, engine=engine)
+                subset = ValidationProfile(merged=merged, engine=engine, selection=selection)
+                self.assertEqual(subset.sections, ['root', 'structmap'])
+                for tree in _mets_variants():
+                    _, expected, _ = _results(full, tree)
+                    _, results, _ = _results(subset, tree)
+                    self.assertEqual(set(results), {'root', 'structmap'})
+                    for section, (_, messages) in results.items():
+                        self.assertEqual(messages, [message for message in expected[section][1]
+                                                    if _selected(message)])
+
+    def test_selected_sections(self):
+        """Only the sections with a selected assert are validated."""
+        tree = etree.ElementTree(etree.fromstring(METS))
+        selection = RuleSelection(rules=['CSIP1'])
+        for merged in (False, True):
+            for engine in ValidationProfile.ENGINES:
+                timings = Timings()
+                profile = ValidationProfile(merged=merged, engine=engine, timings=timings,
+                                            selection=selection)
+                self.assertEqual(profile.sections, ['root'])
+                _, results, _ = _results(profile, tree)
+                self.assertEqual(set(results), {'root'})
+                self.assertTrue(timings.sections)
+                self.assertLessEqual(set(timings.sections), {ValidationProfile.MERGED, 'root'})
+        profile = ValidationProfile(selection=RuleSelection(rules=['NONE']))
+        self.assertEqual(profile.sections, [])
+        self.assertTrue(profile.validate(tree)[0])
+
+    def test_unknown_section(self):
+        """Selecting an unknown METS section is rejected."""
+        with self.assertRaises(ValueError):
+            ValidationProfile(selection=RuleSelection(sections=['header']))
+
+    def test_unknown_engine(self):
+        """Unknown engine names are rejected."""
+        with self.assertRaises(ValueError):
+            ValidationProfile(engine='xquery')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+
+from lxml import etree
+
+from swagger_server.forge.metadata import (SCHEMATRON_NS, ValidationProfile, _rules_path,
+                                           get_rule_requirements)
+from swagger_server.forge.specification import SPECIFICATIONS
+from swagger_server.forge.structure import Level
+
+
+class TestSpecification(unittest.TestCase):
+    """Unit tests for the specification requirement index."""
+
+    def test_index(self):
+        """Lookups by id, section and level agree with the requirements by section."""
+        for factory in SPECIFICATIONS.values():
+            spec = factory()
+            requirements = [req for section in spec.sections
+                            for req in spec.section_requirements(section)]
+            self.assertEqual(list(spec.requirements), requirements)
+            self.assertEqual(spec.section_requirements(), requirements)
+            self.assertEqual(spec.requirement_count, len(requirements))
+            for requirement in requirements:
+                self.assertIs(spec.get_requirement_by_id(requirement.id), requirement)
+            self.assertIsNone(spec.get_requirement_by_id('CSIP0'))
+            by_level = [req for level in Level for req in spec.level_requirements(level)]
+            self.assertEqual(len(by_level), len(requirements))
+            self.assertEqual(spec.level_requirements('MUST'),
+                             spec.level_requirements(Level.MUST))
+
+    def test_rule_requirements(self):
+        """Every Schematron assert maps to the CSIP requirement it tests."""
+        requirements = get_rule_requirements()
+        for section in ValidationProfile.SECTIONS:
+            for test in etree.parse(_rules_path(section)).iter(SCHEMATRON_NS + 'assert'):
+                requirement = requirements[test.get('id')]
+                self.assertEqual(requirement.id, test.get('id'))
+                self.assertIn(requirement.level, ('MUST', 'SHOULD', 'MAY'))
+
+
+if __name__ == '__main__':
+    unittest.main()